@@ -1,4 +1,5 @@
 # app/config.py
+import os
 import streamlit as st
 
 # ================= 1. 数据库连接配置 =================
@@ -25,6 +26,84 @@ except FileNotFoundError:
 DB_CONFIG = DB_BASE_CONFIG
 USE_DB_ROLES = True
 
+# 数据库后端：'mysql'（默认）或 'sqlite'（嵌入式，无需 MySQL 服务器，见 utils/sqlite_backend）
+# 用环境变量指定，便于本地分析与 CI；SQLite 库路径为 ':memory:' 时使用进程内的内存库
+DB_BACKEND = os.environ.get('APP_DB_BACKEND', 'mysql')
+SQLITE_PATH = os.environ.get('APP_SQLITE_PATH', ':memory:')
+
+# 只读库（可选）：secrets 中有 [mysql_replica] 时启用读写分离，SELECT 走只读库，写入走主库
+# 只需填写 host / port（可选 database，便于本地用另一个库模拟），账号与主库相同
+try:
+    replica_secrets = st.secrets["mysql_replica"]
+    DB_REPLICA_CONFIG = {
+        key: replica_secrets[key] for key in ('host', 'port', 'database') if key in replica_secrets
+    }
+except (FileNotFoundError, KeyError):
+    DB_REPLICA_CONFIG = None
+
+# 读己之写：会话写入某表后，该会话在此时长内对该表的读取仍走主库（秒，应大于只读库的复制延迟）
+REPLICA_STICKY_SECONDS = 5.0
+
+# 连接池（每个数据库角色一个池，所有会话共享）
+POOL_CONFIG = {
+    'max_size': 10,             # 每个池的最大连接数（借出 + 空闲）
+    'max_idle_seconds': 300,    # 空闲超过该时长的连接被关闭
+    'ping_after_seconds': 30,   # 空闲超过该时长的连接借出前先 ping 检查
+    'checkout_timeout': 10,     # 池满时等待归还的最长秒数
+}
+
+# 流式读取：DatabaseManager.stream_query 每块的默认行数
+STREAM_CHUNK_SIZE = 10000
+
+# 并发查询：DatabaseManager.execute_queries 单次批量最多同时占用的连接数（不超过连接池上限）
+QUERY_BATCH_WORKERS = 4
+
+# 写入单元：DatabaseManager.unit_of_work 中同一语句每次 executemany 发送的最大行数
+UNIT_OF_WORK_CHUNK = 1000
+
+# 批量导入（见 utils/bulk_load）：达到 BULK_LOAD_MIN_ROWS 行时改走 LOAD DATA LOCAL INFILE，
+# 回退为多行 INSERT 时每批 BULK_LOAD_BATCH 行
+BULK_LOAD_MIN_ROWS = 2000
+BULK_LOAD_BATCH = 5000
+
+# 查询结果缓存（进程级，按读取的表失效）
+QUERY_CACHE_CONFIG = {
+    'max_entries': 256,                 # 最多缓存的查询条数
+    'max_bytes': 256 * 1024 * 1024,     # 缓存结果的总内存上限
+    'max_rows': 200000,                 # 超过该行数的结果不缓存
+}
+
+# 全量重算（见 utils/bulk_recompute）：分区写回时每个事务的最大行数
+BULK_RECOMPUTE_CHUNK = 1000
+
+# 跨进程表变更跟踪（需执行 数据库建立/12_表版本跟踪.sql）
+TABLE_VERSION_CONFIG = {
+    'enabled': True,
+    'poll_interval': 2.0,       # 读取 Table_Version 的最短间隔（秒），即其他进程写入后缓存最长的滞后时间
+    'retry_interval': 60.0,     # Table_Version 不可读时的重试间隔（秒）
+}
+
+# 分析查询的 Parquet 快照（需安装 duckdb，未安装时分析查询直接读数据库；见 utils/parquet_mirror）
+PARQUET_MIRROR_CONFIG = {
+    'enabled': True,
+    # 运行时生成的文件，已列入 .gitignore；可用环境变量 APP_PARQUET_MIRROR_PATH 改到数据盘或临时目录
+    'path': os.environ.get('APP_PARQUET_MIRROR_PATH',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parquet_mirror')),
+    'max_age': 600.0,           # 快照导出后最长使用的秒数，超过后下次读取时后台刷新
+    'keep_generations': 2,      # 每张表保留的快照代数（刷新时正在读取上一代的查询不受影响）
+    'retry_interval': 300.0,    # 导出失败后多少秒内不再重试（无权限的表不再重试）
+}
+
+# 系统日志异步写入（见 utils/audit_log）；sync 为 True 时逐条同步写入（测试用）
+AUDIT_LOG_CONFIG = {
+    'sync': os.environ.get('APP_AUDIT_LOG_SYNC') == '1',
+    'max_queue': 10000,         # 队列上限，已满时丢弃新日志并计数
+    'batch_size': 200,          # 每批最多写入的条数
+    'flush_interval': 0.5,      # 最长攒批时间（秒）
+    'coalesce_window': 60.0,    # 相同查看日志的合并窗口（秒），0 为不合并
+    'coalesce_actions': ('VIEW',),  # 参与合并的操作类型
+}
+
 # ================= 2. 用户名单 (登录用) =================
 USERS = {
     'manager_user': {'password': '123', 'role': 'Manager', 'name': '张经理'},
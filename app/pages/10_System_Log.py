@@ -4,6 +4,7 @@ import pandas as pd
 import io
 from datetime import datetime, timedelta
 from utils.database import get_db_manager
+from utils.export import StreamingExcelWriter, write_csv_chunks
 from utils.i18n import show_sidebar_with_nav, get_text
 
 # ==================== 登录检查 ====================
@@ -150,7 +151,7 @@ def main():
     db = get_db_manager()
     
     # 构建基础查询
-    base_query = "SELECT Log_ID, Log_Time, Username, Role, Action_Type, Details FROM System_Log"
+    base_query = "SELECT Log_ID, Log_Time, Username, Role, Action_Type, Details, Repeat_Count FROM System_Log"
     
     # 构建WHERE条件
     conditions = []
@@ -280,11 +281,16 @@ def main():
             'Details': st.column_config.TextColumn(
                 get_text('log_details'), 
                 width="large"
+            ),
+            # 合并的查看次数（见 utils/audit_log）
+            'Repeat_Count': st.column_config.NumberColumn(
+                get_text('log_repeat_count'),
+                width="small"
             )
         }
         
         # 显示的列顺序
-        display_columns = ['Log_ID', 'Log_Time', 'Username', 'Role', '操作类型', 'Details']
+        display_columns = ['Log_ID', 'Log_Time', 'Username', 'Role', '操作类型', 'Details', 'Repeat_Count']
         
         # 显示数据表格
         st.dataframe(
@@ -304,14 +310,54 @@ def main():
             
             export_col1, export_col2 = st.columns(2)
             
+            # 导出时按当前筛选条件重新流式读取（服务端游标逐块写入），点击下载时才生成文件
+            export_params = params if params else None
+            
+            def build_logs_csv():
+                output = io.BytesIO()
+                write_csv_chunks(db.stream_query(query, export_params), output)
+                return output.getvalue()
+            
+            # 重命名列用于导出
+            rename_dict = {
+                'Log_ID': get_text('log_id'),
+                'Log_Time': get_text('log_time'),
+                'Username': get_text('log_username'),
+                'Role': get_text('log_role'),
+                'Details': get_text('log_details'),
+                'Repeat_Count': get_text('log_repeat_count')
+            }
+            
+            # 确定导出列顺序
+            export_columns = [
+                get_text('log_id'),
+                get_text('log_time'),
+                get_text('log_username'),
+                get_text('log_role'),
+                get_text('log_action'),
+                get_text('log_details'),
+                get_text('log_repeat_count')
+            ]
+            
+            def excel_chunks():
+                for chunk in db.stream_query(query, export_params):
+                    # 创建带中文操作类型的副本
+                    chunk[get_text('log_action')] = chunk['Action_Type'].map(
+                        lambda x: action_type_mapping.get(x, x)
+                    )
+                    yield chunk.rename(columns=rename_dict)[export_columns]
+            
+            def build_logs_excel():
+                writer = StreamingExcelWriter()
+                writer.write_chunks(get_text('nav_log'), excel_chunks())
+                return writer.getvalue()
+            
             with export_col1:
                 # CSV导出 - 固定所有列
                 try:
-                    # 准备导出数据（英文Action_Type，其他列不变）
-                    csv_data = df_logs.to_csv(index=False, encoding='utf-8-sig')
                     st.download_button(
                         label=get_text('log_export_csv'),
-                        data=csv_data,
+                        data=build_logs_csv,
                         file_name=f"system_logs_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
                         mime="text/csv",
                         use_container_width=True,
@@ -323,46 +369,9 @@ def main():
             with export_col2:
                 # Excel导出 - 固定所有列，包含中文操作类型
                 try:
-                    output = io.BytesIO()
-                    
-                    # 创建带中文操作类型的副本
-                    df_excel = df_logs.copy()
-                    if 'Action_Type' in df_excel.columns:
-                        df_excel[get_text('log_action')] = df_excel['Action_Type'].apply(
-                            lambda x: action_type_mapping.get(x, x)
-                        )
-                    
-                    # 重命名列用于导出
-                    rename_dict = {
-                        'Log_ID': get_text('log_id'),
-                        'Log_Time': get_text('log_time'),
-                        'Username': get_text('log_username'),
-                        'Role': get_text('log_role'),
-                        'Details': get_text('log_details')
-                    }
-                    
-                    df_excel_renamed = df_excel.rename(columns=rename_dict)
-                    
-                    # 确定导出列顺序
-                    export_columns = [
-                        get_text('log_id'),
-                        get_text('log_time'),
-                        get_text('log_username'),
-                        get_text('log_role'),
-                        get_text('log_action'),
-                        get_text('log_details')
-                    ]
-                    
-                    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                        df_excel_renamed[export_columns].to_excel(
-                            writer, index=False, sheet_name=get_text('nav_log')
-                        )
-                    
-                    excel_data = output.getvalue()
-                    
                     st.download_button(
                         label=get_text('log_export_excel'),
-                        data=excel_data,
+                        data=build_logs_excel,
                         file_name=f"system_logs_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
                         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                         use_container_width=True,
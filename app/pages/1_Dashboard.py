@@ -3,8 +3,10 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 import io
+import itertools
 import zipfile
 from utils.helper import apply_currency_conversion
+from utils.export import StreamingExcelWriter, write_csv_chunks
 from utils.database import get_db_manager
 from utils.i18n import get_text, show_sidebar_with_nav
 
@@ -209,9 +211,9 @@ def show_system_status_section():
             # 综合数据统计
             st.markdown(f"### {get_text('comprehensive_data')}")
             try:
-                time_periods = db.get_all_time_periods()
-                countries = db.get_all_countries()
-                models = db.get_all_models()
+                time_periods, countries, models = db.run_concurrently(
+                    [db.get_all_time_periods, db.get_all_countries, db.get_all_models]
+                )
                 
                 col_stat1, col_stat2, col_stat3 = st.columns(3)
                 with col_stat1:
@@ -375,9 +377,8 @@ def show_batch_export_section():
                     user_country = st.session_state.user_info.get('country')
                     # =================================
                     
-                    # 收集所有数据
-                    data_dict = {}
-                    export_stats = {}
+                    # 构建各表查询
+                    table_queries = []
                     
                     for table_display in selected_tables:
                         table_name = table_mapping.get(table_display, table_display)
@@ -407,10 +408,11 @@ def show_batch_export_section():
                         # 3. 组装最终 SQL
                         if conditions:
                             query += " WHERE " + " AND ".join(conditions)
-                        df = pd.read_sql_query(query, db.conn, params=params if params else None)
-                        
-                        if not df.empty:
-                            # 应用货币转换
+                        table_queries.append((table_display, table_name, query, params))
+                    
+                    def table_chunks(table_name, query, params):
+                        """流式读取一张表（服务端游标逐块读取），逐块应用货币转换"""
+                        for df in db.stream_query(query, params if params else None):
                             if convert_currency and target_currency and table_name not in ['Exchange']:
                                 # 确定时间列
                                 time_col = None
@@ -423,55 +425,56 @@ def show_batch_export_section():
                                 elif 'Expenses_time' in df.columns:
                                     time_col = 'Expenses_time'
                                 
-                                df_converted, currency_symbol = apply_currency_conversion(
+                                df, currency_symbol = apply_currency_conversion(
                                     df, db, target_currency, time_col
                                 )
-                                data_dict[table_display] = df_converted
-                            else:
-                                data_dict[table_display] = df
-                            
-                            export_stats[table_display] = len(df)
+                            yield df
                     
-                    if not data_dict:
-                        st.warning(get_text('no_data_found'))
-                        return
-                    
-                    # 创建导出文件
+                    # 创建导出文件（逐块写入，内存占用与导出行数无关）
                     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    export_stats = {}
                     
                     if export_format == "Excel":
                         # 导出为单个Excel文件，多个sheet
-                        output = io.BytesIO()
-                        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                            for table_display, df in data_dict.items():
-                                sheet_name = table_display[:31]  # Excel sheet name max 31 chars
-                                df.to_excel(writer, sheet_name=sheet_name, index=False)
+                        writer = StreamingExcelWriter()
+                        for table_display, table_name, query, params in table_queries:
+                            writer.write_chunks(table_display, table_chunks(table_name, query, params))
+                        export_stats = writer.row_counts
+                        
+                        if not export_stats:
+                            st.warning(get_text('no_data_found'))
+                            return
                         
-                        data = output.getvalue()
+                        data = writer.getvalue()
                         file_name = f"batch_export_{timestamp}.xlsx"
                         mime_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                         
-                        # 显示统计信息
-                        st.success(f"{get_text('batch_complete')} {len(data_dict)} {get_text('data_tables')}")
-                        for table, count in export_stats.items():
-                            st.info(f"  • {table}: {count} {get_text('records')}")
-                        
                     else:  # CSV格式，打包为ZIP
                         zip_buffer = io.BytesIO()
                         with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                            for table_display, df in data_dict.items():
-                                csv_data = df.to_csv(index=False, encoding='utf-8-sig')
-                                file_name_in_zip = f"{table_mapping.get(table_display, table_display)}_{timestamp}.csv"
-                                zip_file.writestr(file_name_in_zip, csv_data)
+                            for table_display, table_name, query, params in table_queries:
+                                chunks = table_chunks(table_name, query, params)
+                                first = next(chunks, None)
+                                if first is None:
+                                    continue
+                                file_name_in_zip = f"{table_name}_{timestamp}.csv"
+                                with zip_file.open(file_name_in_zip, 'w') as csv_file:
+                                    export_stats[table_display] = write_csv_chunks(
+                                        itertools.chain([first], chunks), csv_file
+                                    )
+                        
+                        if not export_stats:
+                            st.warning(get_text('no_data_found'))
+                            return
                         
                         data = zip_buffer.getvalue()
                         file_name = f"batch_export_{timestamp}.zip"
                         mime_type = "application/zip"
-                        
-                        # 显示统计信息
-                        st.success(f"{get_text('batch_complete')} {len(data_dict)} {get_text('data_tables')}")
-                        for table, count in export_stats.items():
-                            st.info(f"  • {table}: {count} {get_text('records')}")
+                    
+                    # 显示统计信息
+                    st.success(f"{get_text('batch_complete')} {len(export_stats)} {get_text('data_tables')}")
+                    for table, count in export_stats.items():
+                        st.info(f"  • {table}: {count} {get_text('records')}")
                     
                     # 提供下载按钮
                     st.download_button(
@@ -674,9 +677,8 @@ def show_batch_export_section():
                         tables = ['Display', 'History', 'Budget', 'Costs', 'Sales_Price', 'Exchange', 'Regional_Expenses']
                         stats = {}
                         
-                        for table in tables:
-                            query = f"SELECT COUNT(*) as count FROM {table}"
-                            df = db.execute_query(query)
+                        frames = db.execute_queries({table: f"SELECT COUNT(*) as count FROM {table}" for table in tables})
+                        for table, df in frames.items():
                             if not df.empty:
                                 stats[table] = df.iloc[0]['count']
                         
@@ -145,6 +145,7 @@ def show_costs_entry(db, u):
                         ON DUPLICATE KEY UPDATE Costs = VALUES(Costs)
                     """
                     if db.execute_update(query, (model, country, costs_time, costs)):
+                        db.recompute_dependents('Costs', {'Model': model, 'Country': country, 'Costs_time': costs_time})
                         handle_save_success(db, u['id'], "COSTS_ENTRY", get_text('costs_entry_title'), f"{model} in {country}")
                     else:
                         st.error(get_text('error'))
@@ -200,6 +201,7 @@ def show_exchange_entry(db, u):
                     ON DUPLICATE KEY UPDATE Exchange_rate = VALUES(Exchange_rate)
                 """
                 if db.execute_update(query, (exchange_time, exchange_rate)):
+                    db.recompute_dependents('Exchange', {'Exchange_time': exchange_time})
                     handle_save_success(db, u['id'], "EXCHANGE_ENTRY", get_text('exchange_entry_title'), f"{exchange_time}: {exchange_rate}")
                 else:
                     st.error(get_text('error'))
@@ -250,6 +252,7 @@ def show_expenses_entry(db, u):
                     """
                     if db.execute_update(query, (country, expenses_time, marketing_expenses, 
                                                  labor_cost, other_variable, other_fixed)):
+                        db.recompute_dependents('Regional_Expenses', {'Country': country, 'Expenses_time': expenses_time})
                         handle_save_success(db, u['id'], "EXPENSES_ENTRY", get_text('expenses_entry_title'), f"{country} at {expenses_time}")
                     else:
                         st.error(get_text('error'))
@@ -308,6 +311,7 @@ def show_model_entry(db, u):
                     ON DUPLICATE KEY UPDATE Series = VALUES(Series), Model_label = VALUES(Model_label)
                 """
                 if db.execute_update(query, (model, series, model_label)):
+                    db.recompute_dependents('Model', {'Model': model})
                     handle_save_success(db, u['id'], "MODEL_ENTRY", get_text('model_entry_title'), f"{model}")
                 else:
                     st.error(get_text('error'))
@@ -337,6 +341,7 @@ def show_country_entry(db, u):
                     ON DUPLICATE KEY UPDATE Market = VALUES(Market)
                 """
                 if db.execute_update(query, (country, market)):
+                    db.recompute_dependents('Country', {'Country': country})
                     handle_save_success(db, u['id'], "COUNTRY_ENTRY", get_text('country_entry_title'), f"{country}") 
                 else:
                     st.error(get_text('error'))
@@ -393,6 +398,7 @@ def show_sales_entry(db, u):
                     params = (model, country, time, currency, sales, price, time)
                     
                     if db.execute_update(query, params):
+                        db.recompute_dependents('Sales_Price', {'Model': model, 'Country': country, 'h_Time': time})
                         handle_save_success(db, u['id'], "SALES_ENTRY", get_text('sales_entry_title'), f"{model} in {country}")
                 except Exception as e:
                     st.error(f"{get_text('error')}: {e}")
@@ -274,7 +274,7 @@ def main():
                     params = tuple(query_params)
                 
                 # 执行查询
-                df = db.execute_query(query, params if params else None)
+                df = db.analytics_query(query, params if params else None)
                 
                 if not df.empty:
                     st.success(get_text('msg_found_records', count=len(df)))
@@ -3,7 +3,13 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import io
+import time
 from utils.database import get_db_manager
+from utils.scenario import SCENARIO_TABLES, OVERRIDE_MODES, make_override, compare_with_baseline
+from utils.financials import PARAMETER_TABLES
+from utils.sensitivity import (
+    SENSITIVITY_PARAMETERS, group_coefficients, evaluate, sample_scenarios, tornado, percentile_table
+)
 from utils.helper import apply_currency_conversion
 from utils.i18n import show_sidebar_with_nav, get_text
 
@@ -84,11 +90,13 @@ def main():
     db = get_db_manager()
     
     # 创建Tab标签页
-    tab1, tab2, tab3, tab4 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
         get_text('analysis_opt_comparison'),
         get_text('analysis_opt_time'),
         get_text('analysis_opt_country'),
-        get_text('analysis_opt_product')
+        get_text('analysis_opt_product'),
+        get_text('analysis_opt_scenario'),
+        get_text('analysis_opt_sensitivity')
     ])
     
     with tab1:
@@ -102,6 +110,12 @@ def main():
     
     with tab4:
         show_product_summary(db)
+    
+    with tab5:
+        show_scenario_analysis(db)
+    
+    with tab6:
+        show_sensitivity_analysis(db)
 
 def show_comparison_analysis(db):
     """改进：预算vs预测对比分析（而不是预算vs历史）"""
@@ -331,8 +345,8 @@ def show_time_breakdown_analysis(db):
     
     # 获取各时间段的国家汇总数据
     all_data = []
-    for time_period in selected_times:
-        df_time = db.get_country_summary(time_period)
+    summaries = db.run_concurrently([lambda t=t: db.get_country_summary(t) for t in selected_times])
+    for time_period, df_time in zip(selected_times, summaries):
         if df_time is not None and not df_time.empty:
             df_time['Time Period'] = time_period
             all_data.append(df_time)
@@ -679,7 +693,7 @@ def show_product_summary(db):
             """
             params = (country_filter,)
         
-        df = db.execute_query(query, params)
+        df = db.analytics_query(query, params)
     
     if df is not None and not df.empty:
         # 应用货币转换
@@ -779,5 +793,216 @@ def show_product_summary(db):
     else:
         st.warning(get_text('msg_no_data'))
 
+def show_scenario_analysis(db):
+    """情景模拟：修改参数后重新计算，与基准对比（不写库）"""
+    
+    st.markdown(f"#### {get_text('scenario_title')}")
+    st.caption(get_text('scenario_desc'))
+    
+    # 获取用户信息
+    u = st.session_state.get('user_info', {})
+    country_filter = u.get('country')
+    all_option = get_text('view_all_option')
+    overrides = st.session_state.setdefault('scenario_overrides', [])
+    
+    time_periods, countries, models = db.run_concurrently(
+        [db.get_all_time_periods, db.get_all_countries, db.get_all_models]
+    )
+    key_options = {
+        'Exchange_time': time_periods, 'Costs_time': time_periods,
+        'h_Time': time_periods, 'Expenses_time': time_periods,
+        'Country': countries, 'Model': models,
+        'Series': ["Dog", "Cat", "Tiger"],
+    }
+    
+    # ========== 参数修改 ==========
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        table = st.selectbox(
+            get_text('scenario_param_table'),
+            list(SCENARIO_TABLES.keys()),
+            format_func=lambda t: get_text(f'scenario_tbl_{t}'),
+            key="scn_table"
+        )
+    with col2:
+        column = st.selectbox(get_text('scenario_param_column'), SCENARIO_TABLES[table], key="scn_column")
+    with col3:
+        mode = st.radio(
+            get_text('scenario_mode'), OVERRIDE_MODES,
+            format_func=lambda m: get_text(f'scenario_mode_{m}'),
+            horizontal=True, key="scn_mode"
+        )
+    
+    key = {}
+    key_cols = st.columns(len(PARAMETER_TABLES[table][0]) + 1)
+    for i, key_col in enumerate(PARAMETER_TABLES[table][0]):
+        with key_cols[i]:
+            if key_col in key_options:
+                value = st.selectbox(key_col, [all_option] + list(key_options[key_col]), key=f"scn_key_{table}_{key_col}")
+                key[key_col] = None if value == all_option else value
+            else:
+                key[key_col] = st.text_input(key_col, "", key=f"scn_key_{table}_{key_col}")
+    with key_cols[-1]:
+        value = st.number_input(get_text('scenario_value'), value=0.0, step=0.01, format="%.4f", key="scn_value")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button(get_text('btn_add_override'), use_container_width=True):
+            try:
+                overrides.append(make_override(table, column, value, key, mode))
+            except ValueError as e:
+                st.error(str(e))
+    with col2:
+        if st.button(get_text('btn_clear_overrides'), use_container_width=True):
+            overrides.clear()
+    
+    st.markdown(f"##### {get_text('scenario_overrides')}")
+    if overrides:
+        st.dataframe(pd.DataFrame([
+            {
+                get_text('scenario_param_table'): get_text(f"scenario_tbl_{o['table']}"),
+                'Key': ", ".join(f"{k}={v}" for k, v in o['key'].items()) or all_option,
+                get_text('scenario_param_column'): o['column'],
+                get_text('scenario_mode'): get_text(f"scenario_mode_{o['mode']}"),
+                get_text('scenario_value'): o['value'],
+            }
+            for o in overrides
+        ]), use_container_width=True)
+    else:
+        st.info(get_text('scenario_no_overrides'))
+    
+    # ========== 模拟范围与对比维度 ==========
+    col1, col2 = st.columns(2)
+    with col1:
+        selected_time = st.selectbox(get_text('select_time'), [all_option] + time_periods, key="scn_time")
+    with col2:
+        group_by = st.selectbox(get_text('scenario_group_by'), ['Country', 'Model', 'Series', 'h_Time'], key="scn_group")
+    
+    if not st.button(get_text('btn_run_scenario'), type="primary", use_container_width=True, disabled=not overrides):
+        return
+    
+    filters = {}
+    if selected_time != all_option:
+        filters['time'] = selected_time
+    if country_filter:
+        filters['country'] = country_filter
+    
+    log_view_action(
+        db=db,
+        page_name=get_text('nav_analysis'),
+        analysis_type="情景模拟",
+        filter_details="; ".join(f"{o['table']}.{o['column']} {o['mode']} {o['value']}" for o in overrides)
+    )
+    
+    started = time.perf_counter()
+    baseline, scenario = db.run_scenario(overrides, filters)
+    elapsed = time.perf_counter() - started
+    
+    if baseline.empty:
+        st.warning(get_text('msg_no_data'))
+        return
+    st.caption(get_text('scenario_elapsed', rows=len(scenario), seconds=elapsed))
+    
+    # 关键指标
+    col1, col2, col3 = st.columns(3)
+    base_total = baseline['Net_income'].sum()
+    scen_total = scenario['Net_income'].sum()
+    with col1:
+        st.metric(f"{get_text('scenario_baseline')} - {get_text('tab_net_income')}", f"¥{base_total:,.2f}")
+    with col2:
+        st.metric(f"{get_text('scenario_result')} - {get_text('tab_net_income')}", f"¥{scen_total:,.2f}",
+                  delta=f"{scen_total - base_total:,.2f}")
+    with col3:
+        st.metric(f"{get_text('scenario_result')} - {get_text('tab_revenue')}", f"¥{scenario['Revenues'].sum():,.2f}",
+                  delta=f"{scenario['Revenues'].sum() - baseline['Revenues'].sum():,.2f}")
+    
+    # 对比表与图
+    df_compare = compare_with_baseline(baseline, scenario, [group_by])
+    st.dataframe(df_compare, use_container_width=True)
+    
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=df_compare[group_by], y=df_compare['Net_income_baseline'], name=get_text('scenario_baseline')))
+    fig.add_trace(go.Bar(x=df_compare[group_by], y=df_compare['Net_income_scenario'], name=get_text('scenario_result')))
+    fig.update_layout(barmode='group', title=f"{get_text('tab_net_income')}: {get_text('scenario_baseline')} vs {get_text('scenario_result')}")
+    st.plotly_chart(fig, use_container_width=True)
+
+def show_sensitivity_analysis(db):
+    """敏感性分析：单因素龙卷风图 + 蒙特卡洛分位数（不写库）"""
+    
+    st.markdown(f"#### {get_text('sens_title')}")
+    st.caption(get_text('sens_desc'))
+    
+    # 获取用户信息
+    u = st.session_state.get('user_info', {})
+    country_filter = u.get('country')
+    all_option = get_text('view_all_option')
+    
+    # ========== 分析设置 ==========
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        selected_time = st.selectbox(get_text('select_time'), [all_option] + db.get_all_time_periods(), key="sens_time")
+    with col2:
+        group_by = st.selectbox(get_text('scenario_group_by'), ['Country', 'Model', 'Series', 'Market'], key="sens_group")
+    with col3:
+        n_samples = st.number_input(get_text('sens_samples'), min_value=100, max_value=100000, value=10000, step=1000)
+    
+    ranges, distributions = {}, {}
+    param_cols = st.columns(len(SENSITIVITY_PARAMETERS))
+    for col, name in zip(param_cols, SENSITIVITY_PARAMETERS):
+        with col:
+            st.markdown(f"**{get_text(f'sens_param_{name}')}**")
+            pct = st.slider(get_text('sens_range'), 0, 50, 10, key=f"sens_range_{name}")
+            std = st.slider(get_text('sens_std'), 0, 30, 5, key=f"sens_std_{name}")
+            ranges[name] = (1 - pct / 100, 1 + pct / 100)
+            distributions[name] = ('normal', 1.0, std / 100)
+    
+    if not st.button(get_text('btn_run_sensitivity'), type="primary", use_container_width=True):
+        return
+    
+    filters = {}
+    if selected_time != all_option:
+        filters['time'] = selected_time
+    if country_filter:
+        filters['country'] = country_filter
+    
+    log_view_action(
+        db=db,
+        page_name=get_text('nav_analysis'),
+        analysis_type="敏感性分析",
+        filter_details=f"维度: {group_by}; 模拟次数: {n_samples}"
+    )
+    
+    components = db.get_financial_components(filters)
+    if components.empty:
+        st.warning(get_text('msg_no_data'))
+        return
+    
+    started = time.perf_counter()
+    coefficients = group_coefficients(components, group_by)
+    df_tornado = tornado(coefficients, ranges)
+    net_matrix = evaluate(coefficients, sample_scenarios(distributions, int(n_samples), seed=42))
+    df_percentiles = percentile_table(coefficients, net_matrix)
+    elapsed = time.perf_counter() - started
+    st.caption(get_text('sens_elapsed', scenarios=int(n_samples), groups=len(coefficients), seconds=elapsed))
+    
+    # 龙卷风图
+    st.markdown(f"##### {get_text('sens_tornado')}")
+    labels = [get_text(f'sens_param_{p}') for p in df_tornado['parameter']]
+    fig = go.Figure()
+    fig.add_trace(go.Bar(y=labels, x=df_tornado['delta_low'], orientation='h', name=get_text('sens_low')))
+    fig.add_trace(go.Bar(y=labels, x=df_tornado['delta_high'], orientation='h', name=get_text('sens_high')))
+    fig.update_layout(barmode='overlay', yaxis={'autorange': 'reversed'}, xaxis_title=f"Δ {get_text('tab_net_income')}")
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # 分位数表
+    st.markdown(f"##### {get_text('sens_percentiles')}")
+    st.dataframe(df_percentiles.round(2), use_container_width=True)
+    
+    # 总净利润分布
+    st.markdown(f"##### {get_text('sens_distribution')}")
+    fig = px.histogram(x=net_matrix.sum(axis=1), nbins=60)
+    fig.update_layout(xaxis_title=get_text('tab_net_income'), yaxis_title="Count")
+    st.plotly_chart(fig, use_container_width=True)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,207 @@
+# app/utils/audit_log.py
+"""
+异步审计日志（System_Log）
+登录、退出、每次分析页渲染、查询与导出都会写一条日志，同步写入要在页面继续之前等待一次
+INSERT + COMMIT。这里改为放入进程内的有界队列立即返回，由后台线程每 flush_interval 秒
+或每攒够 batch_size 条，用 executemany 批量写入：
+- 日志时间在调用时记录（Log_Time 显式写入），不受排队延迟影响
+- 队列已满时丢弃并计数（dropped），不阻塞页面
+- 进程退出时（atexit）写完队列中剩余的日志；flush / close 最多等待 timeout 秒，队列满时也不阻塞
+- 查看日志合并：页面每次重跑都会记录 VIEW，coalesce_window 秒内同一数据库角色、用户、动作与详情
+  （页面、分析类型、筛选条件）相同的日志合并为一行，Log_Time 为第一次的时间，Repeat_Count 为次数；
+  窗口结束（或进程退出）时写入。其他日志 Repeat_Count 为 1
+- sync=True 时同步写入（测试用），行为与原先逐条写入相同，不合并
+"""
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+from config import AUDIT_LOG_CONFIG
+
+_IDLE = object()    # 后台线程等待超时（队列为空）
+
+
+class AuditLogger:
+    def __init__(self, sync: bool = False, max_queue: int = 10000, batch_size: int = 200,
+                 flush_interval: float = 0.5, coalesce_window: float = 60.0, coalesce_actions=('VIEW',)):
+        self.sync = sync
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.coalesce_window = coalesce_window
+        self.coalesce_actions = set(coalesce_actions)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = {}      # 合并键 -> [db, 日志行, 次数, 窗口开始的 monotonic 时间]
+        self._thread = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.coalesced = 0
+
+    # ================= 写入 =================
+    def log(self, db, username, role, action_type, details) -> bool:
+        """
+        记录一条日志
+        :param db: 写入所用的 DatabaseManager（按其数据库角色写入）
+        :return: 同步模式为是否写入成功；异步模式为是否已进入队列
+        """
+        row = (datetime.now().replace(microsecond=0), username, role, action_type, details)
+        if self.sync or self._closed:
+            return self._write([(db, row + (1,))])
+        if action_type in self.coalesce_actions and self._coalesce(db, row):
+            self._ensure_worker()
+            return True
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((db, row + (1,)))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def _coalesce(self, db, row) -> bool:
+        """并入窗口内相同的日志；返回 False 表示未合并（未启用合并或待合并条目已达队列上限）"""
+        if self.coalesce_window <= 0:
+            return False
+        key = (db.pool_key,) + row[1:]
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is not None:
+                entry[2] += 1
+                self.coalesced += 1
+                return True
+            if len(self._pending) >= self._queue.maxsize:
+                return False
+            self._pending[key] = [db, row, 1, time.monotonic()]
+            return True
+
+    def _take_pending(self, everything: bool = False) -> list:
+        """取出窗口已结束的合并日志（everything 为 True 时全部取出），末列为 Repeat_Count"""
+        now = time.monotonic()
+        with self._lock:
+            keys = [key for key, entry in self._pending.items()
+                    if everything or now - entry[3] >= self.coalesce_window]
+            entries = [self._pending.pop(key) for key in keys]
+        return [(db, row + (count,)) for db, row, count, _ in entries]
+
+    def _write(self, records) -> bool:
+        """按数据库角色分组，每组一次 executemany；失败的组计入 failed"""
+        groups = {}
+        for db, row in records:
+            groups.setdefault(db.pool_key, (db, []))[1].append(row)
+        ok = True
+        for db, rows in groups.values():
+            try:
+                db.write_system_logs(rows)
+                with self._lock:
+                    self.written += len(rows)
+                    self.batches += 1
+            except Exception as e:
+                ok = False
+                with self._lock:
+                    self.failed += len(rows)
+                print(f"写入系统日志失败（{len(rows)} 条）: {e}")
+        return ok
+
+    # ================= 后台线程 =================
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-log', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, waiters = [], []
+            try:
+                # 队列为空时也定期醒来，写出窗口已结束的合并日志
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = _IDLE
+            if item is None:
+                stopping = True
+            elif item is not _IDLE:
+                deadline = time.monotonic() + self.flush_interval
+                # 攒一批：满 batch_size 条、到达 flush_interval 或遇到 flush 请求时写入
+                while True:
+                    if isinstance(item, threading.Event):
+                        waiters.append(item)
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+            batch.extend(self._take_pending())
+            if batch:
+                self._write(batch)
+            for event in waiters:
+                event.set()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        等待此前进入队列的日志全部写入；超时（含队列已满、无法在 timeout 内排入请求）返回 False
+        合并窗口中的日志在窗口结束时写入
+        """
+        if self.sync or self._thread is None:
+            return True
+        deadline = time.monotonic() + timeout
+        event = threading.Event()
+        try:
+            self._queue.put(event, timeout=timeout)
+        except queue.Full:
+            return False
+        return event.wait(max(0.0, deadline - time.monotonic()))
+
+    def close(self, timeout: float = 5.0) -> bool:
+        """
+        写完剩余日志（含未结束窗口的合并日志）并停止后台线程；之后的日志同步写入
+        :return: 后台线程是否在 timeout 内写完并停止；队列一直满时不再等待（未写出的日志随进程退出丢失）
+        """
+        if self._closed:
+            return True
+        deadline = time.monotonic() + timeout
+        self.flush(timeout)
+        self._closed = True
+        stopped = True
+        if self._thread is not None:
+            try:
+                self._queue.put(None, timeout=max(0.0, deadline - time.monotonic()))
+                self._thread.join(max(0.0, deadline - time.monotonic()))
+                stopped = not self._thread.is_alive()
+            except queue.Full:
+                stopped = False
+        pending = self._take_pending(everything=True)
+        if pending:
+            self._write(pending)
+        return stopped
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'queued': self._queue.qsize(), 'pending': len(self._pending), 'written': self.written,
+                    'coalesced': self.coalesced, 'dropped': self.dropped, 'failed': self.failed,
+                    'batches': self.batches, 'sync': self.sync}
+
+
+# ================= 进程级共享实例 =================
+_logger = AuditLogger(**AUDIT_LOG_CONFIG)
+atexit.register(_logger.close)
+
+
+def get_audit_logger() -> AuditLogger:
+    return _logger
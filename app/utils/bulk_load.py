@@ -0,0 +1,130 @@
+# app/utils/bulk_load.py
+"""
+批量导入（月度数万行的 History / Budget / Sales_Price）
+已校验、已计算的行先写入临时 CSV，用 LOAD DATA LOCAL INFILE 装入临时暂存表，
+再以一条 INSERT ... SELECT ... ON DUPLICATE KEY UPDATE 合并进目标表，整个过程一个事务。
+服务器或客户端未开启 local_infile、或账号没有 CREATE TEMPORARY TABLES 权限时，
+改为多行 INSERT ... VALUES 分批写入（pymysql 的 executemany 会把同一语句的多组参数合并为多行 VALUES）。
+需要的服务器设置与权限见 数据库建立/13_批量导入.sql。
+"""
+import os
+import tempfile
+from decimal import Decimal
+import pymysql
+from config import BULK_LOAD_BATCH
+
+# 暂存表名（临时表只对当前连接可见，连接关闭时自动删除）
+_STAGE_TABLE = '_bulk_stage'
+
+# 说明 LOCAL INFILE / 临时表不可用的错误码，遇到时改用多行 INSERT
+# 1044/1142 无权限，1148 命令不允许，2068 客户端拒绝 LOCAL INFILE，3948 服务器未开启 local_infile
+_UNSUPPORTED_ERRORS = {1044, 1142, 1148, 2068, 3948}
+
+
+def _csv_field(value) -> str:
+    """写入参数 -> CSV 字段：空值写为不带引号的 NULL，文本加双引号（内部双引号写两次），数值按十进制原样写出"""
+    if value is None or (isinstance(value, float) and value != value):
+        return 'NULL'
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    if isinstance(value, Decimal):
+        return format(value, 'f')
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    if isinstance(value, int):
+        return str(int(value))
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def write_csv(rows, path: str):
+    """写入与下面 LOAD DATA 子句对应的 CSV（逗号分隔、换行结尾、不使用转义字符）"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for row in rows:
+            f.write(','.join(_csv_field(v) for v in row))
+            f.write('\n')
+
+
+def _load_via_infile(conn, table: str, columns: list, update_columns: list, rows: list) -> int:
+    """暂存表 + LOAD DATA LOCAL INFILE + 一条合并语句；调用方负责提交"""
+    col_list = ', '.join(columns)
+    cursor = conn.cursor()
+    fd, path = tempfile.mkstemp(prefix='bulk_', suffix='.csv')
+    os.close(fd)
+    try:
+        # 暂存表：只复制列定义，不带索引（同一批内的重复键按 _seq 顺序合并，后出现的行生效）
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {_STAGE_TABLE}")
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {_STAGE_TABLE} (_seq INT AUTO_INCREMENT PRIMARY KEY) "
+            f"SELECT {col_list} FROM {table} LIMIT 0"
+        )
+        write_csv(rows, path)
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {_STAGE_TABLE} CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+            f"LINES TERMINATED BY '\\n' ({col_list})",
+            (path,)
+        )
+        # LOCAL 模式下类型转换问题只产生警告，这里按错误处理，保持与逐行 INSERT 相同的严格程度
+        cursor.execute("SHOW WARNINGS LIMIT 3")
+        warnings = cursor.fetchall()
+        if warnings:
+            raise ValueError(f"批量导入数据有误: {'; '.join(str(w[2]) for w in warnings)}")
+
+        updates = ', '.join(f"{c} = VALUES({c})" for c in update_columns)
+        cursor.execute(
+            f"INSERT INTO {table} ({col_list}) SELECT {col_list} FROM {_STAGE_TABLE} ORDER BY _seq "
+            f"ON DUPLICATE KEY UPDATE {updates}"
+        )
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {_STAGE_TABLE}")
+        return len(rows)
+    finally:
+        cursor.close()
+        os.remove(path)
+
+
+def _load_via_insert(conn, table: str, columns: list, update_columns: list, rows: list,
+                     batch_size: int) -> int:
+    """多行 INSERT ... VALUES 分批写入；调用方负责提交"""
+    placeholders = ', '.join(['%s'] * len(columns))
+    updates = ', '.join(f"{c} = VALUES({c})" for c in update_columns)
+    query = (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+             f"ON DUPLICATE KEY UPDATE {updates}")
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(query, rows[start:start + batch_size])
+        return len(rows)
+    finally:
+        cursor.close()
+
+
+def bulk_upsert(config: dict, table: str, columns: list, update_columns: list, rows: list,
+                batch_size: int = BULK_LOAD_BATCH) -> dict:
+    """
+    批量 UPSERT，全部成功才提交
+    :param config: 主库连接参数（使用单独的连接并开启客户端 local_infile，不影响连接池中的连接）
+    :param columns: 写入列，与 rows 中每行的顺序一致
+    :param update_columns: 主键 / 唯一键冲突时更新的列
+    :return: {'rows': 行数, 'method': 'load_data' 或 'insert'}
+    """
+    if not rows:
+        return {'rows': 0, 'method': None}
+    conn = pymysql.connect(**config, local_infile=True)
+    try:
+        try:
+            count = _load_via_infile(conn, table, columns, update_columns, rows)
+            method = 'load_data'
+        except pymysql.err.MySQLError as e:
+            conn.rollback()
+            if not e.args or e.args[0] not in _UNSUPPORTED_ERRORS:
+                raise
+            print(f"LOAD DATA LOCAL INFILE 不可用，改用多行 INSERT: {e}")
+            count = _load_via_insert(conn, table, columns, update_columns, rows, batch_size)
+            method = 'insert'
+        conn.commit()
+        return {'rows': count, 'method': method}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
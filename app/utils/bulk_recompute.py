@@ -0,0 +1,235 @@
+# app/utils/bulk_recompute.py
+"""
+全量重算（年终结算用）
+按 (Country, h_Time) 把 History/Budget/Display 的重算拆成若干分区，
+由进程池并行执行：每个工作进程持有独立的数据库连接，分区结果按块分事务写回；
+Display 由 refresh_display 存储过程按分区在服务端刷新。
+已完成的分区记录在检查点文件中，中断后再次运行会从未完成的分区继续。
+
+命令行用法（在 app 目录下执行）：
+    python -m utils.bulk_recompute --workers 4 --year 2026
+    python -m utils.bulk_recompute --restart          # 忽略检查点，全部重算
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+import pymysql
+
+from config import DB_CONFIG, BULK_RECOMPUTE_CHUNK
+from utils.sql_queries import (
+    Q_GET_RECOMPUTE_PARTITIONS, Q_GET_PARTITION_FACTS,
+    Q_UPSERT_HISTORY, Q_UPSERT_BUDGET, Q_REFRESH_DISPLAY,
+)
+from utils.financials import PARAMETER_SOURCES, prepare_parameter_table, compute_financials
+from utils.database import DatabaseManager
+
+# 默认检查点文件（位于 app 目录下）
+DEFAULT_CHECKPOINT = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bulk_recompute_checkpoint.json')
+
+# 写回目标：事实表 -> UPSERT 语句
+_FACT_UPSERTS = (('History', Q_UPSERT_HISTORY), ('Budget', Q_UPSERT_BUDGET))
+
+
+# ================= 检查点 =================
+def _partition_key(h_time, country) -> str:
+    return f"{h_time}|{country}"
+
+
+def load_checkpoint(path: str) -> dict:
+    """读取检查点：{'h_Time|Country': {rows, seconds, finished_at}}；文件不存在时返回空字典"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('finished', {})
+
+
+def _save_checkpoint(path: str, finished: dict):
+    """先写临时文件再替换，避免中断时留下半个文件"""
+    if not path:
+        return
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'finished': finished},
+                  f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+# ================= 工作进程 =================
+# 每个工作进程各自的连接与参数表（由 _init_worker 设置）
+_worker_conn = None
+_worker_tables = None
+
+
+def _init_worker(db_config: dict, tables: dict):
+    """进程池初始化：建立本进程的数据库连接，并接收主进程加载的参数快照"""
+    global _worker_conn, _worker_tables
+    _worker_conn = pymysql.connect(**db_config)
+    _worker_tables = tables
+
+
+def _read(conn, query: str, params=None) -> pd.DataFrame:
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        return pd.DataFrame(list(cursor.fetchall()), columns=[c[0] for c in cursor.description])
+    finally:
+        cursor.close()
+
+
+def _write_chunked(conn, query: str, rows: list, chunk_size: int):
+    """按块写入，每块一个事务"""
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(rows), chunk_size):
+            try:
+                cursor.executemany(query, rows[start:start + chunk_size])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        cursor.close()
+
+
+def recompute_partition(conn, tables: dict, h_time: str, country: str,
+                        chunk_size: int = BULK_RECOMPUTE_CHUNK) -> dict:
+    """
+    重算单个分区的 History/Budget/Display 并写回
+    UPSERT 可重复执行，分区中途失败后重跑不会产生重复数据
+    :return: 各表写入行数与耗时
+    """
+    started = time.perf_counter()
+    facts = {
+        fact: _read(conn, Q_GET_PARTITION_FACTS.format(table=fact), (h_time, country))
+        for fact, _ in _FACT_UPSERTS
+    }
+    result = {'h_Time': h_time, 'Country': country, 'History': 0, 'Budget': 0, 'Display': 0}
+    frames = [df.assign(_source=fact) for fact, df in facts.items() if not df.empty]
+    if frames:
+        # History/Budget 合并后只计算一次
+        df_calc = compute_financials(pd.concat(frames, ignore_index=True), tables)
+        for fact, sql in _FACT_UPSERTS:
+            rows = DatabaseManager._calculated_rows(df_calc[df_calc['_source'] == fact])
+            _write_chunked(conn, sql, rows, chunk_size)
+            result[fact] = len(rows)
+    # Display 由 Sales_Price 驱动，与事实表无关：整个分区在服务端刷新（也会移除已无价格的行）
+    cursor = conn.cursor()
+    try:
+        result['Display'] = cursor.execute(Q_REFRESH_DISPLAY, (h_time, country, None)) or 0
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _run_partition(task):
+    """进程池任务入口：task = (h_Time, Country, chunk_size)"""
+    h_time, country, chunk_size = task
+    return recompute_partition(_worker_conn, _worker_tables, h_time, country, chunk_size)
+
+
+# ================= 调度 =================
+def list_partitions(conn, year=None) -> list:
+    """列出需要重算的 (h_Time, Country) 分区，year 为空时为全部"""
+    if year:
+        where, params = "h_Time LIKE %s", (f"{year}-%",) * 4
+    else:
+        where, params = "1 = 1", None
+    df = _read(conn, Q_GET_RECOMPUTE_PARTITIONS.format(where=where), params)
+    return list(df.itertuples(index=False, name=None))
+
+
+def load_parameter_tables(conn) -> dict:
+    """加载一份参数快照，所有分区使用同一份参数计算"""
+    return {name: prepare_parameter_table(name, _read(conn, query))
+            for name, (_, query) in PARAMETER_SOURCES.items()}
+
+
+def run_bulk_recompute(db_config: dict = None, workers: int = None, year=None,
+                       checkpoint: str = DEFAULT_CHECKPOINT, restart: bool = False,
+                       chunk_size: int = BULK_RECOMPUTE_CHUNK, progress=None) -> pd.DataFrame:
+    """
+    全量重算入口
+    :param workers: 工作进程数，默认为 CPU 核数
+    :param year: 只重算某一年（如 2026），为空时重算全部
+    :param checkpoint: 检查点文件路径；为 None 时不记录、不续跑
+    :param restart: True 时忽略已有检查点，从头开始
+    :param progress: 回调 progress(已完成数, 分区总数, 分区结果)，分区失败时结果带 error 字段
+    :return: 本次运行各分区的行数与耗时
+    """
+    db_config = db_config or DB_CONFIG
+    workers = workers or os.cpu_count() or 1
+
+    conn = pymysql.connect(**db_config)
+    try:
+        partitions = list_partitions(conn, year)
+        tables = load_parameter_tables(conn)
+    finally:
+        conn.close()
+
+    finished = {} if restart else load_checkpoint(checkpoint)
+    pending = [p for p in partitions if _partition_key(*p) not in finished]
+    total, done = len(partitions), len(partitions) - len(pending)
+    records = []
+    if not pending:
+        return pd.DataFrame(records)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(db_config, tables)) as pool:
+        futures = {pool.submit(_run_partition, (h_time, country, chunk_size)): (h_time, country)
+                   for h_time, country in pending}
+        for future in as_completed(futures):
+            h_time, country = futures[future]
+            try:
+                record = future.result()
+                finished[_partition_key(h_time, country)] = {
+                    'rows': record['History'] + record['Budget'] + record['Display'],
+                    'seconds': record['seconds'],
+                    'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                }
+                _save_checkpoint(checkpoint, finished)
+            except Exception as e:
+                # 失败的分区不写检查点，下次运行时重试
+                record = {'h_Time': h_time, 'Country': country, 'error': str(e)}
+            done += 1
+            records.append(record)
+            if progress:
+                progress(done, total, record)
+
+    return pd.DataFrame(records)
+
+
+def _print_progress(done, total, record):
+    label = f"[{done}/{total}] {record['h_Time']} {record['Country']}"
+    if 'error' in record:
+        print(f"{label} 失败: {record['error']}")
+    else:
+        print(f"{label} History={record['History']} Budget={record['Budget']} "
+              f"Display={record['Display']} 用时 {record['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按国家 × 月份分区并行重算 History/Budget/Display")
+    parser.add_argument('--workers', type=int, default=None, help="工作进程数（默认 CPU 核数）")
+    parser.add_argument('--year', default=None, help="只重算指定年份，如 2026")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help="检查点文件路径")
+    parser.add_argument('--restart', action='store_true', help="忽略检查点，全部重算")
+    parser.add_argument('--chunk-size', type=int, default=BULK_RECOMPUTE_CHUNK, help="每个事务的最大行数")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    df = run_bulk_recompute(workers=args.workers, year=args.year, checkpoint=args.checkpoint,
+                            restart=args.restart, chunk_size=args.chunk_size, progress=_print_progress)
+    failed = int(df['error'].notna().sum()) if 'error' in df.columns else 0
+    print(f"完成 {len(df) - failed} 个分区，失败 {failed} 个，总用时 {time.perf_counter() - started:.1f}s")
+    if failed:
+        raise SystemExit(1)
@@ -0,0 +1,31 @@
+# app/utils/cache_regions.py
+"""
+按表划分的缓存区域
+每个缓存区域以数据库表名命名（如 "Costs"、"Exchange"、"System_Log"），
+写入某表后只清除该表对应区域中的缓存，取代全局的 st.cache_data.clear()：
+- 进程内各缓存层（查询缓存、参数快照、参考数据、情景基础数据）用 register_invalidator 登记，
+  按被写入的表名失效
+- 写入由 DatabaseManager._notify_tables_changed 统一通知；查看、导出等只读操作不清除任何缓存
+"""
+import threading
+
+_lock = threading.Lock()
+_invalidators = []      # 按表名失效的缓存层 fn(tables)，tables 为 None 时全部失效
+
+
+def register_invalidator(fn):
+    """登记一个缓存层的失效函数（重复登记忽略）"""
+    with _lock:
+        if fn not in _invalidators:
+            _invalidators.append(fn)
+
+
+def invalidate_regions(tables=None):
+    """
+    清除指定表对应区域中的缓存
+    :param tables: 被写入的表名集合；为 None 时清除全部区域
+    """
+    with _lock:
+        invalidators = list(_invalidators)
+    for fn in invalidators:
+        fn(tables)
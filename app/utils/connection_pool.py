@@ -0,0 +1,183 @@
+# app/utils/connection_pool.py
+"""
+数据库连接池（进程级，线程安全）
+每个数据库角色（DB_ROLE_USERS 中的账号）一个连接池，所有 Streamlit 会话共享；
+每次数据库操作借出一条连接、结束后归还，避免每次渲染页面都重新握手和认证。
+- 最大连接数：借出 + 空闲 不超过 max_size，已满时等待其他会话归还
+- 空闲回收：空闲超过 max_idle_seconds 的连接被关闭
+- 存活检查：空闲超过 ping_after_seconds 的连接借出前先 ping，失效则重建
+- 建立连接：默认 pymysql.connect(**config)，嵌入式后端传入自己的 connect 函数（见 utils/sqlite_backend）
+- 配置变更：get_pool 以新池替换旧池，旧池停用（retire），之后归还到旧池的连接直接关闭
+"""
+import threading
+import time
+from contextlib import contextmanager
+import pymysql
+from config import POOL_CONFIG
+
+
+class PoolTimeout(Exception):
+    """连接池已满且在等待时间内没有连接归还"""
+
+
+class ConnectionPool:
+    def __init__(self, config: dict, max_size: int = 10, max_idle_seconds: float = 300,
+                 ping_after_seconds: float = 30, checkout_timeout: float = 10, connect=None):
+        self.config = dict(config)
+        self.connect = connect or pymysql.connect
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self.ping_after_seconds = ping_after_seconds
+        self.checkout_timeout = checkout_timeout
+        self._idle = []          # [(连接, 归还时间)]，末尾为最近归还
+        self._in_use = 0
+        self._retired = False    # 已被新池替换：归还的连接关闭而不再放回空闲列表
+        self._cond = threading.Condition()
+
+    # ================= 借出 / 归还 =================
+    def acquire(self):
+        """借出一条可用连接；池满时最多等待 checkout_timeout 秒"""
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            while True:
+                self._evict_idle()
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.max_size:
+                    conn, returned_at = None, None
+                    self._in_use += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"连接池已满（{self.max_size}），等待 {self.checkout_timeout} 秒后仍无可用连接")
+                self._cond.wait(remaining)
+
+        # 建立连接与 ping 在锁外进行，不阻塞其他会话
+        try:
+            if conn is not None and time.monotonic() - returned_at >= self.ping_after_seconds:
+                conn = self._check_alive(conn)
+            return conn or self.connect(**self.config)
+        except Exception:
+            self._release_slot()
+            raise
+
+    def release(self, conn, discard: bool = False):
+        """
+        归还连接：先回滚未提交的事务（结束一致性读快照，下次借出能读到最新数据）；
+        回滚失败、discard=True 或池已停用时直接关闭
+        """
+        if not discard:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            discard = discard or self._retired
+            if not discard:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if discard:
+            self._close(conn)
+
+    @contextmanager
+    def connection(self):
+        """with pool.connection() as conn: ... 结束时自动归还；连接已断开时丢弃"""
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, discard=not conn.open)
+            raise
+        else:
+            self.release(conn)
+
+    # ================= 维护 =================
+    def _check_alive(self, conn):
+        """ping 失败的连接关闭并返回 None（由调用方新建）"""
+        try:
+            conn.ping(reconnect=False)
+            return conn
+        except Exception:
+            self._close(conn)
+            return None
+
+    def _evict_idle(self):
+        """关闭空闲过久的连接（调用方持有锁）"""
+        now = time.monotonic()
+        keep = []
+        for conn, returned_at in self._idle:
+            if now - returned_at > self.max_idle_seconds:
+                self._close(conn)
+            else:
+                keep.append((conn, returned_at))
+        self._idle = keep
+
+    def _release_slot(self):
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        """关闭全部空闲连接（借出中的连接在归还时照常进入空闲列表）"""
+        with self._cond:
+            for conn, _ in self._idle:
+                self._close(conn)
+            self._idle = []
+
+    def retire(self):
+        """
+        停用连接池（被 get_pool 替换时调用）：关闭全部空闲连接，借出中的连接归还时关闭；
+        仍持有旧池的调用方可以继续借出，新建的连接同样在归还时关闭
+        """
+        with self._cond:
+            self._retired = True
+        self.close_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {'in_use': self._in_use, 'idle': len(self._idle), 'max_size': self.max_size}
+
+
+# ================= 按数据库角色共享的连接池 =================
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key: str, config: dict, connect=None) -> ConnectionPool:
+    """
+    获取（必要时创建）某个数据库账号的连接池
+    :param key: 池的标识（数据库角色名，未启用角色时为 'default'）
+    :param connect: 建立连接的函数，默认 pymysql.connect
+    """
+    connect = connect or pymysql.connect
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.config != config or pool.connect is not connect:
+            if pool is not None:
+                pool.retire()
+            pool = ConnectionPool(config, connect=connect, **POOL_CONFIG)
+            _pools[key] = pool
+        return pool
+
+
+def close_all_pools():
+    """关闭所有连接池的空闲连接"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+
+
+def pool_stats() -> dict:
+    """各连接池的借出 / 空闲连接数"""
+    with _pools_lock:
+        return {key: pool.stats() for key, pool in _pools.items()}
@@ -1,69 +1,513 @@
 # app/utils/database.py
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+import json
+import re
+import threading
+import time
 import pymysql
+import pymysql.cursors
+from pymysql.constants import ER
 import pandas as pd
 import streamlit as st
-from config import DB_CONFIG, DB_BASE_CONFIG, DB_ROLE_USERS, USE_DB_ROLES, ROLES
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from config import (
+    DB_CONFIG, DB_BASE_CONFIG, DB_ROLE_USERS, USE_DB_ROLES, ROLES, DB_REPLICA_CONFIG, REPLICA_STICKY_SECONDS,
+    DB_BACKEND, SQLITE_PATH, STREAM_CHUNK_SIZE, QUERY_BATCH_WORKERS, UNIT_OF_WORK_CHUNK, BULK_LOAD_MIN_ROWS
+)
 from utils.sql_queries import *
+from utils.financials import (
+    get_parameter_snapshot, invalidate_parameter_snapshot, compute_financials, financial_components
+)
+from utils.scenario import get_scenario_base, invalidate_scenario_base, run_scenario
+from utils.money import money_decimals
+from utils.connection_pool import get_pool
+from utils.typed_fetch import fetch_frame, rows_to_frame, CATEGORY_COLUMNS
+from utils.query_cache import get_query_cache, invalidate_query_cache, cache_key, read_tables, referenced_tables
+from utils.table_versions import get_table_version_tracker
+from utils.bulk_load import bulk_upsert
+from utils import sqlite_backend
+from utils.reference_data import get_reference_data, invalidate_reference_data
+from utils.audit_log import get_audit_logger
+from utils.cache_regions import register_invalidator, invalidate_regions
+from utils.parquet_mirror import get_parquet_mirror, decimal_columns, MIRROR_TABLES
+
+# 按表失效的进程内缓存层：参数快照、参考数据、情景基础数据、查询缓存
+for _invalidate in (invalidate_parameter_snapshot, invalidate_reference_data,
+                    invalidate_scenario_base, invalidate_query_cache):
+    register_invalidator(_invalidate)
+
+# 写操作语句的目标表（INSERT/REPLACE/UPDATE/DELETE）
+_WRITE_TARGET_RE = re.compile(
+    r"^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)`?",
+    re.IGNORECASE
+)
+_CALL_TARGET_RE = re.compile(r"^\s*CALL\s+`?(\w+)`?", re.IGNORECASE)
+
+# 表名规范化（MySQL脚本中存在小写写法，如 sales_price）
+KNOWN_TABLES = {name.lower(): name for name in [
+    'Country', 'Model', 'Exchange', 'Sales_Price', 'Costs',
+    'Ratio_Expenses1', 'Ratio_Expenses2', 'Ratio_Expenses3', 'Regional_Expenses',
+    'History', 'Budget', 'Display', 'System_Log'
+]}
+
+
+def written_tables(query: str) -> set:
+    """解析写语句涉及的表名（存储过程按 PROCEDURE_WRITES）"""
+    call = _CALL_TARGET_RE.match(query or '')
+    if call:
+        return set(PROCEDURE_WRITES.get(call.group(1).lower(), ()))
+    match = _WRITE_TARGET_RE.match(query or '')
+    if not match:
+        return set()
+    name = match.group(1)
+    return {KNOWN_TABLES.get(name.lower(), name)}
+
+class UnitOfWork:
+    """
+    写入单元：排队的语句由 DatabaseManager.unit_of_work 在退出时一次性执行并只提交一次
+    相邻的同一条参数化语句合并为一组，按 chunk_size 分块 executemany；语句之间保持加入的顺序
+    """
+
+    def __init__(self, chunk_size: int = UNIT_OF_WORK_CHUNK):
+        self.chunk_size = chunk_size
+        self.rowcount = 0
+        self._batches = []      # [(语句, 参数列表)]；无参数的语句参数为 None
+        self._callbacks = []
+        self._tables = set()
+        self._unknown_target = False
+
+    def add(self, query: str, params=None):
+        """排队一条语句"""
+        if params is None:
+            self._batches.append((query, None))
+            self._track(query)
+        else:
+            self.add_many(query, [params])
+
+    def add_many(self, query: str, rows):
+        """排队同一语句的多组参数"""
+        rows = list(rows)
+        if not rows:
+            return
+        last = self._batches[-1] if self._batches else None
+        if last is not None and last[0] == query and last[1] is not None:
+            last[1].extend(rows)
+        else:
+            self._batches.append((query, rows))
+        self._track(query)
+
+    def on_commit(self, callback):
+        """提交成功后执行的回调（如重算受影响的计算结果）"""
+        self._callbacks.append(callback)
+
+    def _track(self, query: str):
+        tables = written_tables(query)
+        self._tables |= tables
+        self._unknown_target = self._unknown_target or not tables
+
+    @property
+    def empty(self) -> bool:
+        return not self._batches
+
+    def written(self):
+        """被写入的表名集合；含无法解析目标表的语句时为 None"""
+        return None if self._unknown_target else set(self._tables)
+
+    def execute(self, conn):
+        """在给定连接上执行全部语句（不提交）"""
+        cursor = conn.cursor()
+        try:
+            for query, rows in self._batches:
+                if rows is None:
+                    self.rowcount += cursor.execute(query) or 0
+                    continue
+                for start in range(0, len(rows), self.chunk_size):
+                    self.rowcount += cursor.executemany(query, rows[start:start + self.chunk_size]) or 0
+        finally:
+            cursor.close()
+
+    def run_callbacks(self):
+        for callback in self._callbacks:
+            callback()
+
+
+def _access_denied(error) -> bool:
+    """当前数据库账号对表 / 列没有权限"""
+    return isinstance(error, pymysql.err.OperationalError) and error.args[0] in (
+        ER.TABLEACCESS_DENIED_ERROR, ER.COLUMNACCESS_DENIED_ERROR
+    )
+
+
+def _sql_float(value):
+    """数值转写入参数：空值 / NaN 写 NULL"""
+    return None if pd.isna(value) else float(value)
+
 
 class DatabaseManager:
     def __init__(self, role: str = None):
         self.role = role
-        self.connection = None
-        # 连接逻辑
-        if USE_DB_ROLES and role and role in DB_ROLE_USERS:
+        self.backend = DB_BACKEND
+        if self.backend == 'sqlite':
+            # 嵌入式后端：没有数据库账号，所有角色共用一个库与连接池
+            self.config = {'database': SQLITE_PATH}
+            self.pool_key = 'sqlite'
+            self.pool = get_pool(self.pool_key, self.config, connect=sqlite_backend.connect)
+        # 连接逻辑：同一数据库角色的所有会话共享一个连接池
+        elif USE_DB_ROLES and role and role in DB_ROLE_USERS:
             self.config = {**DB_BASE_CONFIG, **DB_ROLE_USERS[role]}
+            self.pool_key = role
+            self.pool = get_pool(self.pool_key, self.config)
         else:
             self.config = DB_CONFIG
+            self.pool_key = 'default'
+            self.pool = get_pool(self.pool_key, self.config)
+        # 读写分离：配置了只读库时 SELECT 走只读库的连接池，否则与主库相同
+        if DB_REPLICA_CONFIG and self.backend == 'mysql':
+            self.read_pool = get_pool(f"{self.pool_key}@replica", {**self.config, **DB_REPLICA_CONFIG})
+        else:
+            self.read_pool = self.pool
+        self._recent_writes = {}    # 不在 Streamlit 会话中时，本实例的写入记录
 
-    def connect(self) -> bool:
+    @contextmanager
+    def checkout(self, read_query: str = None):
+        """
+        从连接池借出连接，操作结束后归还；连接已断开时丢弃
+        :param read_query: 只读查询时传入其 SQL，按读写分离规则借出只读库或主库的连接
+        """
+        pools = [self.pool]
+        if read_query is not None and self.routes_to_replica(read_query):
+            pools.insert(0, self.read_pool)
+        for pool in pools:
+            try:
+                conn = pool.acquire()
+                break
+            except Exception as e:
+                if pool is self.pool:
+                    st.error(f"连接失败: {e}")
+                    raise
+                # 只读库不可用时回退到主库
+                print(f"只读库连接失败，改用主库: {e}")
         try:
-            if self.connection and self.connection.open: return True
-            self.connection = pymysql.connect(**self.config)
+            yield conn
+        except BaseException:
+            # 含 GeneratorExit（流式查询提前结束）
+            pool.release(conn, discard=not conn.open)
+            raise
+        else:
+            pool.release(conn)
+
+    # ================= 读写分离 =================
+    def _session_writes(self) -> dict:
+        """本会话的写入记录 {表名: time.monotonic()}，'*' 表示目标表未知的写入"""
+        if get_script_run_ctx(suppress_warning=True) is not None:
+            return st.session_state.setdefault('_db_recent_writes', {})
+        return self._recent_writes
+
+    def routes_to_replica(self, query: str) -> bool:
+        """
+        只读查询是否走只读库：未配置只读库时为 False；
+        本会话最近 REPLICA_STICKY_SECONDS 秒内写过该查询读取的表（或无法确定读取哪些表）时走主库，保证读己之写
+        """
+        if self.read_pool is self.pool:
+            return False
+        now = time.monotonic()
+        recent = {t for t, at in self._session_writes().items() if now - at < REPLICA_STICKY_SECONDS}
+        if not recent:
             return True
-        except Exception as e:
-            st.error(f"连接失败: {e}")
+        if '*' in recent:
             return False
+        tables = referenced_tables(query, KNOWN_TABLES)
+        return tables is not None and not tables & recent
 
-    def execute_query(self, query: str, params: tuple = None) -> pd.DataFrame:
-        if not self.connect(): return pd.DataFrame()
+    def connect(self) -> bool:
+        """检查数据库是否可连接"""
         try:
-            return pd.read_sql(query, self.connection, params=params)
+            with self.checkout():
+                return True
+        except Exception:
+            return False
+
+    def execute_query(self, query: str, params: tuple = None, use_cache: bool = True) -> pd.DataFrame:
+        """
+        执行查询；结果按 (数据库角色, SQL, 参数) 缓存，写入相关表后自动失效（见 utils/query_cache）
+        :param use_cache: False 时直接查询数据库，也不写入缓存
+        """
+        cache = get_query_cache()
+        tables = read_tables(query, KNOWN_TABLES) if use_cache else None
+        if tables:
+            self.sync_table_versions()
+            # 只读库的结果在相关表刚被写入时可能尚未同步，暂不缓存
+            min_age = REPLICA_STICKY_SECONDS if self.routes_to_replica(query) else 0.0
+        key = cache_key(self.pool_key, query, params) if tables else None
+        if key is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+            versions = cache.versions(tables)
+        try:
+            df = self.fetch_typed(query, params)
         except Exception as e:
             print(f"查询错误: {e}")
             return pd.DataFrame()
+        if key is not None:
+            cache.put(key, df, tables, versions, min_age)
+        return df
+
+    def fetch_typed(self, query: str, params: tuple = None, decimals: str = 'float',
+                    categories=None) -> pd.DataFrame:
+        """
+        类型化读取（见 utils/typed_fetch）：按字段类型直接构造紧凑的列，出错时抛出异常
+        :param decimals: 'float' DECIMAL 读为 float64；'cents' 读为定点整数（分）
+        :param categories: 读取为 category 的列名（如 typed_fetch.CATEGORY_COLUMNS），默认不转换
+        """
+        with self.checkout(read_query=query) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, params)
+                return fetch_frame(cursor, decimals, categories=categories)
+            finally:
+                cursor.close()
+
+    def stream_query(self, query: str, params: tuple = None, chunk_size: int = STREAM_CHUNK_SIZE,
+                     as_arrays: bool = False):
+        """
+        流式查询：服务端无缓冲游标（SSCursor）逐块读取，内存占用与结果总行数无关
+        :param chunk_size: 每块行数
+        :param as_arrays: False 时每块为 DataFrame；True 时为 {列名: numpy 数组}
+        用法：for df in db.stream_query(sql, params): ...
+        迭代期间占用一条连接；中途停止迭代时该连接直接断开，不再读完剩余结果
+        """
+        with self.checkout(read_query=query) as conn:
+            cursor = conn.cursor(pymysql.cursors.SSCursor)
+            reading = False
+            try:
+                cursor.execute(query, params)
+                reading = True
+                columns = [c[0] for c in cursor.description]
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    chunk = rows_to_frame(cursor.description, rows)
+                    if as_arrays:
+                        yield {col: chunk.iloc[:, i].array for i, col in enumerate(columns)}
+                    else:
+                        yield chunk
+                reading = False
+            finally:
+                if reading:
+                    conn.close()
+                else:
+                    cursor.close()
+
+    # ================= 并发查询 =================
+    def run_concurrently(self, calls, max_workers: int = QUERY_BATCH_WORKERS) -> list:
+        """
+        并发执行一组互不依赖的数据库调用，各自从连接池借出连接，总耗时取决于最慢的一个
+        :param calls: 无参可调用对象列表，如 [db.get_all_models, lambda: db.get_country_summary(t)]
+        :return: 与 calls 顺序一致的结果；任一调用抛出异常时在此重新抛出
+        """
+        calls = list(calls)
+        if len(calls) <= 1:
+            return [call() for call in calls]
+        # 工作线程沿用当前页面的 ScriptRunContext，st.error 等提示仍显示在本页
+        ctx = get_script_run_ctx(suppress_warning=True)
+
+        def run(call):
+            if ctx is not None:
+                add_script_run_ctx(threading.current_thread(), ctx)
+            return call()
+
+        workers = max(1, min(max_workers, len(calls), self.pool.max_size))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='db-batch') as executor:
+            futures = [executor.submit(run, call) for call in calls]
+            return [future.result() for future in futures]
+
+    def execute_queries(self, queries, max_workers: int = QUERY_BATCH_WORKERS):
+        """
+        并发执行多条互不依赖的查询
+        :param queries: [sql 或 (sql, params)] 列表，或 {名称: sql 或 (sql, params)} 字典
+        :return: 对应的 DataFrame 列表 / 字典；单条查询失败时该项为空 DataFrame（同 execute_query）
+        """
+        named = isinstance(queries, dict)
+        items = list(queries.items()) if named else list(enumerate(queries))
+
+        def call(item):
+            query, params = (item, None) if isinstance(item, str) else item
+            return lambda: self.execute_query(query, params)
+
+        frames = self.run_concurrently([call(item) for _, item in items], max_workers)
+        if named:
+            return {key: df for (key, _), df in zip(items, frames)}
+        return frames
 
     def execute_update(self, query: str, params: tuple = None) -> bool:
-        if not self.connect(): return False
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(query, params)
-            self.connection.commit()
-            cursor.close()
+            with self.unit_of_work() as uow:
+                uow.add(query, params)
             return True
         except Exception as e:
             st.error(f"更新失败: {e}")
             return False
 
+    @contextmanager
+    def unit_of_work(self, chunk_size: int = UNIT_OF_WORK_CHUNK):
+        """
+        写入单元：块内排队的语句在退出时一次发送、只提交一次，任一语句失败则全部回滚并抛出异常；
+        块内抛出异常时不发送任何语句
+        用法：
+            with db.unit_of_work() as uow:
+                uow.add(sql, params)
+                uow.add_many(sql, rows)
+                uow.on_commit(lambda: db.recompute_dependents(...))
+        """
+        uow = UnitOfWork(chunk_size)
+        yield uow
+        if uow.empty:
+            return
+        with self.checkout() as conn:
+            try:
+                uow.execute(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        # 无法解析目标表的写语句：使全部缓存失效
+        self._notify_tables_changed(uow.written())
+        uow.run_callbacks()
+
+    def _notify_tables_changed(self, tables):
+        """
+        本会话写入成功后调用：记录写入（读己之写），并通知各缓存层
+        :param tables: 被写入的表名集合；为 None 时全部失效
+        """
+        if tables is None or tables:
+            writes = self._session_writes()
+            now = time.monotonic()
+            for t in (tables if tables is not None else ['*']):
+                writes[t] = now
+            get_parquet_mirror().mark_stale(tables)
+            self._invalidate_caches(tables)
+
+    def _invalidate_caches(self, tables):
+        """只清除被写入表对应的缓存区域（见 utils/cache_regions）；tables 为 None 时全部失效"""
+        if tables is None or tables:
+            invalidate_regions(tables)
+
+    def sync_table_versions(self, force: bool = False):
+        """
+        轮询 Table_Version（默认最多每 poll_interval 秒一次），使其他进程 / 直接 SQL 修改过的表的缓存失效
+        :param force: True 时立即轮询（如导出前确认数据最新）
+        """
+        changed = get_table_version_tracker().poll(
+            lambda: self.fetch_typed(Q_GET_TABLE_VERSIONS), force=force
+        )
+        if changed is None or changed:
+            self._invalidate_caches(changed)
+
+    def table_versions(self, tables=None, refresh: bool = False) -> dict:
+        """
+        各表当前版本号（见 utils/table_versions），缓存层据此判断数据是否新鲜而无需重新读取数据
+        :param refresh: True 时先轮询一次
+        """
+        if refresh:
+            self.sync_table_versions(force=True)
+        return get_table_version_tracker().versions(tables)
+
+    # ================= 分析查询（Parquet 快照） =================
+    def analytics_query(self, query: str, params: tuple = None) -> pd.DataFrame:
+        """
+        分析查询（汇总、透视、对比）：只读取快照中的表 / 视图且本角色的快照未过期时，
+        在 Parquet 快照上用 DuckDB 执行（见 utils/parquet_mirror）；
+        否则查询数据库，并在后台刷新过期的快照
+        """
+        mirror = get_parquet_mirror()
+        tables = mirror.servable_tables(query, self.pool_key)
+        if tables:
+            self.sync_table_versions()
+            stale = mirror.stale_tables(tables, self.pool_key, self.table_versions(tables))
+            if not stale:
+                try:
+                    return mirror.query(query, params, tables, self.pool_key)
+                except Exception as e:
+                    print(f"快照查询失败，改查数据库: {e}")
+            else:
+                self.refresh_snapshots(stale, background=True)
+            mirror.record_miss()
+        return self.execute_query(query, params)
+
+    def refresh_snapshots(self, tables=None, background: bool = False) -> bool:
+        """
+        以本角色的账号从主库导出快照（正在导出、无权读取或刚导出失败的表跳过）
+        :param tables: 表名列表，None 时导出 parquet_mirror.MIRROR_TABLES 全部
+        :param background: True 时在后台线程导出，立即返回
+        """
+        mirror = get_parquet_mirror()
+        if not mirror.available:
+            return False
+        tables = mirror.exportable([t for t in (tables or MIRROR_TABLES) if t in MIRROR_TABLES], self.pool_key)
+        if not tables:
+            return False
+        if background:
+            threading.Thread(target=self.refresh_snapshots, args=(tables,), daemon=True).start()
+            return True
+        ok = True
+        # 先取版本号再读数据：读取期间的写入会使版本号变化，快照随即过期
+        self.sync_table_versions(force=True)
+        for table in tables:
+            mark = mirror.begin_export(table, self.pool_key)
+            if mark is None:
+                continue
+            failed = denied = False
+            try:
+                version = get_table_version_tracker().versions([table])[table]
+                with self.checkout() as conn:
+                    cursor = conn.cursor()
+                    try:
+                        cursor.execute(f"SELECT * FROM {table}")
+                        description = cursor.description
+                        # 维度列读为 category，Parquet 中按字典编码存储
+                        df = fetch_frame(cursor, categories=CATEGORY_COLUMNS)
+                    finally:
+                        cursor.close()
+                mirror.write_snapshot(table, self.pool_key, df, decimal_columns(description), version, mark)
+            except Exception as e:
+                failed, ok, denied = True, False, _access_denied(e)
+                print(f"导出快照失败 {table}: {e}")
+            finally:
+                mirror.end_export(table, self.pool_key, failed, denied)
+        return ok
+
     def get_time_series_data(self):
         """首页仪表盘数据源"""
         return self.execute_query(Q_GET_TIME_SERIES)
 
+    # ================= 参考数据（进程级缓存，见 utils/reference_data） =================
+    def _reference_data(self, name: str):
+        self.sync_table_versions()
+        return get_reference_data(name, lambda q: self.execute_query(q, use_cache=False), self.pool_key)
+
     def get_all_models(self):
         """获取所有产品型号"""
-        df = self.execute_query("SELECT DISTINCT Model FROM Model ORDER BY Model")
-        return df['Model'].tolist() if not df.empty else []
+        return self._reference_data('models')
 
     def get_all_countries(self):
         """获取所有国家"""
-        df = self.execute_query("SELECT DISTINCT Country FROM Country ORDER BY Country")
-        return df['Country'].tolist() if not df.empty else []
+        return self._reference_data('countries')
 
     def get_all_time_periods(self):
-        """获取所有时间周期（改为从Display表获取）"""
-        # 将 History 改为 Display
-        df = self.execute_query("SELECT DISTINCT h_Time FROM Display ORDER BY h_Time DESC")
-        return df['h_Time'].tolist() if not df.empty else []
+        """获取所有时间周期（从Display表获取）"""
+        return self._reference_data('time_periods')
+
+    def get_model_info(self) -> pd.DataFrame:
+        """型号元数据（Model, Series, Model_label）"""
+        return self._reference_data('model_info')
+
+    def get_country_info(self) -> pd.DataFrame:
+        """国家元数据（Country, Market）"""
+        return self._reference_data('country_info')
 
     def insert_system_log(self, action_type, details, username=None, role=None):
         """
@@ -76,21 +520,15 @@ class DatabaseManager:
         - role: 角色（可选，默认从session获取）
         
         返回:
-        - bool: 插入是否成功
+        - bool: 已进入写入队列（同步模式下为插入是否成功）
         """
         try:
             # 从session_state获取用户信息（如果未提供）
             username = username or st.session_state.get('username', 'unknown')
             role = role or st.session_state.get('role', 'unknown')
             
-            # 构建插入语句 - Log_Time使用数据库的CURRENT_TIMESTAMP
-            query = """
-            INSERT INTO System_Log (Username, Role, Action_Type, Details)
-            VALUES (%s, %s, %s, %s)
-            """
-            
-            params = (username, role, action_type, details)
-            success = self.execute_update(query, params)
+            # 放入异步日志队列，由后台线程批量写入（见 utils/audit_log）
+            success = get_audit_logger().log(self, username, role, action_type, details)
             
             if not success:
                 print(f"日志插入失败: {username}, {role}, {action_type}, {details}")
@@ -100,58 +538,98 @@ class DatabaseManager:
         except Exception as e:
             print(f"插入系统日志失败: {e}")
             return False
+
+    def write_system_logs(self, rows):
+        """批量写入日志行 (Log_Time, Username, Role, Action_Type, Details, Repeat_Count)，一个事务，失败时抛出异常"""
+        with self.unit_of_work() as uow:
+            uow.add_many(Q_LOG_ACTION_AT, rows)
     # ================= 新增：删除功能 =================
-    def delete_history_data(self, h_time, country, model):
+    # 传入 uow（unit_of_work）时只排队删除语句，随该写入单元一起提交，重算在提交后进行
+    def delete_history_data(self, h_time, country, model, uow=None):
         """删除历史数据（History表）"""
         try:
             query = "DELETE FROM History WHERE h_Time = %s AND Country = %s AND Model = %s"
+            if uow is not None:
+                uow.add(query, (h_time, country, model))
+                return True
             return self.execute_update(query, (h_time, country, model))
         except Exception as e:
             st.error(f"删除历史数据失败: {e}")
             return False
 
-    def delete_budget_data(self, h_time, country, model):
+    def delete_budget_data(self, h_time, country, model, uow=None):
         """删除预算数据（Budget表）"""
         try:
             query = "DELETE FROM Budget WHERE h_Time = %s AND Country = %s AND Model = %s"
+            if uow is not None:
+                uow.add(query, (h_time, country, model))
+                return True
             return self.execute_update(query, (h_time, country, model))
         except Exception as e:
             st.error(f"删除预算数据失败: {e}")
             return False
 
-    def delete_sales_price(self, record_id):
+    def delete_sales_price(self, record_id, uow=None):
         """删除销售价格记录（Sales_Price表）"""
         try:
+            df_key = self.execute_query("SELECT Model, Country, h_Time FROM Sales_Price WHERE id = %s", (record_id,))
             query = "DELETE FROM Sales_Price WHERE id = %s"
-            return self.execute_update(query, (record_id,))
+            keys = df_key.to_dict('records')
+            if uow is not None:
+                uow.add(query, (record_id,))
+                uow.on_commit(lambda: self.recompute_dependents('Sales_Price', keys))
+                return True
+            if not self.execute_update(query, (record_id,)):
+                return False
+            # 删除后重算受影响的计算结果
+            return self.recompute_dependents('Sales_Price', keys)
         except Exception as e:
             st.error(f"删除销售价格失败: {e}")
             return False
 
-    def delete_costs_data(self, costs_id=None, model=None, country=None, costs_time=None):
+    def delete_costs_data(self, costs_id=None, model=None, country=None, costs_time=None, uow=None):
         """增强的删除成本数据方法，支持多种删除方式"""
         try:
             if costs_id:
                 query = "DELETE FROM Costs WHERE Costs_id = %s"
                 params = (costs_id,)
+                keys = self.execute_query(
+                    "SELECT Model, Country, Costs_time FROM Costs WHERE Costs_id = %s", params
+                ).to_dict('records')
             elif model and country and costs_time:
                 query = "DELETE FROM Costs WHERE Model = %s AND Country = %s AND Costs_time = %s"
                 params = (model, country, costs_time)
+                keys = [{'Model': model, 'Country': country, 'Costs_time': costs_time}]
             else:
                 st.error("删除成本数据需要提供ID或(型号+国家+时间)")
                 return False
             
-            return self.execute_update(query, params)
+            if uow is not None:
+                uow.add(query, params)
+                uow.on_commit(lambda: self.recompute_dependents('Costs', keys))
+                return True
+            if not self.execute_update(query, params):
+                return False
+            # 删除后重算受影响的计算结果
+            return self.recompute_dependents('Costs', keys)
             
         except Exception as e:
             st.error(f"删除成本数据失败: {e}")
             return False
 
-    def delete_regional_expenses(self, country, expenses_time):
+    def delete_regional_expenses(self, country, expenses_time, uow=None):
         """删除区域费用（Regional_Expenses表）"""
         try:
             query = "DELETE FROM Regional_Expenses WHERE Country = %s AND Expenses_time = %s"
-            return self.execute_update(query, (country, expenses_time))
+            key = {'Country': country, 'Expenses_time': expenses_time}
+            if uow is not None:
+                uow.add(query, (country, expenses_time))
+                uow.on_commit(lambda: self.recompute_dependents('Regional_Expenses', key))
+                return True
+            if not self.execute_update(query, (country, expenses_time)):
+                return False
+            # 删除后重算受影响的计算结果
+            return self.recompute_dependents('Regional_Expenses', key)
         except Exception as e:
             st.error(f"删除区域费用失败: {e}")
             return False
@@ -219,7 +697,7 @@ class DatabaseManager:
         使用Display表作为预测数据，Budget表作为预算数据
         """
         if time_period:
-            return self.execute_query("""
+            return self.analytics_query("""
                 SELECT d.h_Time, d.Country, d.Model, 
                        d.Sales as 预测销量, b.Sales as 预算销量,
                        d.Revenues as 预测收入, b.Revenues as 预算收入,
@@ -230,7 +708,7 @@ class DatabaseManager:
                 WHERE d.h_Time = %s
             """, (time_period,))
         else:
-            return self.execute_query("""
+            return self.analytics_query("""
                 SELECT d.h_Time, d.Country, d.Model, 
                        d.Sales as 预测销量, b.Sales as 预算销量,
                        d.Revenues as 预测收入, b.Revenues as 预算收入,
@@ -243,7 +721,7 @@ class DatabaseManager:
     def get_country_summary(self, time_period=None):
         """获取国家汇总数据（改用Display作为预测数据）"""
         if time_period:
-            return self.execute_query("""
+            return self.analytics_query("""
                 SELECT Country, 
                        SUM(Sales) as 总销量,
                        SUM(Revenues) as 总收入,
@@ -255,7 +733,7 @@ class DatabaseManager:
                 ORDER BY 总收入 DESC
             """, (time_period,))
         else:
-            return self.execute_query("""
+            return self.analytics_query("""
                 SELECT Country, 
                        SUM(Sales) as 总销量,
                        SUM(Revenues) as 总收入,
@@ -269,7 +747,7 @@ class DatabaseManager:
     def get_model_summary(self, time_period=None):
         """获取产品汇总数据（改用Display）"""
         if time_period:
-            return self.execute_query("""
+            return self.analytics_query("""
                 SELECT Model, 
                        SUM(Sales) as 总销量,
                        SUM(Revenues) as 总收入,
@@ -281,7 +759,7 @@ class DatabaseManager:
                 ORDER BY 总收入 DESC
             """, (time_period,))
         else:
-            return self.execute_query("""
+            return self.analytics_query("""
                 SELECT Model, 
                        SUM(Sales) as 总销量,
                        SUM(Revenues) as 总收入,
@@ -297,141 +775,54 @@ class DatabaseManager:
         """获取汇率表用于货币转换"""
         return self.execute_query(Q_GET_EXCHANGE_RATES)
 
-    # ================= 核心：财务公式自动计算（保留V1结构，但集成V2的去重和缺失值处理） =================
-    def calculate_financials(self, df_input: pd.DataFrame) -> pd.DataFrame:
-        """根据《计算公式.docx》实现全链路自动计算，集成数据去重和缺失值处理"""
+    # ================= 核心：财务公式自动计算（列式引擎，见 utils/financials.py） =================
+    def calculate_financials(self, df_input: pd.DataFrame, breakdown: bool = False,
+                             display: bool = False) -> pd.DataFrame:
+        """根据《计算公式.docx》实现全链路自动计算，集成数据去重和缺失值处理
+        breakdown=True 时额外输出 Display 表的明细列；display=True 时按 Display_Calc 的口径计算"""
         if df_input.empty:
             return df_input
             
-        # 1. 预加载所有参数表（按需加载，保持V1方式）
-        df_ex = self.execute_query(Q_GET_ALL_EXCHANGE)
-        df_cost = self.execute_query(Q_GET_ALL_COSTS)
-        df_price = self.execute_query(Q_GET_ALL_PRICES)
-        df_r1 = self.execute_query(Q_GET_ALL_RATIO1)
-        df_r2 = self.execute_query(Q_GET_ALL_RATIO2)
-        df_r3 = self.execute_query(Q_GET_ALL_RATIO3)
-        df_reg = self.execute_query(Q_GET_ALL_REGIONAL)
-        df_model = self.execute_query(Q_GET_MODELS_INFO)
-        df_country = self.execute_query("SELECT Country, Market FROM Country")
-
-        # 2. 数据去重处理（从V2迁移的关键修复）
-        # Ratio_Expenses3表去重：按ID倒序，保留最新配置
-        if not df_r3.empty and 'Ratio_expenses3_id' in df_r3.columns:
-            df_r3 = df_r3.sort_values('Ratio_expenses3_id', ascending=False) \
-                         .drop_duplicates(subset=['Model_label', 'Country'], keep='first')
-        
-        # 其他表防御性去重
-        if not df_cost.empty:
-            df_cost = df_cost.drop_duplicates(subset=['Model', 'Country', 'Costs_time'], keep='first')
-        if not df_price.empty:
-            df_price = df_price.drop_duplicates(subset=['Model', 'Country', 'h_Time'], keep='first')
-        if not df_reg.empty:
-            df_reg = df_reg.drop_duplicates(subset=['Country', 'Expenses_time'], keep='first')
-
-        results = []
-        for _, row in df_input.iterrows():
-            try:
-                time, country, model, sales = row['h_Time'], row['Country'], row['Model'], float(row['Sales'])
-                
-                # 获取基础元数据 (Series, Label)
-                m_info = df_model[df_model['Model'] == model]
-                series = m_info.iloc[0]['Series'] if not m_info.empty else ''
-                label = m_info.iloc[0]['Model_label'] if not m_info.empty else ''
-                
-                # 获取市场
-                market_row = df_country[df_country['Country'] == country]
-                market = market_row.iloc[0]['Market'] if not market_row.empty else ''
-
-                # 1. 获取汇率 (Exchange)
-                ex_rate = 1.0
-                curr_ex = df_ex[df_ex['Exchange_time'] == time]
-                if not curr_ex.empty: 
-                    ex_rate = float(curr_ex.iloc[0]['Exchange_rate'])
-
-                # 2. 获取价格并计算 true_Price（改进的货币转换逻辑）
-                true_price = 0.0
-                price_row = df_price[(df_price['Model']==model) & (df_price['Country']==country) & (df_price['h_Time']==time)]
-                if not price_row.empty:
-                    p = float(price_row.iloc[0]['Price'])
-                    curr = price_row.iloc[0]['Currency']
-                    # 改进的货币转换：USD需要乘汇率，其他货币直接使用
-                    true_price = p * ex_rate if curr == 'USD' else p
-                else:
-                    # 缺失值处理：如果找不到价格，设为0
-                    true_price = 0.0
-                
-                # 3. 获取单位成本 (Costs表) - 增加缺失值处理
-                unit_cost = 0.0
-                cost_row = df_cost[(df_cost['Model']==model) & (df_cost['Country']==country) & (df_cost['Costs_time']==time)]
-                if not cost_row.empty:
-                    unit_cost = float(cost_row.iloc[0]['Costs'])
-
-                # 4. 获取比率参数 - 增加缺失值处理
-                # Ratio 1 (按 Series)
-                r1 = df_r1[df_r1['Series'] == series]
-                soft_rate = float(r1.iloc[0]['Software_product_amortization_rate_acc_cost']) if not r1.empty else 0.0
-                rand_rate = float(r1.iloc[0]['RandD_rate_acc_cost']) if not r1.empty else 0.0
-
-                # Ratio 2 (按 Country)
-                r2 = df_r2[df_r2['Country'] == country]
-                func_rate = float(r2.iloc[0]['Functional_cost_allocation_rate_acc_cost']) if not r2.empty else 0.0
-                hq_rate = float(r2.iloc[0]['Business_group_headquarters_allocation_rate_acc_cost']) if not r2.empty else 0.0
-                mkt_prov_rate = float(r2.iloc[0]['Marketing_activities_provision_rate_acc_revenue']) if not r2.empty else 0.0
-
-                # Ratio 3 (按 Label, Country)
-                r3 = df_r3[(df_r3['Model_label']==label) & (df_r3['Country']==country)]
-                after_sales_rate = float(r3.iloc[0]['After_sales_provision_rate_acc_cost']) if not r3.empty else 0.0
-
-                # 5. 获取区域费用 (Regional) - 增加缺失值处理
-                reg = df_reg[(df_reg['Country']==country) & (df_reg['Expenses_time']==time)]
-                reg_mkt = float(reg.iloc[0]['Marketing_expenses']) if not reg.empty else 0.0
-                reg_labor = float(reg.iloc[0]['Labor_cost']) if not reg.empty else 0.0
-                reg_var = float(reg.iloc[0]['Other_variable_expenses']) if not reg.empty else 0.0
-                reg_fixed = float(reg.iloc[0]['Other_fixed_expenses']) if not reg.empty else 0.0
-
-                # === 执行计算 ===
-                revenues = sales * true_price
-                total_costs = unit_cost * sales 
-                gross_profits = revenues - total_costs
-                
-                # 中间变量计算
-                rand_d_exp = total_costs * (soft_rate + rand_rate)
-                after_sales_prov = total_costs * after_sales_rate
-                mkt_prov = revenues * mkt_prov_rate
-                
-                margin_profits = gross_profits - rand_d_exp - after_sales_prov - mkt_prov - reg_mkt - reg_labor - reg_var
-                
-                # 其他费用
-                func_exp = total_costs * func_rate
-                hq_exp = total_costs * hq_rate
-                
-                net_income = margin_profits - reg_fixed - func_exp - hq_exp
-
-                # 填充结果
-                row['Market'] = market
-                row['Revenues'] = round(revenues, 2)
-                row['Gross_profits'] = round(gross_profits, 2)
-                row['Margin_profits'] = round(margin_profits, 2)
-                row['Net_income'] = round(net_income, 2)
-                row['Model_label'] = label
-                row['Series'] = series
-                
-            except Exception as e:
-                print(f"Calculation Error for {row}: {e}")
-                # 出错时使用默认值填充关键字段
-                row['Market'] = row.get('Market', '')
-                row['Revenues'] = 0.0
-                row['Gross_profits'] = 0.0
-                row['Margin_profits'] = 0.0
-                row['Net_income'] = 0.0
-                row['Model_label'] = row.get('Model_label', '')
-                row['Series'] = row.get('Series', '')
-                
-            results.append(row)
-        return pd.DataFrame(results)
+        # 1. 参数表快照（进程级共享，已去重；源表写入后自动失效）
+        self.sync_table_versions()
+        tables = get_parameter_snapshot(self.execute_query)
+
+        # 2. 键连接 + 整列运算
+        return compute_financials(df_input, tables, breakdown=breakdown, display=display)
+
+    # ================= 情景模拟（What-if，不写库） =================
+    def get_scenario_base(self, filters=None) -> pd.DataFrame:
+        """情景模拟的基础事实数据（进程级缓存），filters 支持 time / country / model"""
+        self.sync_table_versions()
+        df = get_scenario_base(self.execute_query, Q_GET_SCENARIO_BASE)
+        if df.empty or not filters:
+            return df
+        mask = pd.Series(True, index=df.index)
+        for key, col in (('time', 'h_Time'), ('country', 'Country'), ('model', 'Model')):
+            if filters.get(key):
+                mask &= df[col] == filters[key]
+        return df[mask].reset_index(drop=True)
+
+    def run_scenario(self, overrides, filters=None):
+        """
+        在缓存的参数快照上应用覆盖并重新计算
+        :param overrides: utils.scenario.make_override() 构造的列表
+        :return: (基准结果, 情景结果)，均为 Display 形态的 DataFrame；基准与刷新后的 Display 行一致
+        """
+        facts = self.get_scenario_base(filters)
+        if facts.empty:
+            return facts, facts
+        tables = get_parameter_snapshot(self.execute_query)
+        baseline = compute_financials(facts, tables, display=True)
+        return baseline, run_scenario(facts, tables, overrides)
+
+    def get_financial_components(self, filters=None) -> pd.DataFrame:
+        """Net_income 的线性分量（见 financials.financial_components），供敏感性分析使用"""
+        facts = self.get_scenario_base(filters)
+        return financial_components(facts, get_parameter_snapshot(self.execute_query))
 
     def save_data(self, df: pd.DataFrame, table_name="History") -> bool:
-        """保存并覆盖 (UPSERT)，自动更新Display表"""
+        """保存并覆盖 (UPSERT)；Display 只依赖 Sales_Price 与参数表，不随 History/Budget 变化"""
         if df.empty:
             return True
             
@@ -442,33 +833,10 @@ class DatabaseManager:
             # 2. 再入库
             sql = Q_UPSERT_HISTORY if table_name == "History" else Q_UPSERT_BUDGET
             
-            cursor = self.connection.cursor()
-            data = []
-            affected_records = []  # 记录影响的记录
+            data = self._calculated_rows(df_calc)
             
-            for _, r in df_calc.iterrows():
-                data.append(( 
-                    r['h_Time'], r['Country'], r.get('Market', ''), r['Model'], 
-                    r.get('Model_label', ''), r.get('Series', ''), r['Sales'], 
-                    r.get('Revenues', 0), r.get('Gross_profits', 0), 
-                    r.get('Margin_profits', 0), r.get('Net_income', 0)
-                ))
-                affected_records.append({
-                    'time': r['h_Time'],
-                    'country': r['Country'],
-                    'model': r['Model']
-                })
-            
-            cursor.executemany(sql, data)
-            self.connection.commit()
-            
-            # 3. 自动更新Display表
-            for record in affected_records:
-                self.update_display_table(
-                    time_period=record['time'],
-                    country=record['country'],
-                    model=record['model']
-                )
+            self._upsert_rows(table_name, sql, data, FACT_WRITE_COLUMNS, FACT_UPDATE_COLUMNS)
+            self._notify_tables_changed({table_name})
             
             return True
         except Exception as e:
@@ -479,20 +847,37 @@ class DatabaseManager:
         """保存价格表 (业务员用)"""
         if df.empty: return True
         try:
-            cursor = self.connection.cursor()
-            data = []
-            for _, r in df.iterrows():
-                data.append((
-                    r['id'], r['Model'], r['Country'], r['h_Time'], 
-                    r['Currency'], r['Sales'], r['Price'], r['Exchange_time']
-                ))
-            cursor.executemany(Q_UPSERT_SALES_PRICE, data)
-            self.connection.commit()
-            return True
+            data = list(zip(*[
+                money_decimals(df[col]) if col == 'Price' else df[col].astype(object).where(df[col].notna(), None).tolist()
+                for col in SALES_PRICE_WRITE_COLUMNS
+            ]))
+            self._upsert_rows('Sales_Price', Q_UPSERT_SALES_PRICE, data,
+                              SALES_PRICE_WRITE_COLUMNS, SALES_PRICE_UPDATE_COLUMNS)
+            self._notify_tables_changed({'Sales_Price'})
+            return self.recompute_dependents('Sales_Price', df[['Model', 'Country', 'h_Time']].to_dict('records'))
         except Exception as e:
             st.error(f"保存价格失败: {e}")
             return False
 
+    def _upsert_rows(self, table_name: str, query: str, rows: list, columns: list, update_columns: list):
+        """
+        写入 UPSERT 参数行：行数达到 BULK_LOAD_MIN_ROWS 时走批量导入（见 utils/bulk_load），
+        否则 executemany；均在一个事务内完成，失败时抛出异常（SQLite 后端总是 executemany）
+        """
+        if len(rows) >= BULK_LOAD_MIN_ROWS and self.backend == 'mysql':
+            bulk_upsert(self.config, table_name, columns, update_columns, rows)
+            return
+        with self.checkout() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(query, rows)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
     # ================= 新增：成本数据保存方法 =================
     def save_costs_data(self, df: pd.DataFrame) -> bool:
         """保存成本数据（修复版）"""
@@ -506,25 +891,15 @@ class DatabaseManager:
                 if col not in df.columns:
                     raise ValueError(f"缺少必要列: {col}")
             
-            # 执行保存
-            success = True
-            for _, row in df.iterrows():
-                query = """
-                    INSERT INTO Costs (Model, Country, Costs_time, Costs)
-                    VALUES (%s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE Costs = VALUES(Costs)
-                """
-                params = (
-                    row['Model'], 
-                    row['Country'], 
-                    row['Costs_time'], 
-                    float(row['Costs'])
-                )
-                
-                if not self.execute_update(query, params):
-                    success = False
+            # 执行保存：一个写入单元，全部成功才提交
+            rows = list(zip(
+                df['Model'].tolist(), df['Country'].tolist(), df['Costs_time'].tolist(), money_decimals(df['Costs'])
+            ))
+            with self.unit_of_work() as uow:
+                uow.add_many(Q_UPSERT_COSTS_BATCH, rows)
             
-            return success
+            # 保存后重算受影响的计算结果
+            return self.recompute_dependents('Costs', df[['Model', 'Country', 'Costs_time']].to_dict('records'))
             
         except Exception as e:
             st.error(f"保存成本数据失败: {e}")
@@ -532,7 +907,7 @@ class DatabaseManager:
         
     def get_system_logs(self, user_filter=None, start_date=None, end_date=None):
         """获取系统日志，支持用户筛选和时间筛选"""
-        query = "SELECT Log_ID, Log_Time, Username, Role, Action_Type, Details FROM System_Log"
+        query = "SELECT Log_ID, Log_Time, Username, Role, Action_Type, Details, Repeat_Count FROM System_Log"
         
         conditions = []
         params = []
@@ -554,102 +929,246 @@ class DatabaseManager:
         
         query += " ORDER BY Log_Time DESC"
         
-        return pd.read_sql_query(query, self.connection, params=params if params else None)
+        return self.fetch_typed(query, params if params else None)
 
     def update_display_table(self, time_period=None, country=None, model=None):
         """
         自动更新Display表数据
-        基于最新的History/Budget数据和参数表重新计算
+        由 Sales_Price 驱动，在服务端按 refresh_display 存储过程（与原 Display 视图相同的公式）重算
+        未指定时间时刷新最近3个月
+        """
+        filters = {key: value for key, value in
+                   (('time', time_period), ('country', country), ('model', model)) if value}
+        if not time_period:
+            filters['since'] = (pd.Timestamp.now() - pd.DateOffset(months=3)).strftime('%Y-%m')
+        return self.recompute_financials_sql('Display', filters)
+
+    def refresh_display_rows(self, keys) -> bool:
         """
+        批量刷新Display表
+        :param keys: 受影响记录的 (h_Time, Country, Model) 集合
+        全部键在一次存储过程调用中刷新（见 _refresh_display）
+        """
+        return self._refresh_display(list(dict.fromkeys(tuple(k) for k in keys)))
+
+    def _display_scopes(self, filters=None) -> list:
+        """筛选条件 -> refresh_display 的 (h_Time, Country, Model) 参数列表，year / since 展开为逐月"""
+        filters = filters or {}
+        country, model = filters.get('country'), filters.get('model')
+        if not (filters.get('year') or filters.get('since')):
+            return [(filters.get('time'), country, model)]
+        where, params = self._sql_recompute_filter(filters)
+        df = self.fetch_typed(Q_GET_DISPLAY_REFRESH_MONTHS.format(where=where), params + params)
+        return [(h_time, country, model) for h_time in df['h_Time']]
+
+    def _refresh_display(self, scopes) -> bool:
+        """
+        按范围刷新 Display，成功后记录更新时间
+        单个范围调用 refresh_display；多个范围以 JSON 键列表一次调用 refresh_display_keys，
+        服务端以集合语句处理全部范围，往返次数与范围个数无关
+        """
+        if not scopes:
+            return True
         try:
-            # 获取需要计算的数据
-            if time_period and country and model:
-                # 特定记录
-                query = """
-                    SELECT h_Time, Country, Model, Sales
-                    FROM History 
-                    WHERE h_Time = %s AND Country = %s AND Model = %s
-                    UNION
-                    SELECT h_Time, Country, Model, Sales
-                    FROM Budget 
-                    WHERE h_Time = %s AND Country = %s AND Model = %s
-                """
-                params = (time_period, country, model, time_period, country, model)
-            elif time_period:
-                # 特定时间段的所有记录
-                query = """
-                    SELECT DISTINCT h_Time, Country, Model, Sales
-                    FROM History 
-                    WHERE h_Time = %s
-                    UNION
-                    SELECT DISTINCT h_Time, Country, Model, Sales
-                    FROM Budget 
-                    WHERE h_Time = %s
-                """
-                params = (time_period, time_period)
-            else:
-                # 最近3个月的数据
-                query = """
-                    SELECT DISTINCT h_Time, Country, Model, Sales
-                    FROM History 
-                    WHERE h_Time >= DATE_FORMAT(DATE_SUB(NOW(), INTERVAL 3 MONTH), '%Y-%m')
-                    UNION
-                    SELECT DISTINCT h_Time, Country, Model, Sales
-                    FROM Budget 
-                    WHERE h_Time >= DATE_FORMAT(DATE_SUB(NOW(), INTERVAL 3 MONTH), '%Y-%m')
-                """
-                params = None
-            
-            df_to_calculate = self.execute_query(query, params)
-            
-            if df_to_calculate.empty:
-                return True
-            
-            # 计算财务数据
-            df_calculated = self.calculate_financials(df_to_calculate)
-            
-            if df_calculated.empty:
+            with self.unit_of_work() as uow:
+                if len(scopes) == 1:
+                    uow.add(Q_REFRESH_DISPLAY, scopes[0])
+                else:
+                    keys = [[None if v is None else str(v) for v in scope] for scope in scopes]
+                    uow.add(Q_REFRESH_DISPLAY_KEYS, (json.dumps(keys, ensure_ascii=False),))
+        except Exception as e:
+            st.error(f"更新Display表失败: {e}")
+            return False
+        st.session_state['last_display_update'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return True
+
+    @staticmethod
+    def _calculated_rows(df_calculated: pd.DataFrame) -> list:
+        """计算结果 -> History/Budget/Display 通用的 11 列写入参数（金额列按分转为 Decimal 精确写入）"""
+        n = len(df_calculated)
+
+        def text(col):
+            return df_calculated[col].tolist() if col in df_calculated.columns else [''] * n
+
+        def money(col):
+            return money_decimals(df_calculated[col] if col in df_calculated.columns else [0] * n)
+
+        sales = [_sql_float(v) for v in df_calculated['Sales'].tolist()]
+        return list(zip(
+            df_calculated['h_Time'].tolist(), df_calculated['Country'].tolist(), text('Market'),
+            df_calculated['Model'].tolist(), text('Model_label'), text('Series'),
+            sales, money('Revenues'), money('Gross_profits'), money('Margin_profits'), money('Net_income')
+        ))
+
+    # ================= 服务端批量重算（INSERT ... SELECT） =================
+    @staticmethod
+    def _sql_recompute_filter(filters=None):
+        """
+        筛选条件 -> (WHERE 子句, 参数)
+        支持: time(月份) / year(年份) / since(起始月份) / country / model
+        """
+        conditions, params = [], []
+        filters = filters or {}
+        if filters.get('time'):
+            conditions.append("f.h_Time = %s")
+            params.append(filters['time'])
+        if filters.get('year'):
+            conditions.append("f.h_Time LIKE %s")
+            params.append(f"{filters['year']}-%")
+        if filters.get('since'):
+            conditions.append("f.h_Time >= %s")
+            params.append(filters['since'])
+        if filters.get('country'):
+            conditions.append("f.Country = %s")
+            params.append(filters['country'])
+        if filters.get('model'):
+            conditions.append("f.Model = %s")
+            params.append(filters['model'])
+        return (" AND ".join(conditions) or "1 = 1"), tuple(params)
+
+    def _sql_calc_query(self, table_name, filters=None):
+        """拼出服务端计算语句，返回 (SQL, 参数)"""
+        where, params = self._sql_recompute_filter(filters)
+        return Q_CALC_FINANCIALS_SQL.format(source=SQL_RECOMPUTE_SOURCES[table_name], where=where), params
+
+    def recompute_financials_sql(self, table_name: str = "Display", filters=None) -> bool:
+        """
+        服务端重算：公式在 MySQL 内以一条 INSERT ... SELECT ... ON DUPLICATE KEY UPDATE 执行，
+        数据不经过网络往返，适合整月/整年的批量重算
+        :param table_name: History / Budget / Display（Display 调用 refresh_display 存储过程）
+        :param filters: 见 _sql_recompute_filter
+        """
+        if table_name == "Display":
+            try:
+                scopes = self._display_scopes(filters)
+            except Exception as e:
+                st.error(f"更新Display表失败: {e}")
                 return False
-            
-            # 更新Display表
-            cursor = self.connection.cursor()
-            
-            for _, row in df_calculated.iterrows():
-                upsert_query = """
-                    INSERT INTO Display (h_Time, Country, Market, Model, Model_label, Series, 
-                                        Sales, Revenues, Gross_profits, Margin_profits, Net_income)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                        Market = VALUES(Market),
-                        Model_label = VALUES(Model_label),
-                        Series = VALUES(Series),
-                        Sales = VALUES(Sales),
-                        Revenues = VALUES(Revenues),
-                        Gross_profits = VALUES(Gross_profits),
-                        Margin_profits = VALUES(Margin_profits),
-                        Net_income = VALUES(Net_income)
-                """
-                
-                cursor.execute(upsert_query, (
-                    row['h_Time'], row['Country'], row.get('Market', ''),
-                    row['Model'], row.get('Model_label', ''), row.get('Series', ''),
-                    float(row['Sales']), float(row.get('Revenues', 0)),
-                    float(row.get('Gross_profits', 0)), float(row.get('Margin_profits', 0)),
-                    float(row.get('Net_income', 0))
-                ))
-            
-            self.connection.commit()
-            cursor.close()
-            
-            # 记录日志
-            st.session_state['last_display_update'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
+            return self._refresh_display(scopes)
+        if table_name not in SQL_RECOMPUTE_SOURCES:
+            st.error(f"不支持的重算目标: {table_name}")
+            return False
+
+        calc, params = self._sql_calc_query(table_name, filters)
+        return self.execute_update(Q_RECOMPUTE_FACTS_SQL.format(table=table_name, calc=calc), params)
+
+    def compare_recompute_modes(self, table_name: str = "History", filters=None, tolerance: float = 0.0) -> pd.DataFrame:
+        """
+        校验服务端公式与 Python 引擎的一致性（只读）
+        :param table_name: History / Budget / Display（Display 比较视图 Display_Calc 与引擎的 display 口径，
+                           两边都只保留参数齐全的 Sales_Price 行）
+        两边均为 DECIMAL 定点运算、舍入规则相同，结果应逐分一致，故默认容差为 0
+        :return: 结果不一致或只在一边出现的行（空表表示一致）
+        """
+        keys = ['h_Time', 'Country', 'Model']
+        if table_name == "Display":
+            where, params = self._sql_recompute_filter(filters)
+            df_sql = self.execute_query(Q_GET_DISPLAY_CALC.format(where=where), params)
+            facts = self.execute_query(Q_GET_DISPLAY_FACTS.format(where=where), params)
+            df_py = self.calculate_financials(facts, display=True)
+        elif table_name in SQL_RECOMPUTE_SOURCES:
+            calc, params = self._sql_calc_query(table_name, filters)
+            df_sql = self.execute_query(calc, params)
+            df_py = self.calculate_financials(df_sql[keys + ['Sales']], breakdown=True) if not df_sql.empty else df_sql
+        else:
+            st.error(f"不支持的校验目标: {table_name}")
+            return pd.DataFrame()
+
+        value_cols = ['Revenues', 'Gross_profits', 'Margin_profits', 'Net_income',
+                      'pre_Costs', 'Costs', 'Gross_profits_ratio', 'RandD_expenses',
+                      'After_sales_provision', 'Marketing_provision', 'Functional_expenses',
+                      'Headquarters_expenses']
+        # 两边都没有行，或查询失败（execute_query 返回无列的空表）
+        if (df_sql.empty and df_py.empty) or any(c not in df.columns for df in (df_sql, df_py) for c in keys + value_cols):
+            return df_sql
+        merged = df_sql.merge(df_py[keys + value_cols], on=keys, how='outer',
+                              suffixes=('_sql', '_python'), indicator=True)
+        mismatch = merged['_merge'] != 'both'
+        for col in value_cols:
+            a = pd.to_numeric(merged[f'{col}_sql'], errors='coerce')
+            b = pd.to_numeric(merged[f'{col}_python'], errors='coerce')
+            mismatch |= ((a - b).abs() > tolerance + 1e-9) | (a.isna() != b.isna())
+        return merged[mismatch].drop(columns='_merge').reset_index(drop=True)
+
+    # ================= 参数变更后的增量重算 =================
+    def recompute_dependents(self, table_name: str, keys) -> bool:
+        """
+        参数表变更后，只重算受影响的 History/Budget 行，并刷新依赖该参数的 Sales_Price 行对应的 Display 行
+        :param table_name: 参数表名（见 DEPENDENT_FACT_FILTERS）
+        :param keys: 单个或多个 {键列: 值} 字典，例如 {'Exchange_time': '2024-01'}
+        无 History/Budget 读权限的角色（销售）跳过这两张表，Display 仍由存储过程刷新
+        """
+        if table_name not in DEPENDENT_FACT_FILTERS:
+            st.error(f"未知的参数表: {table_name}")
+            return False
+        if isinstance(keys, dict):
+            keys = [keys]
+        key_cols, condition = DEPENDENT_FACT_FILTERS[table_name]
+        key_values = list(dict.fromkeys(tuple(k[c] for c in key_cols) for k in keys))
+        if not key_values:
             return True
-            
+
+        try:
+            # 参数表可能由外部写入，先让对应快照失效再计算
+            self._notify_tables_changed({table_name})
+
+            conditions = ' OR '.join([condition] * len(key_values))
+            params = tuple(v for k in key_values for v in k)
+            facts = {
+                fact: self._read_dependent_facts(fact, conditions, params)
+                for fact in ('History', 'Budget')
+            }
+
+            if not all(df.empty for df in facts.values()):
+                # History/Budget 合并后只计算一次
+                df_facts = pd.concat(
+                    [df.assign(_source=fact) for fact, df in facts.items() if not df.empty],
+                    ignore_index=True
+                )
+                df_calc = self.calculate_financials(df_facts)
+                if df_calc.empty:
+                    return False
+
+                with self.checkout() as conn:
+                    cursor = conn.cursor()
+                    try:
+                        for fact, sql in (('History', Q_UPSERT_HISTORY), ('Budget', Q_UPSERT_BUDGET)):
+                            rows = df_calc[df_calc['_source'] == fact]
+                            if not rows.empty:
+                                cursor.executemany(sql, self._calculated_rows(rows))
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    finally:
+                        cursor.close()
+                self._notify_tables_changed({fact for fact, df in facts.items() if not df.empty})
+
+            # Display 由 Sales_Price 驱动：刷新依赖该参数的 Sales_Price 行；
+            # 价格变更时直接刷新所保存的键（新增的行尚无 History/Budget，删除的行需要从 Display 移除）
+            if table_name == 'Sales_Price':
+                display_keys = [(k['h_Time'], k['Country'], k['Model'])
+                                for k in (dict(zip(key_cols, v)) for v in key_values)]
+            else:
+                df_keys = self.execute_query(
+                    Q_GET_DEPENDENT_FACTS.format(table='Sales_Price', conditions=conditions), params
+                )
+                display_keys = list(zip(df_keys['h_Time'], df_keys['Country'], df_keys['Model'])) if not df_keys.empty else []
+            return self.refresh_display_rows(display_keys)
         except Exception as e:
-            st.error(f"更新Display表失败: {e}")
+            st.error(f"增量重算失败: {e}")
             return False
 
+    def _read_dependent_facts(self, fact: str, conditions: str, params: tuple) -> pd.DataFrame:
+        """读取受影响的事实行；当前角色无该表读权限时返回空表"""
+        try:
+            return self.fetch_typed(Q_GET_DEPENDENT_FACTS.format(table=fact, conditions=conditions), params)
+        except pymysql.err.OperationalError as e:
+            if not _access_denied(e):
+                raise
+            print(f"跳过 {fact} 重算（当前角色无权限）: {e}")
+            return pd.DataFrame()
+
     def get_display_update_status(self):
         """获取Display表更新状态"""
         try:
@@ -0,0 +1,70 @@
+# app/utils/export.py
+"""
+流式导出
+配合 DatabaseManager.stream_query 使用：数据逐块写入 CSV / Excel，
+任何时刻只有一块数据在内存中，导出行数不受内存限制。
+"""
+import io
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+
+def write_csv_chunks(chunks, binary_file) -> int:
+    """
+    把 DataFrame 块依次写为一个 CSV（UTF-8 带 BOM，与 to_csv(encoding='utf-8-sig') 一致）
+    :param binary_file: 可写的二进制文件对象（如 zipfile.open(name, 'w')）
+    :return: 写入的行数
+    """
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    rows = 0
+    try:
+        for df in chunks:
+            df.to_csv(text, index=False, header=(rows == 0))
+            rows += len(df)
+    finally:
+        text.flush()
+        text.detach()
+    return rows
+
+
+def _cell_values(df: pd.DataFrame):
+    """DataFrame 块 -> 逐行取值（空值写空单元格）"""
+    values = df.astype(object).where(df.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+
+class StreamingExcelWriter:
+    """
+    基于 openpyxl 只写模式（write_only）的 Excel 写入：行写入后即落盘到临时文件，不在内存中保留整表
+    用法：
+        writer = StreamingExcelWriter()
+        writer.write_chunks('Sheet', chunks)
+        data = writer.getvalue()
+    """
+
+    def __init__(self):
+        self.workbook = Workbook(write_only=True)
+        self.row_counts = {}
+
+    def write_chunks(self, sheet_name: str, chunks) -> int:
+        """写入一个工作表；没有数据时不创建工作表。返回写入的行数"""
+        sheet = None
+        rows = 0
+        for df in chunks:
+            if df.empty:
+                continue
+            if sheet is None:
+                sheet = self.workbook.create_sheet(title=sheet_name[:31])  # Excel sheet name max 31 chars
+                sheet.append([str(c) for c in df.columns])
+            for row in _cell_values(df):
+                sheet.append([v.item() if isinstance(v, np.generic) else v for v in row])
+            rows += len(df)
+        if rows:
+            self.row_counts[sheet_name] = rows
+        return rows
+
+    def getvalue(self) -> bytes:
+        output = io.BytesIO()
+        self.workbook.save(output)
+        return output.getvalue()
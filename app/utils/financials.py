@@ -0,0 +1,508 @@
+# app/utils/financials.py
+"""
+财务公式计算引擎（列式版本）
+根据《计算公式.docx》计算 Revenues / Gross_profits / Margin_profits / Net_income。
+输入数据与各参数表之间通过键连接（merge）对齐，再做整列运算，
+避免逐行扫描参数表带来的 行数 × 参数表大小 的开销。
+"""
+import threading
+import numpy as np
+import pandas as pd
+from utils.money import (
+    MONEY_PLACES, RATE_PLACES, EXCHANGE_PLACES, INT64_SAFE, to_scaled, round_div, rescale, scaled_to_float
+)
+from utils.sql_queries import (
+    Q_GET_ALL_EXCHANGE, Q_GET_ALL_COSTS, Q_GET_ALL_PRICES,
+    Q_GET_ALL_RATIO1, Q_GET_ALL_RATIO2, Q_GET_ALL_RATIO3,
+    Q_GET_ALL_REGIONAL, Q_GET_MODELS_INFO, Q_GET_ALL_COUNTRIES
+)
+
+# ================= 参数表定义 =================
+# 每张参数表: (查找键, 取值列)
+PARAMETER_TABLES = {
+    'exchange': (['Exchange_time'], ['Exchange_rate']),
+    'costs': (['Model', 'Country', 'Costs_time'], ['Costs']),
+    'prices': (['Model', 'Country', 'h_Time'], ['Price', 'Currency']),
+    'ratio1': (['Series'], ['Software_product_amortization_rate_acc_cost', 'RandD_rate_acc_cost']),
+    'ratio2': (['Country'], ['Functional_cost_allocation_rate_acc_cost',
+                             'Business_group_headquarters_allocation_rate_acc_cost',
+                             'Marketing_activities_provision_rate_acc_revenue']),
+    'ratio3': (['Model_label', 'Country'], ['After_sales_provision_rate_acc_cost']),
+    'regional': (['Country', 'Expenses_time'], ['Marketing_expenses', 'Labor_cost',
+                                                'Other_variable_expenses', 'Other_fixed_expenses']),
+    'models': (['Model'], ['Series', 'Model_label']),
+    'countries': (['Country'], ['Market']),
+}
+
+# 每张参数表的数据库源表与加载语句
+PARAMETER_SOURCES = {
+    'exchange': ('Exchange', Q_GET_ALL_EXCHANGE),
+    'costs': ('Costs', Q_GET_ALL_COSTS),
+    'prices': ('Sales_Price', Q_GET_ALL_PRICES),
+    'ratio1': ('Ratio_Expenses1', Q_GET_ALL_RATIO1),
+    'ratio2': ('Ratio_Expenses2', Q_GET_ALL_RATIO2),
+    'ratio3': ('Ratio_Expenses3', Q_GET_ALL_RATIO3),
+    'regional': ('Regional_Expenses', Q_GET_ALL_REGIONAL),
+    'models': ('Model', Q_GET_MODELS_INFO),
+    'countries': ('Country', Q_GET_ALL_COUNTRIES),
+}
+
+# 参数表中的文本取值列（其余取值列均为数值）
+_TEXT_VALUES = {'Currency', 'Series', 'Model_label', 'Market'}
+
+# 计算结果列（按旧版逐行实现的赋值顺序）
+RESULT_COLUMNS = ['Market', 'Revenues', 'Gross_profits', 'Margin_profits', 'Net_income', 'Model_label', 'Series']
+
+# Display 表的明细列（breakdown=True 时追加，列义与原 Display 视图一致）
+DISPLAY_DETAIL_COLUMNS = [
+    'id', 'Price', 'pre_Costs', 'Costs', 'Gross_profits_ratio',
+    'RandD_expenses', 'After_sales_provision', 'Marketing_provision',
+    'Marketing_expenses', 'Labor_costs', 'Other_variable_expenses',
+    'Other_fixed_expenses', 'Functional_expenses', 'Headquarters_expenses', 'Exchange_time',
+]
+
+
+def prepare_parameter_table(name: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    单张参数表去重：每个查找键只保留一行，与旧实现"筛选后取 iloc[0]"的语义一致
+    """
+    keys, values = PARAMETER_TABLES[name]
+    if df.empty or not all(k in df.columns for k in keys):
+        return df
+
+    # Ratio_Expenses3表去重：按ID倒序，保留最新配置
+    if name == 'ratio3' and 'Ratio_expenses3_id' in df.columns:
+        df = df.sort_values('Ratio_expenses3_id', ascending=False, kind='stable')
+
+    # 空键永远匹配不到（旧实现用 == 比较），直接剔除
+    df = df.dropna(subset=keys).drop_duplicates(subset=keys, keep='first')
+
+    # DECIMAL 列（pymysql 返回 Decimal 对象）在加载时一次转为数值列，计算时再换算为定点整数
+    decimal_cols = [c for c in values if c in df.columns and c not in _TEXT_VALUES and df[c].dtype == object]
+    if decimal_cols:
+        df = df.copy()
+        for col in decimal_cols:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def prepare_parameter_tables(df_ex, df_cost, df_price, df_r1, df_r2, df_r3, df_reg, df_model, df_country) -> dict:
+    """参数表去重，返回 {表名: DataFrame}"""
+    tables = {
+        'exchange': df_ex, 'costs': df_cost, 'prices': df_price,
+        'ratio1': df_r1, 'ratio2': df_r2, 'ratio3': df_r3,
+        'regional': df_reg, 'models': df_model, 'countries': df_country,
+    }
+    return {name: prepare_parameter_table(name, df) for name, df in tables.items()}
+
+
+# ================= 参数快照缓存（进程级） =================
+# 已去重的参数表在进程内共享，只有写入对应源表时才失效
+_snapshot_lock = threading.Lock()
+_snapshot = {}          # 参数表名 -> 去重后的 DataFrame
+_snapshot_versions = {}  # 参数表名 -> 失效次数，用于丢弃加载期间已失效的结果
+
+
+def get_parameter_snapshot(load_query) -> dict:
+    """
+    获取参数表快照，缺失的表通过 load_query(sql) 加载
+    :param load_query: 执行查询并返回 DataFrame 的函数（如 DatabaseManager.execute_query）
+    """
+    with _snapshot_lock:
+        tables = dict(_snapshot)
+        versions = dict(_snapshot_versions)
+
+    for name, (_, query) in PARAMETER_SOURCES.items():
+        if name in tables:
+            continue
+        df = prepare_parameter_table(name, load_query(query))
+        tables[name] = df
+        # 空表不缓存（可能是查询失败），下次重新加载
+        if df.empty:
+            continue
+        with _snapshot_lock:
+            if _snapshot_versions.get(name, 0) == versions.get(name, 0):
+                _snapshot[name] = df
+    return tables
+
+
+def invalidate_parameter_snapshot(tables=None):
+    """
+    按数据库表名使参数快照失效
+    :param tables: 被写入的表名集合；为 None 时清空全部
+    """
+    with _snapshot_lock:
+        for name, (source, _) in PARAMETER_SOURCES.items():
+            if tables is None or source in tables:
+                _snapshot.pop(name, None)
+                _snapshot_versions[name] = _snapshot_versions.get(name, 0) + 1
+
+
+def _tables_complete(tables: dict) -> bool:
+    """参数表是否都带有所需列（查询失败时 execute_query 返回无列的空表）"""
+    for name, (keys, values) in PARAMETER_TABLES.items():
+        df = tables.get(name)
+        if df is None or any(c not in df.columns for c in keys + values):
+            return False
+    return True
+
+
+def _lookup(keys: pd.DataFrame, table: pd.DataFrame, left_on: list, name: str, extra=()):
+    """
+    以键做左连接，返回 (与 keys 行对齐的取值表, 是否匹配的布尔数组)
+    extra: 额外带出的列（参数表中存在时）
+    """
+    right_on, values = PARAMETER_TABLES[name]
+    values = values + [c for c in extra if c in table.columns and c not in values]
+    right = table[right_on + values].copy()
+    right.columns = left_on + values
+    for col in left_on:
+        right[col] = right[col].astype(object)
+    right['_matched'] = True
+
+    merged = keys[left_on].merge(right, how='left', on=left_on, validate='many_to_one', sort=False)
+    matched = merged['_matched'].eq(True).to_numpy()
+    return merged, matched
+
+
+def _numeric(merged: pd.DataFrame, col: str, matched: np.ndarray, default: float) -> np.ndarray:
+    """取数值列；未匹配的行使用默认值（缺失值处理）"""
+    values = pd.to_numeric(merged[col], errors='coerce').to_numpy(dtype=float)
+    return np.where(matched, values, default)
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _sales_values(sales_raw: pd.Series):
+    """
+    Sales 转浮点，返回 (数值数组, 出错标记数组)
+    出错的行即旧实现中 float(Sales) 会抛异常的行（非数字字符串等），空值按 NaN 参与计算
+    """
+    if pd.api.types.is_numeric_dtype(sales_raw):
+        return sales_raw.to_numpy(dtype=float, na_value=np.nan), np.zeros(len(sales_raw), dtype=bool)
+    values = sales_raw.map(_to_float).to_numpy(dtype=float)
+    failed = sales_raw.notna() & np.isnan(values)
+    return values, failed.to_numpy(dtype=bool)
+
+
+def _fill_error_rows(result: pd.DataFrame, df_input: pd.DataFrame, errors: np.ndarray) -> pd.DataFrame:
+    """出错的行使用默认值填充关键字段（与旧实现的异常分支一致）"""
+    if not errors.any():
+        return result
+    for col in RESULT_COLUMNS:
+        if col in ('Market', 'Model_label', 'Series'):
+            fallback = df_input[col] if col in df_input.columns else pd.Series('', index=df_input.index)
+            if col not in result.columns:
+                result[col] = fallback
+            else:
+                result[col] = result[col].where(~errors, fallback)
+        elif col not in result.columns:
+            result[col] = 0.0
+        else:
+            result.loc[errors, col] = 0.0
+    return result
+
+
+def _with_detail_columns(result: pd.DataFrame) -> pd.DataFrame:
+    """无法计算时补齐明细列（空值）"""
+    for col in DISPLAY_DETAIL_COLUMNS:
+        if col not in result.columns:
+            result[col] = np.nan if col not in ('id', 'Exchange_time') else None
+    return result
+
+
+def _safe_ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """除法，分母为 0 时返回 NaN（对应 SQL 中除零得 NULL）"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator != 0, numerator / denominator, np.nan)
+
+
+def _resolve_parameters(df_input: pd.DataFrame, tables: dict) -> dict:
+    """
+    按键连接出每一行用到的全部参数（缺失值已替换为默认值）
+    返回 {名称: 与输入行对齐的数组}，供 compute_financials 与敏感性分析共用
+    """
+    keys = pd.DataFrame({
+        'h_Time': df_input['h_Time'].to_numpy(dtype=object),
+        'Country': df_input['Country'].to_numpy(dtype=object),
+        'Model': df_input['Model'].to_numpy(dtype=object),
+    })
+
+    sales, errors = _sales_values(df_input['Sales'])
+    # 销量按 INTEGER 列的规则取整（与写入数据库后的值一致）
+    sales_int, sales_ok = to_scaled(sales, 0)
+    sales = np.where(sales_ok, sales_int, np.nan)
+
+    # 获取基础元数据 (Series, Label) 与市场
+    m_info, m_hit = _lookup(keys, tables['models'], ['Model'], 'models')
+    keys['Series'] = np.where(m_hit, m_info['Series'].to_numpy(dtype=object), '')
+    keys['Model_label'] = np.where(m_hit, m_info['Model_label'].to_numpy(dtype=object), '')
+
+    c_info, c_hit = _lookup(keys, tables['countries'], ['Country'], 'countries')
+    market = np.where(c_hit, c_info['Market'].to_numpy(dtype=object), '')
+
+    # 1. 汇率 (Exchange)，缺失时按 1.0
+    ex, ex_hit = _lookup(keys, tables['exchange'], ['h_Time'], 'exchange')
+    ex_rate = _numeric(ex, 'Exchange_rate', ex_hit, 1.0)
+
+    # 2. 价格 -> true_Price：USD需要乘汇率，其他货币直接使用；找不到价格设为0
+    pr, pr_hit = _lookup(keys, tables['prices'], ['Model', 'Country', 'h_Time'], 'prices', extra=('id',))
+    price = pd.to_numeric(pr['Price'], errors='coerce').to_numpy(dtype=float)
+    is_usd = (pr['Currency'] == 'USD').to_numpy(dtype=bool)
+    true_price = np.where(pr_hit, np.where(is_usd, price * ex_rate, price), 0.0)
+
+    # 3. 单位成本 (Costs表)
+    co, co_hit = _lookup(keys, tables['costs'], ['Model', 'Country', 'h_Time'], 'costs')
+    unit_cost = _numeric(co, 'Costs', co_hit, 0.0)
+
+    # 4. 比率参数
+    r1, r1_hit = _lookup(keys, tables['ratio1'], ['Series'], 'ratio1')
+    soft_rate = _numeric(r1, 'Software_product_amortization_rate_acc_cost', r1_hit, 0.0)
+    rand_rate = _numeric(r1, 'RandD_rate_acc_cost', r1_hit, 0.0)
+
+    r2, r2_hit = _lookup(keys, tables['ratio2'], ['Country'], 'ratio2')
+    func_rate = _numeric(r2, 'Functional_cost_allocation_rate_acc_cost', r2_hit, 0.0)
+    hq_rate = _numeric(r2, 'Business_group_headquarters_allocation_rate_acc_cost', r2_hit, 0.0)
+    mkt_prov_rate = _numeric(r2, 'Marketing_activities_provision_rate_acc_revenue', r2_hit, 0.0)
+
+    r3, r3_hit = _lookup(keys, tables['ratio3'], ['Model_label', 'Country'], 'ratio3')
+    after_sales_rate = _numeric(r3, 'After_sales_provision_rate_acc_cost', r3_hit, 0.0)
+
+    # 5. 区域费用 (Regional)
+    reg, reg_hit = _lookup(keys, tables['regional'], ['Country', 'h_Time'], 'regional')
+    reg_mkt = _numeric(reg, 'Marketing_expenses', reg_hit, 0.0)
+    reg_labor = _numeric(reg, 'Labor_cost', reg_hit, 0.0)
+    reg_var = _numeric(reg, 'Other_variable_expenses', reg_hit, 0.0)
+    reg_fixed = _numeric(reg, 'Other_fixed_expenses', reg_hit, 0.0)
+
+    # 各参数表都匹配上的行（Display_Calc 以 INNER JOIN 连接参数表，其余行不出现在 Display 中）
+    matched = m_hit & c_hit & ex_hit & pr_hit & co_hit & r1_hit & r2_hit & r3_hit & reg_hit
+
+    return {
+        'keys': keys, 'sales': sales, 'errors': errors, 'market': market, 'matched': matched,
+        'ex_rate': ex_rate, 'ex_hit': ex_hit,
+        'pr': pr, 'pr_hit': pr_hit, 'price': price, 'is_usd': is_usd, 'true_price': true_price,
+        'unit_cost': unit_cost,
+        'soft_rate': soft_rate, 'rand_rate': rand_rate,
+        'func_rate': func_rate, 'hq_rate': hq_rate, 'mkt_prov_rate': mkt_prov_rate,
+        'after_sales_rate': after_sales_rate,
+        'reg_hit': reg_hit, 'reg_mkt': reg_mkt, 'reg_labor': reg_labor, 'reg_var': reg_var, 'reg_fixed': reg_fixed,
+    }
+
+
+# ================= 定点计算 =================
+# 中间量统一放大到 10^8（金额 2 位 × 汇率 2 位 × 比率 4 位），乘法结果均为整数、没有舍入误差。
+# 单位：rev4 为 4 位小数（销量 × 价格 × 汇率），tc2 为 2 位（分），其余 *8 为 8 位
+def _fixed_point_kernel(v: dict, breakdown: bool, display: bool = False) -> dict:
+    """
+    整数运算核心；v 中的数组同为 int64 或同为 Python 整数（object，用于超出 int64 的行）
+    display=True 时按 Display_Calc 的口径：各项先取整到分，边际利润 / 净利润由取整后的金额相加，
+    营销拨备按取整后的收入计算
+    """
+    rev4 = v['sales'] * v['price'] * v['fx']
+    tc2 = v['cost'] * v['sales']
+    rand8 = tc2 * (v['soft'] + v['rand']) * 100
+    after8 = tc2 * v['after'] * 100
+    mkt8 = rev4 * v['mkt']
+    margin8 = (rev4 * 10 ** 4 - tc2 * 10 ** 6 - rand8 - after8 - mkt8
+               - (v['reg_mkt'] + v['reg_labor'] + v['reg_var']) * 10 ** 6)
+    func8 = tc2 * v['func'] * 100
+    hq8 = tc2 * v['hq'] * 100
+
+    out = {
+        'Revenues': rescale(rev4, 4),
+        'Gross_profits': rescale(rev4 - tc2 * 100, 4),
+        'Margin_profits': rescale(margin8, 8),
+        'Net_income': rescale(margin8 - v['reg_fixed'] * 10 ** 6 - func8 - hq8, 8),
+    }
+    if display:
+        rand2, after2 = rescale(rand8, 8), rescale(after8, 8)
+        func2, hq2 = rescale(func8, 8), rescale(hq8, 8)
+        mkt2 = rescale(out['Revenues'] * v['mkt'], 6)
+        out['Margin_profits'] = (out['Gross_profits'] - rand2 - after2 - mkt2
+                                 - (v['reg_mkt'] + v['reg_labor'] + v['reg_var']))
+        out['Net_income'] = out['Margin_profits'] - v['reg_fixed'] - func2 - hq2
+    if breakdown:
+        # MySQL 的 DECIMAL 除法先保留 被除数位数 + 4 位小数，再由 ROUND 取两位
+        out['Costs'] = tc2
+        out['pre_Costs'] = rescale(round_div(tc2 * 10 ** 4, v['sales']), 6)
+        out['Gross_profits_ratio'] = rescale(round_div(out['Gross_profits'] * 10 ** 6, out['Revenues']), 6)
+        out['RandD_expenses'] = rescale(rand8, 8)
+        out['After_sales_provision'] = rescale(after8, 8)
+        out['Marketing_provision'] = mkt2 if display else rescale(mkt8, 8)
+        out['Functional_expenses'] = rescale(func8, 8)
+        out['Headquarters_expenses'] = rescale(hq8, 8)
+    return out
+
+
+def _fixed_point_results(p: dict, breakdown: bool, display: bool = False) -> dict:
+    """
+    把 _resolve_parameters 的参数换算为定点整数并计算，返回 {结果列: 浮点数组}
+    参数位数多于表结构时按写入数据库的规则舍入；含空值的结果为 NaN（与 SQL 中 NULL 参与运算一致）
+    """
+    sales, sales_ok = to_scaled(p['sales'], 0)
+    price, price_ok = to_scaled(p['price'], MONEY_PLACES)
+    ex, ex_ok = to_scaled(p['ex_rate'], EXCHANGE_PLACES)
+    usd = p['pr_hit'] & p['is_usd']
+    v = {
+        'sales': sales,
+        # 找不到价格按 0；非 USD 价格乘以 1.00
+        'price': np.where(p['pr_hit'], price, 0),
+        'fx': np.where(usd, ex, 10 ** EXCHANGE_PLACES),
+    }
+    ok = {}
+    v['cost'], ok['cost'] = to_scaled(p['unit_cost'], MONEY_PLACES)
+    for name, key in (('soft', 'soft_rate'), ('rand', 'rand_rate'), ('after', 'after_sales_rate'),
+                      ('mkt', 'mkt_prov_rate'), ('func', 'func_rate'), ('hq', 'hq_rate')):
+        v[name], ok[name] = to_scaled(p[key], RATE_PLACES)
+    for name in ('reg_mkt', 'reg_labor', 'reg_var', 'reg_fixed'):
+        v[name], ok[name] = to_scaled(p[name], MONEY_PLACES)
+
+    # 各结果依赖的参数都有值时结果才有值
+    ok_rev = sales_ok & (~p['pr_hit'] | (price_ok & (~usd | ex_ok)))
+    ok_tc = sales_ok & ok['cost']
+    ok_gross = ok_rev & ok_tc
+    ok_rand = ok_tc & ok['soft'] & ok['rand']
+    ok_after = ok_tc & ok['after']
+    ok_mkt = ok_rev & ok['mkt']
+    ok_func = ok_tc & ok['func']
+    ok_hq = ok_tc & ok['hq']
+    ok_margin = ok_gross & ok_rand & ok_after & ok_mkt & ok['reg_mkt'] & ok['reg_labor'] & ok['reg_var']
+    valid = {
+        'Revenues': ok_rev, 'Gross_profits': ok_gross, 'Margin_profits': ok_margin,
+        'Net_income': ok_margin & ok['reg_fixed'] & ok_func & ok_hq,
+        'Costs': ok_tc, 'pre_Costs': ok_tc & (sales != 0),
+        'RandD_expenses': ok_rand, 'After_sales_provision': ok_after, 'Marketing_provision': ok_mkt,
+        'Functional_expenses': ok_func, 'Headquarters_expenses': ok_hq,
+    }
+
+    # 估算中间量的量级，可能超出 int64 的行改用 Python 大整数计算
+    rate_sum = sum(np.abs(v[k]) for k in ('soft', 'rand', 'after', 'func', 'hq')).astype(float)
+    reg_sum = sum(np.abs(v[k]) for k in ('reg_mkt', 'reg_labor', 'reg_var', 'reg_fixed')).astype(float)
+    magnitude = (np.abs(sales.astype(float) * v['price'] * v['fx']) * (10 ** 4 + np.abs(v['mkt']))
+                 + np.abs(v['cost'] * sales.astype(float)) * (10 ** 6 + 100 * rate_sum) + reg_sum * 10 ** 6)
+    big = magnitude >= INT64_SAFE / 8
+
+    n = len(sales)
+    cents = {}
+    for rows, dtype in ((~big, np.int64), (big, object)):
+        if not rows.any():
+            continue
+        part = {k: a[rows].astype(dtype) for k, a in v.items()}
+        for col, values in _fixed_point_kernel(part, breakdown, display).items():
+            cents.setdefault(col, np.zeros(n))[rows] = np.asarray(values).astype(float)
+
+    if breakdown:
+        valid['Gross_profits_ratio'] = ok_gross & (cents['Revenues'] != 0)
+    return {col: scaled_to_float(values, valid[col]) for col, values in cents.items()}
+
+
+def compute_financials(df_input: pd.DataFrame, tables: dict, breakdown: bool = False,
+                       display: bool = False) -> pd.DataFrame:
+    """
+    列式计算财务指标
+    :param df_input: 至少包含 h_Time, Country, Model, Sales 列
+    :param tables: prepare_parameter_tables() 的返回值
+    :param breakdown: 是否追加 Display 表的明细列（DISPLAY_DETAIL_COLUMNS）
+    :param display: 按 Display_Calc 的口径计算（隐含 breakdown）：只返回各参数表都匹配上的行，
+                    各项逐项取整到分后再相加，结果与刷新后的 Display 行一致
+    :return: 输入的副本，追加 Market/Revenues/Gross_profits/Margin_profits/Net_income/Model_label/Series
+    """
+    if df_input.empty:
+        return df_input
+
+    breakdown = breakdown or display
+    result = df_input.copy()
+    n = len(df_input)
+
+    if not _tables_complete(tables) or any(c not in df_input.columns for c in ['h_Time', 'Country', 'Model', 'Sales']):
+        result = _fill_error_rows(result, df_input, np.ones(n, dtype=bool))
+        result = _with_detail_columns(result) if breakdown else result
+        return result.iloc[:0] if display else result
+
+    p = _resolve_parameters(df_input, tables)
+    errors = p['errors']
+
+    # === 定点计算（整数运算，舍入规则同 MySQL 的 DECIMAL ROUND） ===
+    out = _fixed_point_results(p, breakdown, display)
+
+    # 填充结果
+    result['Market'] = p['market']
+    result['Revenues'] = out['Revenues']
+    result['Gross_profits'] = out['Gross_profits']
+    result['Margin_profits'] = out['Margin_profits']
+    result['Net_income'] = out['Net_income']
+    result['Model_label'] = p['keys']['Model_label'].to_numpy(dtype=object)
+    result['Series'] = p['keys']['Series'].to_numpy(dtype=object)
+
+    if breakdown:
+        # 明细列：各项费用保留两位小数，比率按已取整的金额计算（与原视图一致）
+        pr, pr_hit, reg_hit = p['pr'], p['pr_hit'], p['reg_hit']
+        result['id'] = pr['id'].where(pr_hit, None).to_numpy(dtype=object) if 'id' in pr.columns else None
+        result['Price'] = np.where(pr_hit, p['price'], np.nan)
+        result['pre_Costs'] = out['pre_Costs']
+        result['Costs'] = out['Costs']
+        result['Gross_profits_ratio'] = out['Gross_profits_ratio']
+        result['RandD_expenses'] = out['RandD_expenses']
+        result['After_sales_provision'] = out['After_sales_provision']
+        result['Marketing_provision'] = out['Marketing_provision']
+        result['Marketing_expenses'] = np.where(reg_hit, p['reg_mkt'], np.nan)
+        result['Labor_costs'] = np.where(reg_hit, p['reg_labor'], np.nan)
+        result['Other_variable_expenses'] = np.where(reg_hit, p['reg_var'], np.nan)
+        result['Other_fixed_expenses'] = np.where(reg_hit, p['reg_fixed'], np.nan)
+        result['Functional_expenses'] = out['Functional_expenses']
+        result['Headquarters_expenses'] = out['Headquarters_expenses']
+        result['Exchange_time'] = np.where(p['ex_hit'], p['keys']['h_Time'].to_numpy(dtype=object), None)
+        result = _fill_error_rows(result, df_input, errors)
+        # 出错行的明细列置空
+        result.loc[errors, DISPLAY_DETAIL_COLUMNS] = None
+        return result[p['matched'] & ~errors] if display else result
+
+    return _fill_error_rows(result, df_input, errors)
+
+
+def financial_components(df_input: pd.DataFrame, tables: dict) -> pd.DataFrame:
+    """
+    把 Net_income 拆成对参数线性的分量（未取整），供敏感性分析使用：
+    Net_income = (Revenues_local + Revenues_usd) × (1 - mkt_prov_rate)
+                 - Total_costs × (1 + cost_rate) - Regional_expenses
+    其中 Revenues_usd 随汇率等比变化，Total_costs 随单位成本等比变化
+    :return: h_Time/Country/Model/Market/Model_label/Series + 上述分量列；
+             出错、含空值或缺少参数（不出现在 Display 中）的行分量为 0
+    """
+    dims = ['h_Time', 'Country', 'Model', 'Market', 'Model_label', 'Series']
+    value_cols = ['Revenues_local', 'Revenues_usd', 'Total_costs', 'cost_rate', 'mkt_prov_rate', 'Regional_expenses']
+    if (df_input.empty or not _tables_complete(tables)
+            or any(c not in df_input.columns for c in ['h_Time', 'Country', 'Model', 'Sales'])):
+        return pd.DataFrame(columns=dims + value_cols)
+
+    p = _resolve_parameters(df_input, tables)
+    sales, ok = p['sales'], ~p['errors']
+    revenues = sales * p['true_price']
+    # 只有找到汇率的 USD 价格才随汇率变化（缺失汇率时引擎按 1.0 处理，与情景模拟一致）
+    usd = p['pr_hit'] & p['is_usd'] & p['ex_hit']
+
+    out = pd.DataFrame({
+        'h_Time': p['keys']['h_Time'].to_numpy(dtype=object),
+        'Country': p['keys']['Country'].to_numpy(dtype=object),
+        'Model': p['keys']['Model'].to_numpy(dtype=object),
+        'Market': p['market'],
+        'Model_label': p['keys']['Model_label'].to_numpy(dtype=object),
+        'Series': p['keys']['Series'].to_numpy(dtype=object),
+        'Revenues_local': np.where(ok & ~usd, revenues, 0.0),
+        'Revenues_usd': np.where(ok & usd, revenues, 0.0),
+        'Total_costs': np.where(ok, p['unit_cost'] * sales, 0.0),
+        'cost_rate': np.where(ok, p['soft_rate'] + p['rand_rate'] + p['after_sales_rate']
+                              + p['func_rate'] + p['hq_rate'], 0.0),
+        'mkt_prov_rate': np.where(ok, p['mkt_prov_rate'], 0.0),
+        'Regional_expenses': np.where(ok, p['reg_mkt'] + p['reg_labor'] + p['reg_var'] + p['reg_fixed'], 0.0),
+    })
+    # 含空值的行在引擎中 Net_income 为 NaN、汇总时被跳过，缺少参数的行不出现在 Display 中，这里整行置 0 保持一致
+    invalid = ~np.isfinite(out[value_cols].to_numpy(dtype=float)).all(axis=1) | ~p['matched']
+    out.loc[invalid, value_cols] = 0.0
+    return out
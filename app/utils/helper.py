@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 from utils.i18n import get_text
+from utils.cache_regions import invalidate_regions
 import streamlit as st
 
 def detect_currency_columns(df):
@@ -162,7 +163,7 @@ def apply_currency_conversion(df, db, target_currency='CNY', time_column=None):
     st.warning(f"不支持的目标货币: {target_currency}")
     return df, get_text('unit_yuan')
 
-def handle_save_success(db, user_info, action_type, message_prefix, details, operation_type="保存"):
+def handle_save_success(db, user_info, action_type, message_prefix, details, operation_type="保存", tables=None):
     """
     通用保存成功处理函数（增强版）
     :param db: 数据库管理器实例
@@ -171,6 +172,8 @@ def handle_save_success(db, user_info, action_type, message_prefix, details, ope
     :param message_prefix: 提示前缀 (如 '成本数据') -> 最终显示 '成本数据保存成功！'
     :param details: 日志详情
     :param operation_type: 操作类型 ('保存', '删除', '更新')
+    :param tables: 需要额外清除缓存区域的表（写入未经 DatabaseManager 时传入）；
+                   经 DatabaseManager 的写入已自动清除对应区域，查看 / 导出日志不清除任何缓存
     """
     try:
         # 1. 记录日志 - 使用新的insert_system_log函数
@@ -195,11 +198,9 @@ def handle_save_success(db, user_info, action_type, message_prefix, details, ope
         if not log_success:
             print(f"记录操作日志失败: {username}, {action_type}, {details}")
         
-        # 2. 清除缓存
-        try:
-            st.cache_data.clear()
-        except:
-            pass
+        # 2. 清除缓存：只清除指定表对应的区域（见 utils/cache_regions）
+        if tables:
+            invalidate_regions(tables)
         
         # 3. 显示成功消息
         success_messages = {
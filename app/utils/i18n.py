@@ -193,6 +193,49 @@ TRANSLATIONS = {
         'tab_sales': '销量',
         'tab_revenue': '收入',
         'tab_net_income': '净利润',
+        'analysis_opt_scenario': '情景模拟',
+        'scenario_title': '情景模拟（What-if）',
+        'scenario_desc': '在当前参数的副本上修改汇率、成本、费率或区域费用，重新计算并与基准对比，不写入数据库。',
+        'scenario_param_table': '参数表',
+        'scenario_param_column': '参数列',
+        'scenario_mode': '修改方式',
+        'scenario_mode_set': '设为',
+        'scenario_mode_add': '增加',
+        'scenario_mode_scale': '乘以',
+        'scenario_value': '数值',
+        'scenario_tbl_exchange': '汇率',
+        'scenario_tbl_costs': '单位成本',
+        'scenario_tbl_prices': '销售价格',
+        'scenario_tbl_ratio1': '系列费率',
+        'scenario_tbl_ratio2': '国家费率',
+        'scenario_tbl_ratio3': '售后费率',
+        'scenario_tbl_regional': '区域费用',
+        'btn_add_override': '添加修改',
+        'btn_clear_overrides': '清空修改',
+        'btn_run_scenario': '运行模拟',
+        'scenario_overrides': '当前修改',
+        'scenario_no_overrides': '尚未添加任何参数修改',
+        'scenario_group_by': '对比维度',
+        'scenario_baseline': '基准',
+        'scenario_result': '情景',
+        'scenario_delta': '变化',
+        'scenario_elapsed': '计算 {rows} 行，用时 {seconds:.3f} 秒',
+        'analysis_opt_sensitivity': '敏感性分析',
+        'sens_title': '敏感性与蒙特卡洛分析',
+        'sens_desc': '以当前参数为基准（倍数 1.0），对汇率、单位成本、市场活动计提率做单因素变动与随机抽样，观察净利润分布。',
+        'sens_param_exchange_rate': '汇率',
+        'sens_param_unit_cost': '单位成本',
+        'sens_param_marketing_provision_rate': '市场活动计提率',
+        'sens_range': '单因素变动幅度 (±%)',
+        'sens_std': '模拟标准差 (%)',
+        'sens_samples': '模拟次数',
+        'btn_run_sensitivity': '运行分析',
+        'sens_tornado': '龙卷风图（单因素对总净利润的影响）',
+        'sens_percentiles': '净利润分位数',
+        'sens_distribution': '总净利润分布',
+        'sens_low': '下限',
+        'sens_high': '上限',
+        'sens_elapsed': '{scenarios} 个情景 × {groups} 个分组，用时 {seconds:.3f} 秒',
         'db_check_connection': '请检查数据库连接和表名是否正确',
         'download_month_data': '本月数据_{current_month}.xlsx',
         'download_quarter_data_file': '上季度数据_{start_date}_至_{end_date}.xlsx',
@@ -344,6 +387,7 @@ TRANSLATIONS = {
         'log_role': '角色',
         'log_action': '操作类型',
         'log_details': '详情',
+        'log_repeat_count': '次数',
         'log_export_csv': '导出日志 (CSV)',
         'log_export_excel': '导出日志 (Excel)',
         'log_analysis': '日志统计分析',
@@ -695,6 +739,49 @@ TRANSLATIONS = {
         'tab_sales': 'Sales',
         'tab_revenue': 'Revenue',
         'tab_net_income': 'Net Income',
+        'analysis_opt_scenario': 'What-if Scenario',
+        'scenario_title': 'What-if Scenario Analysis',
+        'scenario_desc': 'Change exchange rates, costs, ratios or regional expenses on a copy of the current parameters, recompute and compare with the baseline. Nothing is written to the database.',
+        'scenario_param_table': 'Parameter Table',
+        'scenario_param_column': 'Parameter',
+        'scenario_mode': 'Mode',
+        'scenario_mode_set': 'Set to',
+        'scenario_mode_add': 'Add',
+        'scenario_mode_scale': 'Multiply by',
+        'scenario_value': 'Value',
+        'scenario_tbl_exchange': 'Exchange Rate',
+        'scenario_tbl_costs': 'Unit Cost',
+        'scenario_tbl_prices': 'Sales Price',
+        'scenario_tbl_ratio1': 'Series Ratios',
+        'scenario_tbl_ratio2': 'Country Ratios',
+        'scenario_tbl_ratio3': 'After-sales Ratio',
+        'scenario_tbl_regional': 'Regional Expenses',
+        'btn_add_override': 'Add Override',
+        'btn_clear_overrides': 'Clear Overrides',
+        'btn_run_scenario': 'Run Scenario',
+        'scenario_overrides': 'Current Overrides',
+        'scenario_no_overrides': 'No overrides added yet',
+        'scenario_group_by': 'Compare By',
+        'scenario_baseline': 'Baseline',
+        'scenario_result': 'Scenario',
+        'scenario_delta': 'Change',
+        'scenario_elapsed': 'Computed {rows} rows in {seconds:.3f} s',
+        'analysis_opt_sensitivity': 'Sensitivity',
+        'sens_title': 'Sensitivity & Monte Carlo Analysis',
+        'sens_desc': 'Using the current parameters as the baseline (factor 1.0), shift and sample the exchange rate, unit cost and marketing provision rate to see the net income distribution.',
+        'sens_param_exchange_rate': 'Exchange Rate',
+        'sens_param_unit_cost': 'Unit Cost',
+        'sens_param_marketing_provision_rate': 'Marketing Provision Rate',
+        'sens_range': 'One-at-a-time Range (±%)',
+        'sens_std': 'Simulation Std Dev (%)',
+        'sens_samples': 'Number of Scenarios',
+        'btn_run_sensitivity': 'Run Analysis',
+        'sens_tornado': 'Tornado Chart (impact on total net income)',
+        'sens_percentiles': 'Net Income Percentiles',
+        'sens_distribution': 'Total Net Income Distribution',
+        'sens_low': 'Low',
+        'sens_high': 'High',
+        'sens_elapsed': '{scenarios} scenarios × {groups} groups in {seconds:.3f} s',
         
         # --- System Info ---
         'sys_status_cpu': 'CPU Usage',
@@ -795,6 +882,7 @@ TRANSLATIONS = {
         'log_role': 'Role',
         'log_action': 'Action',
         'log_details': 'Details',
+        'log_repeat_count': 'Count',
         'log_export_csv': 'Export Logs (CSV)',
         'log_export_excel': 'Export Logs (Excel)',
         'log_analysis': 'Log Analysis',
@@ -0,0 +1,115 @@
+# app/utils/money.py
+"""
+定点金额运算
+金额（DECIMAL(x,2)）以 int64 的"分"表示，比率 / 汇率按表结构的小数位数放大为整数，
+乘法、加减与舍入都在整数上完成，没有浮点误差；舍入规则与 MySQL 对 DECIMAL 的
+ROUND(x, 2) 一致：四舍五入，远离零（-0.125 -> -0.13）。
+超出 int64 范围的行由调用方改用 Python 大整数（object 数组）走同样的运算。
+"""
+from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
+import pandas as pd
+
+# ================= 表结构中的小数位数 =================
+MONEY_PLACES = 2      # 金额 DECIMAL(x,2)
+RATE_PLACES = 4       # 比率 DECIMAL(5,4)
+EXCHANGE_PLACES = 2   # 汇率 DECIMAL(3,2)
+
+# int64 运算的安全上限（留出加减余量）
+INT64_SAFE = 2 ** 62
+
+# 浮点可精确表示整数的上限，超过时改用 Decimal 逐个换算
+_FLOAT_EXACT = 2 ** 52
+
+
+def _half_away(scaled: np.ndarray) -> np.ndarray:
+    """浮点 -> 最近的整数，恰好为 .5 时远离零（容忍十进制小数的二进制表示误差）"""
+    mag = np.abs(scaled)
+    floor = np.floor(mag)
+    frac = mag - floor
+    tie = np.abs(frac - 0.5) <= 8 * np.finfo(float).eps * np.maximum(mag, 1.0)
+    rounded = np.where(tie | (frac > 0.5), floor + 1, floor)
+    return np.copysign(rounded, scaled)
+
+
+def to_scaled(values, places: int):
+    """
+    数值 -> (放大 10^places 后的 int64 数组, 是否有值的布尔数组)
+    输入可为 float / Decimal / 字符串 / None；位数多于 places 时按写入 DECIMAL 列的规则舍入，
+    空值与无法解析的值记为 0 且标记为无值
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(np.asarray(values))
+    floats = pd.to_numeric(series, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    valid = np.isfinite(floats)
+    scaled = np.where(valid, floats, 0.0) * 10 ** places
+    result = _half_away(np.clip(scaled, -INT64_SAFE, INT64_SAFE)).astype(np.int64)
+
+    big = np.flatnonzero(np.abs(scaled) >= _FLOAT_EXACT)
+    if len(big):
+        raw = series.to_numpy(dtype=object)
+        quant = Decimal(1)
+        for i in big:
+            exact = Decimal(str(raw[i])).scaleb(places).quantize(quant, rounding=ROUND_HALF_UP)
+            if abs(exact) >= INT64_SAFE:
+                raise OverflowError(f"金额超出定点运算范围: {raw[i]}")
+            result[i] = int(exact)
+    return result, valid
+
+
+def to_cents(values):
+    """金额 -> (int64 分, 是否有值)"""
+    return to_scaled(values, MONEY_PLACES)
+
+
+def round_div(numerator, denominator):
+    """
+    整数除法，四舍五入（远离零）
+    numerator / denominator 可为 int64 或 Python 整数（object）数组；分母为 0 的位置结果为 0，由调用方标记为空
+    """
+    num = np.asarray(numerator)
+    den = np.asarray(denominator)
+    negative = (num < 0) != (den < 0)
+    num_abs, den_abs = np.abs(num), np.abs(den)
+    safe_den = np.where(den_abs == 0, 1, den_abs)
+    quotient = (2 * num_abs + safe_den) // (2 * safe_den)
+    quotient = np.where(den_abs == 0, 0, quotient)
+    return np.where(negative, -quotient, quotient)
+
+
+def rescale(values, from_places: int, to_places: int = MONEY_PLACES):
+    """把放大 10^from_places 的整数舍入到 to_places 位（等价于 ROUND(x, to_places)）"""
+    if from_places <= to_places:
+        return np.asarray(values) * 10 ** (to_places - from_places)
+    return round_div(values, 10 ** (from_places - to_places))
+
+
+# ================= 结果输出 =================
+def scaled_to_float(values, valid, places: int = MONEY_PLACES) -> np.ndarray:
+    """定点整数 -> 浮点（最接近该十进制数的 double），无值处为 NaN"""
+    floats = np.asarray(values).astype(float) / 10 ** places
+    return np.where(valid, floats, np.nan)
+
+
+def cents_to_decimals(cents, valid) -> list:
+    """分 -> Decimal 列表（写回 DECIMAL 列用，精确无误差），无值处为 None"""
+    return [Decimal(int(c)).scaleb(-MONEY_PLACES) if ok else None
+            for c, ok in zip(np.asarray(cents).tolist(), np.asarray(valid).tolist())]
+
+
+def money_decimals(values) -> list:
+    """金额列（float / Decimal / None）-> Decimal 列表"""
+    return cents_to_decimals(*to_cents(values))
+
+
+# ================= 汇总 =================
+def sum_money(df: pd.DataFrame, by, columns) -> pd.DataFrame:
+    """
+    按维度汇总金额列：先换算为分再做整数求和，避免大量浮点相加的累积误差
+    空值按 0 计入，与 DataFrame.sum 跳过空值的结果一致
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    frame = df[by].copy()
+    for col in columns:
+        frame[col] = to_cents(df[col])[0]
+    totals = frame.groupby(by, sort=True, observed=True)[list(columns)].sum()
+    return totals.astype(float) / 10 ** MONEY_PLACES
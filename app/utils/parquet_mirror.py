@@ -0,0 +1,308 @@
+# app/utils/parquet_mirror.py
+"""
+分析查询的列式快照（Parquet + DuckDB）
+History / Budget / Display / Sales_Price 按 h_Time 分区、参数表各一个文件导出为 Parquet，
+分析页的汇总、透视、对比查询在进程内用 DuckDB 读取快照执行，不占用 MySQL：
+- 页面 SQL 原样执行：快照注册为同名视图，s_Display 等视图按建库脚本（4、11）重新定义
+- 过期：本进程写入某表后该表快照立即过期；其他进程的写入由 Table_Version 版本号发现
+  （见 utils/table_versions）；导出超过 max_age 秒的快照同样视为过期。
+  过期时本次查询改查数据库，并在后台线程重新导出；也可由定时任务刷新：
+      python -m utils.parquet_mirror [--role 角色] [表名 ...]      （在 app 目录下执行）
+- 每次导出写入新的一代目录，再原子替换 CURRENT 清单，正在读取旧快照的查询不受影响
+- 快照按数据库角色（连接池）分开导出与读取，每个角色只读到以自己的账号导出的数据；
+  因无权限导出失败的表，该角色不再使用快照也不再导出，其他失败在 retry_interval 秒内不重试
+- DECIMAL 列以 Parquet DECIMAL 保存，DuckDB 中的求和与 MySQL 一样是定点运算
+- 未安装 duckdb 时 available 为 False，分析查询全部直接读数据库
+"""
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pymysql.constants import FIELD_TYPE
+from config import PARQUET_MIRROR_CONFIG
+from utils.query_cache import VIEW_TABLES, table_names
+from utils.sqlite_backend import SCRIPT_DIR, split_statements
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# 快照的表：事实表按 h_Time 分区，参数表数据量小、不分区
+PARTITIONED_TABLES = ['History', 'Budget', 'Display', 'Sales_Price']
+PARAMETER_TABLES = ['Country', 'Model', 'Exchange', 'Costs',
+                    'Ratio_Expenses1', 'Ratio_Expenses2', 'Ratio_Expenses3', 'Regional_Expenses']
+MIRROR_TABLES = PARTITIONED_TABLES + PARAMETER_TABLES
+
+# 视图定义来源（按顺序执行，后面的脚本覆盖同名视图）
+VIEW_SCRIPTS = ['4_创建视图.sql', '11_物化Display表.sql']
+
+_views = None
+_views_lock = threading.Lock()
+
+
+def mirror_views() -> dict:
+    """小写视图名 -> (CREATE VIEW 语句, 依赖的基础表)，按建库脚本中的顺序；只含 VIEW_TABLES 中登记的视图"""
+    global _views
+    with _views_lock:
+        if _views is None:
+            views = {}
+            for filename in VIEW_SCRIPTS:
+                with open(os.path.join(SCRIPT_DIR, filename), encoding='utf-8') as f:
+                    script = f.read()
+                for statement in split_statements(script):
+                    words = statement.split(None, 2)
+                    if len(words) < 3 or [w.upper() for w in words[:2]] != ['CREATE', 'VIEW']:
+                        continue
+                    name = words[2].split('(')[0].strip().strip('`').lower()
+                    if name in VIEW_TABLES:
+                        views.pop(name, None)
+                        views[name] = (statement, VIEW_TABLES[name])
+            _views = views
+        return _views
+
+
+def decimal_columns(description) -> dict:
+    """cursor.description 中的 DECIMAL 列 -> (精度, 小数位数)"""
+    columns = {}
+    for d in description or ():
+        if d[1] in (FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL):
+            scale = d[5] or 0
+            columns[d[0]] = (min(max(d[4] or 38, scale + 1), 38), scale)
+    return columns
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(path: str) -> str:
+    return "'" + path.replace("'", "''") + "'"
+
+
+def _to_duckdb(query: str, has_params: bool) -> str:
+    """pymysql 风格占位符 -> DuckDB：带参数时 %s 为占位符、%% 为字面量 %"""
+    if not has_params:
+        return query
+    return query.replace('%s', '?').replace('%%', '%')
+
+
+class ParquetMirror:
+    def __init__(self, path: str, enabled: bool = True, max_age: float = 600.0, keep_generations: int = 2,
+                 retry_interval: float = 300.0):
+        self.path = path
+        self.available = enabled and duckdb is not None
+        self.max_age = max_age
+        self.keep_generations = max(1, keep_generations)
+        self.retry_interval = retry_interval
+        self._known = {t.lower(): t for t in MIRROR_TABLES}
+        self._writes = {}           # 表名 -> 本进程的写入次数（写入使所有角色的快照过期）
+        self._exported = {}         # (角色, 表名) -> 最近一次导出开始时的写入次数
+        self._exporting = set()     # 正在导出的 (角色, 表名)（同一份快照同时只导出一次）
+        self._failed = {}           # (角色, 表名) -> 最近一次导出失败的时间
+        self._denied = set()        # 无读取权限的 (角色, 表名)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.exports = 0
+        self.errors = 0
+
+    # ================= 读取 =================
+    def servable_tables(self, query: str, role: str):
+        """查询只读取快照中的表 / 视图、且角色可读取这些表时返回其依赖的基础表，否则返回 None"""
+        if not self.available:
+            return None
+        names = table_names(query)
+        if not names:
+            return None
+        views = mirror_views()
+        tables = set()
+        for name in names:
+            if name in self._known:
+                tables.add(self._known[name])
+            elif name in views:
+                tables |= views[name][1]
+            else:
+                return None
+        with self._lock:
+            if any((role, table) in self._denied for table in tables):
+                return None
+        return tables
+
+    def stale_tables(self, tables, role: str, versions: dict) -> set:
+        """
+        该角色需要重新导出的表：没有快照、本进程导出后又写入过、版本号与导出时不同或超过 max_age
+        :param versions: 各表当前版本号（DatabaseManager.table_versions），未跟踪时为空
+        """
+        now = time.time()
+        stale = set()
+        for table in tables:
+            manifest = self._manifest(table, role)
+            with self._lock:
+                written = self._writes.get(table, 0) != self._exported.get((role, table), 0)
+            if (manifest is None or written or now - manifest['exported_at'] > self.max_age
+                    or manifest.get('version') != versions.get(table)):
+                stale.add(table)
+        return stale
+
+    def query(self, query: str, params, tables, role: str):
+        """在该角色的快照上执行查询；依赖的视图按建库脚本定义"""
+        con = duckdb.connect()
+        try:
+            for table in sorted(tables):
+                con.execute(self._table_view(table, role))
+            for statement, bases in mirror_views().values():
+                if bases <= tables:
+                    con.execute(statement)
+            df = con.execute(_to_duckdb(query, bool(params)), list(params) if params else None).df()
+        finally:
+            con.close()
+        with self._lock:
+            self.hits += 1
+        return df
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def _table_view(self, table: str, role: str) -> str:
+        manifest = self._manifest(table, role)
+        directory = os.path.join(self.path, role, table, manifest['generation'])
+        columns = ', '.join(_quote(c) for c in manifest['columns'])
+        if manifest['partitioned']:
+            source = (f"read_parquet({_literal(os.path.join(directory, '**', '*.parquet'))}, "
+                      f"hive_partitioning = true, hive_types = {{'h_Time': 'VARCHAR'}})")
+        else:
+            source = f"read_parquet({_literal(os.path.join(directory, 'data.parquet'))})"
+        return f"CREATE VIEW {table} AS SELECT {columns} FROM {source}"
+
+    def _manifest(self, table: str, role: str):
+        try:
+            with open(os.path.join(self.path, role, table, 'CURRENT'), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # ================= 过期 / 导出 =================
+    def mark_stale(self, tables=None):
+        """本进程写入后调用；tables 为 None 时全部过期"""
+        with self._lock:
+            for table in (MIRROR_TABLES if tables is None else tables):
+                if table in MIRROR_TABLES:
+                    self._writes[table] = self._writes.get(table, 0) + 1
+
+    def exportable(self, tables, role: str) -> list:
+        """该角色现在可以导出的表：不在导出中、有读取权限、最近 retry_interval 秒内没有导出失败"""
+        now = time.monotonic()
+        with self._lock:
+            return [t for t in tables
+                    if (role, t) not in self._exporting and (role, t) not in self._denied
+                    and now - self._failed.get((role, t), -self.retry_interval) >= self.retry_interval]
+
+    def begin_export(self, table: str, role: str):
+        """登记导出；该快照正在导出时返回 None，否则返回当前写入次数（导出完成时交回 write_snapshot）"""
+        with self._lock:
+            if (role, table) in self._exporting:
+                return None
+            self._exporting.add((role, table))
+            return self._writes.get(table, 0)
+
+    def end_export(self, table: str, role: str, failed: bool = False, denied: bool = False):
+        """
+        结束导出
+        :param denied: 因该角色无读取权限而失败；之后该角色不再导出、也不再从快照读取这张表
+        """
+        with self._lock:
+            self._exporting.discard((role, table))
+            if failed:
+                self.errors += 1
+                self._failed[(role, table)] = time.monotonic()
+                if denied:
+                    self._denied.add((role, table))
+            else:
+                self._failed.pop((role, table), None)
+
+    def write_snapshot(self, table: str, role: str, df, decimals: dict, version, mark: int):
+        """
+        写入该角色的新一代快照并替换 CURRENT
+        :param decimals: DECIMAL 列 -> (精度, 小数位数)，见 decimal_columns
+        :param version: 读取数据前该表的版本号（与 stale_tables 比对）
+        :param mark: begin_export 返回的写入次数
+        """
+        table_dir = os.path.join(self.path, role, table)
+        generation = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        target = os.path.join(table_dir, generation)
+        os.makedirs(table_dir, exist_ok=True)
+        columns = ', '.join(
+            f"CAST({_quote(c)} AS DECIMAL({decimals[c][0]}, {decimals[c][1]})) AS {_quote(c)}"
+            if c in decimals else _quote(c)
+            for c in df.columns
+        )
+        # 空表无法按分区写出，写为单个文件
+        partitioned = table in PARTITIONED_TABLES and len(df) > 0
+        con = duckdb.connect()
+        try:
+            con.register('snapshot', df)
+            if partitioned:
+                con.execute(f"COPY (SELECT {columns} FROM snapshot) TO {_literal(target)} "
+                            f"(FORMAT PARQUET, PARTITION_BY (h_Time))")
+            else:
+                os.makedirs(target)
+                con.execute(f"COPY (SELECT {columns} FROM snapshot) TO "
+                            f"{_literal(os.path.join(target, 'data.parquet'))} (FORMAT PARQUET)")
+        finally:
+            con.close()
+
+        manifest = {'generation': generation, 'columns': [str(c) for c in df.columns],
+                    'partitioned': partitioned, 'rows': len(df),
+                    'exported_at': time.time(), 'version': version}
+        tmp = os.path.join(table_dir, f"CURRENT.{uuid.uuid4().hex}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(table_dir, 'CURRENT'))
+        with self._lock:
+            self._exported[(role, table)] = mark
+            self.exports += 1
+        self._prune(table_dir, generation)
+
+    def _prune(self, table_dir: str, current: str):
+        """只保留最近 keep_generations 代（含当前一代）"""
+        generations = sorted(
+            name for name in os.listdir(table_dir)
+            if os.path.isdir(os.path.join(table_dir, name)) and name != current
+        )
+        for name in generations[:max(0, len(generations) - (self.keep_generations - 1))]:
+            shutil.rmtree(os.path.join(table_dir, name), ignore_errors=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'available': self.available, 'hits': self.hits, 'misses': self.misses,
+                    'exports': self.exports, 'errors': self.errors, 'denied': len(self._denied)}
+
+
+# ================= 进程级共享实例 =================
+_mirror = ParquetMirror(**PARQUET_MIRROR_CONFIG)
+
+
+def get_parquet_mirror() -> ParquetMirror:
+    return _mirror
+
+
+if __name__ == "__main__":
+    import argparse
+    from utils.database import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="从主库导出分析查询的 Parquet 快照")
+    parser.add_argument('tables', nargs='*', help="表名（默认全部）")
+    parser.add_argument('--role', default=None, help="以该角色的数据库账号导出（默认 DB_CONFIG 账号）")
+    args = parser.parse_args()
+
+    if not _mirror.available:
+        raise SystemExit("未安装 duckdb 或快照已停用（PARQUET_MIRROR_CONFIG['enabled']）")
+    started = time.perf_counter()
+    ok = DatabaseManager(args.role).refresh_snapshots(args.tables or None)
+    print(f"快照刷新{'完成' if ok else '失败'}，用时 {time.perf_counter() - started:.1f}s")
+    if not ok:
+        raise SystemExit(1)
@@ -0,0 +1,252 @@
+# app/utils/query_cache.py
+"""
+查询结果缓存（进程级，线程安全）
+DatabaseManager.execute_query 的结果按 (数据库角色, 规范化后的 SQL, 参数) 缓存，
+并记录每条查询读取的表；本进程内任何写入（execute_update / save_* / delete_*）
+经 _notify_tables_changed 通知后，只有读取了被写入表的缓存项失效。
+- 容量：按条数与占用内存双重限制，超出时淘汰最久未使用的项（LRU）
+- 只缓存能确定读取了哪些表、且结果确定的 SELECT（含 NOW()/RAND() 等的查询不缓存）
+- 其他进程（如命令行全量重算）的写入不会通知到这里
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from config import QUERY_CACHE_CONFIG
+
+# 视图 -> 其依赖的基础表（见 数据库建立/4_创建视图.sql；Display 已物化为表）
+VIEW_TABLES = {
+    's_display': {'Display', 'History', 'Budget'},
+    's_display_model': {'Display', 'History', 'Budget'},
+    's_display_country': {'Display', 'History', 'Budget'},
+    'displayindia': {'Display'},
+    'displaypakistan': {'Display'},
+    'displaysouthafrica': {'Display'},
+    'displaykenya': {'Display'},
+    'sales_price_india': {'Sales_Price'},
+    'sales_price_pakistan': {'Sales_Price'},
+    'sales_price_south_africa': {'Sales_Price'},
+    'sales_price_kenya': {'Sales_Price'},
+    # 数据库建立/15_Display刷新过程.sql
+    'display_calc': {'Sales_Price', 'Model', 'Country', 'Exchange', 'Costs', 'Ratio_Expenses1',
+                     'Ratio_Expenses2', 'Ratio_Expenses3', 'Regional_Expenses'},
+}
+
+# 结果不确定或带锁的查询不缓存
+_UNCACHEABLE_RE = re.compile(
+    r"\b(?:NOW|CURDATE|CURTIME|CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|SYSDATE|UTC_DATE|UTC_TIMESTAMP"
+    r"|UNIX_TIMESTAMP|RAND|UUID|CONNECTION_ID|LAST_INSERT_ID|FOUND_ROWS)\b|\bFOR\s+UPDATE\b|\bLOCK\s+IN\b",
+    re.IGNORECASE
+)
+
+# SQL 中的字符串字面量或空白
+_LITERAL_OR_SPACE_RE = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")|\s+")
+
+# FROM / JOIN 之后的表引用列表：表名 [[AS] 别名] [, 表名 [[AS] 别名] ...]
+_TABLE_LIST_START_RE = re.compile(r"\b(?:FROM|JOIN)\s+", re.IGNORECASE)
+_TABLE_ITEM_RE = re.compile(
+    r"`?(\w+)`?(?:\.`?(\w+)`?)?"
+    r"(?:\s+(?:AS\s+)?(?!(?:WHERE|JOIN|LEFT|RIGHT|INNER|CROSS|NATURAL|STRAIGHT_JOIN|ON|USING|GROUP|ORDER"
+    r"|LIMIT|UNION|HAVING|WINDOW|FOR|LOCK)\b)\w+)?\s*(,)?\s*",
+    re.IGNORECASE
+)
+
+
+def normalize_sql(query: str) -> str:
+    """合并字符串字面量以外的连续空白，使只有排版不同的同一查询命中同一缓存项"""
+    return _LITERAL_OR_SPACE_RE.sub(lambda m: m.group(1) or ' ', query).strip()
+
+
+def table_names(query: str) -> list:
+    """FROM / JOIN 之后引用的表 / 视图名（小写，schema.table 取表名部分）"""
+    names = []
+    for start in _TABLE_LIST_START_RE.finditer(query):
+        pos = start.end()
+        while True:
+            item = _TABLE_ITEM_RE.match(query, pos)
+            if not item:
+                break
+            names.append((item.group(2) or item.group(1)).lower())
+            if not item.group(3):
+                break
+            pos = item.end()
+    return names
+
+
+def referenced_tables(query: str, known_tables: dict):
+    """
+    解析查询读取的基础表（视图展开为其依赖表）
+    :param known_tables: 小写表名 -> 规范表名
+    :return: 表名集合；含未知表 / 视图时返回 None
+    """
+    tables = set()
+    for name in table_names(query):
+        if name in known_tables:
+            tables.add(known_tables[name])
+        elif name in VIEW_TABLES:
+            tables |= VIEW_TABLES[name]
+        else:
+            # 未知表 / 视图（如 information_schema）：不缓存
+            return None
+    return tables or None
+
+
+def read_tables(query: str, known_tables: dict):
+    """可缓存的 SELECT 读取的基础表；无法确定或不应缓存时返回 None"""
+    if not re.match(r"\s*(?:SELECT|WITH|\()", query, re.IGNORECASE) or _UNCACHEABLE_RE.search(query):
+        return None
+    return referenced_tables(query, known_tables)
+
+
+def _freeze(params):
+    """参数 -> 可哈希的键；含不可哈希的值时返回 None"""
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        frozen = tuple(sorted(params.items()))
+    else:
+        frozen = tuple(params)
+    try:
+        hash(frozen)
+    except TypeError:
+        return None
+    return frozen
+
+
+def cache_key(role: str, query: str, params=None):
+    """(数据库角色, 规范化 SQL, 参数)；参数不可哈希时返回 None"""
+    frozen = _freeze(params)
+    if frozen is None:
+        return None
+    return role or 'default', normalize_sql(query), frozen
+
+
+class QueryCache:
+    def __init__(self, max_entries: int = 256, max_bytes: int = 256 * 1024 * 1024, max_rows: int = 200000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self._entries = OrderedDict()   # 键 -> (DataFrame, 读取的表, 占用字节)，末尾为最近使用
+        self._by_table = {}             # 表名 -> 读取该表的缓存键集合
+        self._versions = {}             # 表名 -> 失效次数，用于丢弃查询期间已失效的结果
+        self._written_at = {}           # 表名 -> 最近一次失效的时间（time.monotonic）
+        self._cleared_at = float('-inf')  # 最近一次全部失效的时间
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # ================= 读取 / 写入 =================
+    def get(self, key):
+        """命中时返回结果的副本（调用方可随意修改），未命中返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            df = entry[0]
+        return df.copy()
+
+    def versions(self, tables) -> dict:
+        """查询前记录相关表的版本，写入缓存时比对"""
+        with self._lock:
+            return {t: self._versions.get(t, 0) for t in tables}
+
+    def put(self, key, df, tables, versions: dict, min_age: float = 0.0) -> bool:
+        """
+        写入缓存；查询期间相关表已被写入（版本变化）或结果过大时不缓存
+        :param min_age: 相关表在最近 min_age 秒内被写入过时不缓存（只读库可能尚未同步到该写入）
+        :return: 是否已缓存
+        """
+        if len(df) > self.max_rows:
+            return False
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if any(self._versions.get(t, 0) != v for t, v in versions.items()):
+                return False
+            if min_age > 0:
+                now = time.monotonic()
+                last = max([self._cleared_at] + [self._written_at.get(t, float('-inf')) for t in tables])
+                if now - last < min_age:
+                    return False
+            self._remove(key)
+            self._entries[key] = (df.copy(), frozenset(tables), size)
+            self._bytes += size
+            for t in tables:
+                self._by_table.setdefault(t, set()).add(key)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return True
+
+    # ================= 失效 =================
+    def invalidate(self, tables=None):
+        """
+        使读取了指定表的缓存项失效
+        :param tables: 被写入的表名集合；为 None 时清空全部
+        """
+        now = time.monotonic()
+        with self._lock:
+            if tables is None:
+                self._cleared_at = now
+                self.invalidations += len(self._entries)
+                for t in set(self._versions) | set(self._by_table):
+                    self._versions[t] = self._versions.get(t, 0) + 1
+                self._entries.clear()
+                self._by_table.clear()
+                self._bytes = 0
+                return
+            for t in tables:
+                self._versions[t] = self._versions.get(t, 0) + 1
+                self._written_at[t] = now
+                for key in list(self._by_table.get(t, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def _remove(self, key):
+        """删除一项并维护表索引（调用方持有锁）"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        _, tables, size = entry
+        self._bytes -= size
+        for t in tables:
+            keys = self._by_table.get(t)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[t]
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries), 'bytes': self._bytes,
+                'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions, 'invalidations': self.invalidations,
+            }
+
+
+# ================= 进程级共享实例 =================
+_cache = QueryCache(**QUERY_CACHE_CONFIG)
+
+
+def get_query_cache() -> QueryCache:
+    return _cache
+
+
+def invalidate_query_cache(tables=None):
+    """按数据库表名使查询缓存失效；tables 为 None 时清空全部"""
+    _cache.invalidate(tables)
+
+
+def query_cache_stats() -> dict:
+    """命中 / 未命中次数、条数与占用内存"""
+    return _cache.stats()
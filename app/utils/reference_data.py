@@ -0,0 +1,71 @@
+# app/utils/reference_data.py
+"""
+参考数据缓存（进程级，线程安全）
+型号 / 国家 / 时间周期下拉列表以及 Model、Country 元数据每次渲染会被多个表单、标签页反复读取，
+而它们只在录入型号、国家或价格时变化。
+这里按 (数据库角色, 名称) 缓存在进程内，所有会话共享，只有写入源表时才失效
+（本进程的写入经 DatabaseManager._notify_tables_changed，其他进程的写入经 Table_Version 轮询）。
+"""
+import threading
+from utils.sql_queries import (
+    Q_GET_REFERENCE_MODELS, Q_GET_REFERENCE_COUNTRIES, Q_GET_REFERENCE_TIME_PERIODS,
+    Q_GET_MODELS_INFO, Q_GET_ALL_COUNTRIES
+)
+
+# 名称 -> (源表, 加载语句, 取值列；None 表示缓存整张 DataFrame)
+REFERENCE_SOURCES = {
+    'models': ({'Model'}, Q_GET_REFERENCE_MODELS, 'Model'),
+    'countries': ({'Country'}, Q_GET_REFERENCE_COUNTRIES, 'Country'),
+    # Display 由 Sales_Price 经 Display_Calc 派生（refresh_display 刷新），写入价格表时一并失效
+    'time_periods': ({'Display', 'Sales_Price'}, Q_GET_REFERENCE_TIME_PERIODS, 'h_Time'),
+    'model_info': ({'Model'}, Q_GET_MODELS_INFO, None),
+    'country_info': ({'Country'}, Q_GET_ALL_COUNTRIES, None),
+}
+
+_lock = threading.Lock()
+_entries = {}       # (数据库角色, 名称) -> 列表或 DataFrame
+_versions = {}      # 名称 -> 失效次数，用于丢弃加载期间已失效的结果
+_stats = {'hits': 0, 'misses': 0}
+
+
+def get_reference_data(name: str, load_query, role: str = 'default'):
+    """
+    获取参考数据（列表或 DataFrame 的副本），未缓存时通过 load_query(sql) 加载
+    :param load_query: 执行查询并返回 DataFrame 的函数，失败时返回空 DataFrame
+    """
+    _, query, column = REFERENCE_SOURCES[name]
+    key = (role, name)
+    with _lock:
+        value = _entries.get(key)
+        if value is not None:
+            _stats['hits'] += 1
+            return list(value) if column else value.copy()
+        _stats['misses'] += 1
+        version = _versions.get(name, 0)
+
+    df = load_query(query)
+    value = (df[column].tolist() if not df.empty else []) if column else df
+    # 空结果不缓存（可能是查询失败），下次重新加载
+    if len(value):
+        with _lock:
+            if _versions.get(name, 0) == version:
+                _entries[key] = value
+    return list(value) if column else value.copy()
+
+
+def invalidate_reference_data(tables=None):
+    """
+    按数据库表名使参考数据失效
+    :param tables: 被写入的表名集合；为 None 时清空全部
+    """
+    with _lock:
+        for name, (sources, _, _) in REFERENCE_SOURCES.items():
+            if tables is None or sources & set(tables):
+                _versions[name] = _versions.get(name, 0) + 1
+                for key in [k for k in _entries if k[1] == name]:
+                    del _entries[key]
+
+
+def reference_data_stats() -> dict:
+    with _lock:
+        return {'entries': len(_entries), **_stats}
@@ -0,0 +1,153 @@
+# app/utils/scenario.py
+"""
+情景模拟（What-if）
+在参数快照的副本上应用参数覆盖，按 Display_Calc 的口径重新计算 Display 形态的结果，不写入数据库。
+例：2026-03 美元汇率改为 7.4；Tiger 系列研发费率上调 2 个百分点。
+"""
+import threading
+import pandas as pd
+from utils.financials import PARAMETER_TABLES, compute_financials
+from utils.money import sum_money
+
+# ================= 可覆盖的参数 =================
+# 参数表名（同 PARAMETER_TABLES）-> 可覆盖的数值列
+SCENARIO_TABLES = {
+    'exchange': ['Exchange_rate'],
+    'costs': ['Costs'],
+    'prices': ['Price'],
+    'ratio1': ['Software_product_amortization_rate_acc_cost', 'RandD_rate_acc_cost'],
+    'ratio2': ['Functional_cost_allocation_rate_acc_cost',
+               'Business_group_headquarters_allocation_rate_acc_cost',
+               'Marketing_activities_provision_rate_acc_revenue'],
+    'ratio3': ['After_sales_provision_rate_acc_cost'],
+    'regional': ['Marketing_expenses', 'Labor_cost', 'Other_variable_expenses', 'Other_fixed_expenses'],
+}
+
+# 覆盖方式：set 直接赋值，add 加上增量，scale 乘以系数
+OVERRIDE_MODES = ('set', 'add', 'scale')
+
+# 参数缺失时计算引擎使用的默认值（新增行时其余列按此补齐）
+_MISSING_DEFAULTS = {'Exchange_rate': 1.0}
+
+# 对比用指标列
+SCENARIO_METRICS = ['Revenues', 'Gross_profits', 'Margin_profits', 'Net_income']
+
+
+# ================= 基础事实数据缓存（进程级） =================
+# Sales_Price 的 (h_Time, Country, Model, Sales)，即 Display 每一行的来源，只有写入 Sales_Price 时才失效
+_base_lock = threading.Lock()
+_base_facts = None
+_base_version = 0
+
+
+def get_scenario_base(load_query, query: str) -> pd.DataFrame:
+    """
+    获取情景模拟的基础事实数据，缓存缺失时通过 load_query(sql) 加载
+    """
+    global _base_facts
+    with _base_lock:
+        if _base_facts is not None:
+            return _base_facts
+        version = _base_version
+
+    df = load_query(query)
+    if not df.empty:
+        with _base_lock:
+            if _base_version == version:
+                _base_facts = df
+    return df
+
+
+def invalidate_scenario_base(tables=None):
+    """按数据库表名使基础事实数据失效；tables 为 None 时直接清空"""
+    global _base_facts, _base_version
+    if tables is not None and 'Sales_Price' not in set(tables):
+        return
+    with _base_lock:
+        _base_facts = None
+        _base_version += 1
+
+
+# ================= 参数覆盖 =================
+def make_override(table: str, column: str, value: float, key: dict = None, mode: str = 'set') -> dict:
+    """构造一条参数覆盖并校验"""
+    if table not in SCENARIO_TABLES:
+        raise ValueError(f"不支持覆盖的参数表: {table}")
+    if column not in SCENARIO_TABLES[table]:
+        raise ValueError(f"参数表 {table} 没有可覆盖的列: {column}")
+    if mode not in OVERRIDE_MODES:
+        raise ValueError(f"未知的覆盖方式: {mode}")
+    key = {k: v for k, v in (key or {}).items() if v not in (None, '')}
+    unknown = set(key) - set(PARAMETER_TABLES[table][0])
+    if unknown:
+        raise ValueError(f"参数表 {table} 没有键列: {', '.join(sorted(unknown))}")
+    return {'table': table, 'key': key, 'column': column, 'value': float(value), 'mode': mode}
+
+
+def apply_overrides(tables: dict, overrides) -> dict:
+    """
+    在参数表副本上依次应用覆盖，原快照不变
+    :param overrides: make_override() 构造的列表
+    key 可只给部分键列（如 {'Series': 'Tiger'}），为空时作用于整张表；
+    key 给全且参数表中没有该行时，set 方式会新增一行（价格表除外，缺少币种）
+    """
+    result = dict(tables)
+    copied = set()
+    for ov in overrides:
+        ov = make_override(ov['table'], ov['column'], ov['value'], ov.get('key'), ov.get('mode', 'set'))
+        name, column, value, mode, key = ov['table'], ov['column'], ov['value'], ov['mode'], ov['key']
+        keys, values = PARAMETER_TABLES[name]
+
+        df = result[name]
+        if name not in copied:
+            df = df.copy()
+            for col in SCENARIO_TABLES[name]:
+                if col in df.columns:
+                    df[col] = pd.to_numeric(df[col], errors='coerce')
+            copied.add(name)
+
+        mask = pd.Series(True, index=df.index)
+        for col, val in key.items():
+            mask &= df[col] == val
+
+        if mask.any():
+            if mode == 'set':
+                df.loc[mask, column] = value
+            elif mode == 'add':
+                df.loc[mask, column] = df.loc[mask, column] + value
+            else:
+                df.loc[mask, column] = df.loc[mask, column] * value
+        elif mode == 'set' and set(key) == set(keys) and name != 'prices':
+            row = {**key, **{c: _MISSING_DEFAULTS.get(c, 0.0) for c in values}, column: value}
+            df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
+
+        result[name] = df
+    return result
+
+
+# ================= 情景计算与对比 =================
+def run_scenario(facts: pd.DataFrame, tables: dict, overrides) -> pd.DataFrame:
+    """
+    应用覆盖后按 Display_Calc 的口径重新计算（缺少参数的行不出现，各项逐项取整），
+    返回 Display 形态的结果（覆盖值按表结构的小数位数取整后参与计算）
+    """
+    return compute_financials(facts, apply_overrides(tables, overrides), display=True)
+
+
+def compare_with_baseline(baseline: pd.DataFrame, scenario: pd.DataFrame, by) -> pd.DataFrame:
+    """
+    按维度汇总基准与情景结果
+    :param by: 汇总维度列，如 ['Country'] / ['Model'] / ['h_Time']
+    :return: 每个指标的 _baseline / _scenario / _delta 三列
+    """
+    if baseline.empty:
+        return pd.DataFrame()
+    # 按分做整数汇总，大量行相加也没有浮点累积误差
+    base = sum_money(baseline, by, SCENARIO_METRICS)
+    scen = sum_money(scenario, by, SCENARIO_METRICS)
+    out = pd.DataFrame(index=base.index)
+    for m in SCENARIO_METRICS:
+        out[f'{m}_baseline'] = base[m]
+        out[f'{m}_scenario'] = scen[m]
+        out[f'{m}_delta'] = (scen[m] - base[m]).round(2)
+    return out.reset_index()
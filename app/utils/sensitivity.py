@@ -0,0 +1,128 @@
+# app/utils/sensitivity.py
+"""
+敏感性分析与蒙特卡洛模拟
+基于 financials.financial_components 的线性分解：先按分组汇总系数，
+再对全部情景做数组广播，K 个情景 × G 个分组一次算完，不逐情景循环。
+参数均以相对基准的倍数表示（1.0 = 基准）；结果为未取整的 Net_income。
+"""
+import numpy as np
+import pandas as pd
+
+# ================= 可分析的参数 =================
+# exchange_rate: USD 价格使用的汇率；unit_cost: 单位成本；marketing_provision_rate: 市场活动计提率
+SENSITIVITY_PARAMETERS = ['exchange_rate', 'unit_cost', 'marketing_provision_rate']
+
+# 分组系数列
+_COEFFICIENTS = ['L', 'U', 'Lm', 'Um', 'C', 'R']
+
+
+def group_coefficients(components: pd.DataFrame, by) -> pd.DataFrame:
+    """
+    按分组汇总 Net_income 的系数：
+    Net(fx, fc, fm) = L + fx·U - fm·(Lm + fx·Um) - fc·C - R
+    L/U 为本币/美元收入，Lm/Um 为其市场计提部分，C 为含各项费率的成本，R 为区域费用
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    frame = pd.DataFrame({
+        **{col: components[col] for col in by},
+        'L': components['Revenues_local'],
+        'U': components['Revenues_usd'],
+        'Lm': components['Revenues_local'] * components['mkt_prov_rate'],
+        'Um': components['Revenues_usd'] * components['mkt_prov_rate'],
+        'C': components['Total_costs'] * (1 + components['cost_rate']),
+        'R': components['Regional_expenses'],
+    })
+    return frame.groupby(by, sort=True)[_COEFFICIENTS].sum()
+
+
+def _factor(scenarios: dict, name: str, k: int) -> np.ndarray:
+    """取参数倍数并整理为 (K, 1) 列向量，缺省为 1.0"""
+    values = np.asarray(scenarios.get(name, 1.0), dtype=float).reshape(-1)
+    return np.broadcast_to(values, (k,)).reshape(k, 1)
+
+
+def evaluate(coefficients: pd.DataFrame, scenarios: dict) -> np.ndarray:
+    """
+    计算每个情景、每个分组的 Net_income
+    :param scenarios: {参数名: 倍数数组 (K,)}，未给出的参数按 1.0
+    :return: (K, G) 矩阵，列顺序同 coefficients.index
+    """
+    unknown = set(scenarios) - set(SENSITIVITY_PARAMETERS)
+    if unknown:
+        raise ValueError(f"未知的敏感性参数: {', '.join(sorted(unknown))}")
+    k = max([np.size(v) for v in scenarios.values()] or [1])
+    fx = _factor(scenarios, 'exchange_rate', k)
+    fc = _factor(scenarios, 'unit_cost', k)
+    fm = _factor(scenarios, 'marketing_provision_rate', k)
+    co = {name: coefficients[name].to_numpy(dtype=float)[None, :] for name in _COEFFICIENTS}
+    return co['L'] + fx * co['U'] - fm * (co['Lm'] + fx * co['Um']) - fc * co['C'] - co['R']
+
+
+# ================= 情景生成 =================
+def grid_scenarios(grids: dict) -> dict:
+    """参数网格的笛卡尔积 -> {参数名: (K,) 倍数数组}"""
+    names = list(grids)
+    mesh = np.meshgrid(*[np.asarray(grids[n], dtype=float) for n in names], indexing='ij')
+    return {name: m.ravel() for name, m in zip(names, mesh)}
+
+
+def sample_scenarios(distributions: dict, n: int, seed=None) -> dict:
+    """
+    按分布抽样 -> {参数名: (n,) 倍数数组}
+    :param distributions: {参数名: ('normal', 均值, 标准差)
+                                | ('uniform', 下限, 上限)
+                                | ('triangular', 下限, 众数, 上限)}
+    """
+    rng = np.random.default_rng(seed)
+    samples = {}
+    for name, (kind, *params) in distributions.items():
+        if kind == 'normal':
+            samples[name] = rng.normal(params[0], params[1], n)
+        elif kind == 'uniform':
+            samples[name] = rng.uniform(params[0], params[1], n)
+        elif kind == 'triangular':
+            samples[name] = rng.triangular(params[0], params[1], params[2], n)
+        else:
+            raise ValueError(f"未知的分布类型: {kind}")
+    return samples
+
+
+# ================= 结果汇总 =================
+def _group_labels(index: pd.Index) -> list:
+    return [" / ".join(map(str, i)) if isinstance(i, tuple) else i for i in index]
+
+
+def tornado(coefficients: pd.DataFrame, ranges: dict) -> pd.DataFrame:
+    """
+    单因素敏感性（龙卷风图数据）：其余参数保持基准，逐个取上下限
+    :param ranges: {参数名: (下限倍数, 上限倍数)}
+    :return: 各参数在上下限时的总 Net_income、相对基准的变化与振幅，按振幅降序
+    """
+    base = evaluate(coefficients, {}).sum()
+    rows = []
+    for name, (low, high) in ranges.items():
+        net_low, net_high = evaluate(coefficients, {name: np.array([low, high])}).sum(axis=1)
+        rows.append({
+            'parameter': name, 'low': low, 'high': high,
+            'net_income_low': net_low, 'net_income_high': net_high,
+            'delta_low': net_low - base, 'delta_high': net_high - base,
+            'swing': abs(net_high - net_low),
+        })
+    return pd.DataFrame(rows).sort_values('swing', ascending=False).reset_index(drop=True)
+
+
+def percentile_table(coefficients: pd.DataFrame, net_matrix: np.ndarray,
+                     percentiles=(5, 25, 50, 75, 95)) -> pd.DataFrame:
+    """
+    每个分组 Net_income 分布的分位数表，末行为合计
+    :param net_matrix: evaluate() 的 (K, G) 结果
+    """
+    base = evaluate(coefficients, {})[0]
+    values = np.column_stack([net_matrix, net_matrix.sum(axis=1)])
+    df = pd.DataFrame(np.percentile(values, percentiles, axis=0).T, columns=[f'P{p}' for p in percentiles])
+    df.insert(0, 'group', _group_labels(coefficients.index) + ['Total'])
+    df['baseline'] = np.append(base, base.sum())
+    df['mean'] = values.mean(axis=0)
+    df['std'] = values.std(axis=0)
+    df['prob_loss'] = (values < 0).mean(axis=0)
+    return df
@@ -9,9 +9,15 @@ Q_LOG_ACTION = """
     VALUES (%s, %s, %s, %s)
 """
 
+# 异步批量写入：Log_Time 为调用时刻，Repeat_Count 为合并的查看次数（见 utils/audit_log）
+Q_LOG_ACTION_AT = """
+    INSERT INTO System_Log (Log_Time, Username, Role, Action_Type, Details, Repeat_Count)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
 # 基础日志查询（保持向后兼容）
 Q_GET_SYSTEM_LOGS = """
-    SELECT Log_ID, Log_Time, Username, Role, Action_Type, Details
+    SELECT Log_ID, Log_Time, Username, Role, Action_Type, Details, Repeat_Count
     FROM System_Log
     ORDER BY Log_Time DESC
     LIMIT 1000
@@ -19,7 +25,7 @@ Q_GET_SYSTEM_LOGS = """
 
 # 带筛选的日志查询
 Q_GET_SYSTEM_LOGS_FILTERED = """
-    SELECT Log_ID, Log_Time, Username, Role, Action_Type, Details
+    SELECT Log_ID, Log_Time, Username, Role, Action_Type, Details, Repeat_Count
     FROM System_Log
     WHERE 1=1
     {user_filter}
@@ -77,6 +83,11 @@ Q_GET_ALL_COUNTRIES = """
     ORDER BY Country
 """
 
+# 下拉列表（见 utils/reference_data）
+Q_GET_REFERENCE_MODELS = "SELECT DISTINCT Model FROM Model ORDER BY Model"
+Q_GET_REFERENCE_COUNTRIES = "SELECT DISTINCT Country FROM Country ORDER BY Country"
+Q_GET_REFERENCE_TIME_PERIODS = "SELECT DISTINCT h_Time FROM Display ORDER BY h_Time DESC"
+
 Q_GET_TIME_SERIES = """
     SELECT h_Time, 
            SUM(Sales) as total_sales,
@@ -144,6 +155,192 @@ Q_GET_MODELS_INFO = """
     ORDER BY Model
 """
 
+# ==================== Display 刷新 ====================
+# Display 由 Sales_Price 驱动，按 Display_Calc 视图（原 Display 视图的公式）重算，
+# 见 数据库建立/15_Display刷新过程.sql；参数依次为 h_Time / Country / Model，NULL 表示该维度不限
+Q_REFRESH_DISPLAY = "CALL refresh_display(%s, %s, %s)"
+# 一次调用刷新多组范围（见 数据库建立/16_Display批量刷新过程.sql）；
+# 参数为 [[h_Time, Country, Model], ...] 的 JSON 文本，null 表示该维度不限
+Q_REFRESH_DISPLAY_KEYS = "CALL refresh_display_keys(%s)"
+
+# 存储过程 -> 其写入的表（用于缓存失效）
+PROCEDURE_WRITES = {
+    'refresh_display': {'Display'},
+    'refresh_display_keys': {'Display'},
+}
+
+# 按年份 / 起始月份刷新时需要处理的月份：Sales_Price 中现有的月份，以及 Display 中可能需要移除的月份
+# {where} 为筛选条件，参数需按 Sales_Price/Display 各给一份
+Q_GET_DISPLAY_REFRESH_MONTHS = """
+    SELECT h_Time FROM Sales_Price f WHERE {where}
+    UNION
+    SELECT h_Time FROM Display f WHERE {where}
+    ORDER BY h_Time
+"""
+
+# Display 一致性校验：服务端 Display_Calc 的结果，以及驱动它的 Sales_Price 行（交给 Python 引擎计算）
+Q_GET_DISPLAY_CALC = "SELECT * FROM Display_Calc f WHERE {where}"
+Q_GET_DISPLAY_FACTS = "SELECT h_Time, Country, Model, Sales FROM Sales_Price f WHERE {where}"
+
+# ==================== 表版本跟踪 ====================
+# 各表版本号（分槽计数求和，见 数据库建立/12_表版本跟踪.sql）
+Q_GET_TABLE_VERSIONS = """
+    SELECT Table_Name, SUM(Version) AS Version
+    FROM Table_Version
+    GROUP BY Table_Name
+"""
+
+# ==================== 参数依赖（增量重算） ====================
+# 参数表 -> (键列, 事实表 History/Budget 上的筛选条件)
+# 条件中的占位符顺序与键列顺序一致；参数表某个键变化时，只需重算条件命中的行。
+# 条件只涉及 h_Time / Country / Model，同样用于从 Sales_Price 取出需要刷新的 Display 键
+# （Sales_Price.Exchange_time 恒等于 h_Time）
+DEPENDENT_FACT_FILTERS = {
+    'Exchange': (['Exchange_time'], "h_Time = %s"),
+    'Costs': (['Model', 'Country', 'Costs_time'], "(Model = %s AND Country = %s AND h_Time = %s)"),
+    'Sales_Price': (['Model', 'Country', 'h_Time'], "(Model = %s AND Country = %s AND h_Time = %s)"),
+    'Ratio_Expenses1': (['Series'], "Model IN (SELECT Model FROM Model WHERE Series = %s)"),
+    'Ratio_Expenses2': (['Country'], "Country = %s"),
+    'Ratio_Expenses3': (['Model_label', 'Country'],
+                        "(Model IN (SELECT Model FROM Model WHERE Model_label = %s) AND Country = %s)"),
+    'Regional_Expenses': (['Country', 'Expenses_time'], "(Country = %s AND h_Time = %s)"),
+    'Model': (['Model'], "Model = %s"),
+    'Country': (['Country'], "Country = %s"),
+}
+
+# {table} 为 History / Budget（或 Sales_Price，取 Display 需要刷新的键），{conditions} 为上面条件用 OR 拼接
+Q_GET_DEPENDENT_FACTS = """
+    SELECT h_Time, Country, Model, Sales
+    FROM {table}
+    WHERE {conditions}
+"""
+
+# ==================== 服务端批量重算（INSERT ... SELECT） ====================
+# 与 utils/financials.compute_financials 相同的公式、缺省值与运算顺序：
+#   汇率缺失按 1，价格/成本/比率/区域费用缺失按 0；全部以 DECIMAL 定点运算，
+#   ROUND 四舍五入（远离零），与 utils/money 的规则一致。Ratio_Expenses3 同一 (Model_label, Country) 取 ID 最大的一条。
+#   销量或收入为 0 时 pre_Costs / Gross_profits_ratio 为 NULL（NULLIF，严格模式下不触发除零错误，与 Python 引擎一致）。
+# {source}: 事实数据来源（SELECT h_Time, Country, Model, Sales ...）
+# {where}:  以 f. 为前缀的筛选条件（无筛选时为 1 = 1）
+Q_CALC_FINANCIALS_SQL = """
+    SELECT c.h_Time, c.Country, c.Market, c.Model, c.Model_label, c.Series, c.Sales,
+           ROUND(c.revenues, 2) AS Revenues,
+           ROUND(c.revenues - c.total_costs, 2) AS Gross_profits,
+           ROUND(c.margin, 2) AS Margin_profits,
+           ROUND(c.margin - c.reg_fixed - c.total_costs * c.func_rate - c.total_costs * c.hq_rate, 2) AS Net_income,
+           c.id, c.Price,
+           ROUND(ROUND(c.total_costs, 2) / NULLIF(c.Sales, 0), 2) AS pre_Costs,
+           ROUND(c.total_costs, 2) AS Costs,
+           ROUND(ROUND(c.revenues - c.total_costs, 2) / NULLIF(ROUND(c.revenues, 2), 0), 2) AS Gross_profits_ratio,
+           ROUND(c.total_costs * (c.soft_rate + c.rand_rate), 2) AS RandD_expenses,
+           ROUND(c.total_costs * c.after_sales_rate, 2) AS After_sales_provision,
+           ROUND(c.revenues * c.mkt_prov_rate, 2) AS Marketing_provision,
+           c.Marketing_expenses, c.Labor_costs, c.Other_variable_expenses, c.Other_fixed_expenses,
+           ROUND(c.total_costs * c.func_rate, 2) AS Functional_expenses,
+           ROUND(c.total_costs * c.hq_rate, 2) AS Headquarters_expenses,
+           c.Exchange_time
+    FROM (
+        SELECT b.*,
+               b.revenues - b.total_costs
+                   - b.total_costs * (b.soft_rate + b.rand_rate)
+                   - b.total_costs * b.after_sales_rate
+                   - b.revenues * b.mkt_prov_rate
+                   - b.reg_mkt - b.reg_labor - b.reg_var AS margin
+        FROM (
+            SELECT f.h_Time, f.Country, f.Model, f.Sales,
+                   IF(co.Country IS NULL, '', co.Market) AS Market,
+                   IF(m.Model IS NULL, '', m.Model_label) AS Model_label,
+                   IF(m.Model IS NULL, '', m.Series) AS Series,
+                   p.id, p.Price,
+                   f.Sales * IF(p.Model IS NULL, 0,
+                                IF(p.Currency = 'USD',
+                                   p.Price * IF(e.Exchange_time IS NULL, 1, e.Exchange_rate),
+                                   p.Price)) AS revenues,
+                   IF(cs.Model IS NULL, 0, cs.Costs) * f.Sales AS total_costs,
+                   IF(r1.Series IS NULL, 0, r1.Software_product_amortization_rate_acc_cost) AS soft_rate,
+                   IF(r1.Series IS NULL, 0, r1.RandD_rate_acc_cost) AS rand_rate,
+                   IF(r2.Country IS NULL, 0, r2.Functional_cost_allocation_rate_acc_cost) AS func_rate,
+                   IF(r2.Country IS NULL, 0, r2.Business_group_headquarters_allocation_rate_acc_cost) AS hq_rate,
+                   IF(r2.Country IS NULL, 0, r2.Marketing_activities_provision_rate_acc_revenue) AS mkt_prov_rate,
+                   IF(r3.Country IS NULL, 0, r3.After_sales_provision_rate_acc_cost) AS after_sales_rate,
+                   IF(g.Country IS NULL, 0, g.Marketing_expenses) AS reg_mkt,
+                   IF(g.Country IS NULL, 0, g.Labor_cost) AS reg_labor,
+                   IF(g.Country IS NULL, 0, g.Other_variable_expenses) AS reg_var,
+                   IF(g.Country IS NULL, 0, g.Other_fixed_expenses) AS reg_fixed,
+                   g.Marketing_expenses, g.Labor_cost AS Labor_costs,
+                   g.Other_variable_expenses, g.Other_fixed_expenses,
+                   e.Exchange_time
+            FROM ({source}) f
+            LEFT JOIN Model m ON m.Model = f.Model
+            LEFT JOIN Country co ON co.Country = f.Country
+            LEFT JOIN Exchange e ON e.Exchange_time = f.h_Time
+            LEFT JOIN Sales_Price p ON p.Model = f.Model AND p.Country = f.Country AND p.h_Time = f.h_Time
+            LEFT JOIN Costs cs ON cs.Model = f.Model AND cs.Country = f.Country AND cs.Costs_time = f.h_Time
+            LEFT JOIN Ratio_Expenses1 r1 ON r1.Series = m.Series
+            LEFT JOIN Ratio_Expenses2 r2 ON r2.Country = f.Country
+            LEFT JOIN Ratio_Expenses3 r3 ON r3.Ratio_expenses3_id = (
+                SELECT MAX(x.Ratio_expenses3_id) FROM Ratio_Expenses3 x
+                WHERE x.Model_label = m.Model_label AND x.Country = f.Country
+            )
+            LEFT JOIN Regional_Expenses g ON g.Country = f.Country AND g.Expenses_time = f.h_Time
+            WHERE {where}
+        ) b
+    ) c
+"""
+
+# 事实数据来源（Display 不在此列，由 Q_REFRESH_DISPLAY 刷新）
+SQL_RECOMPUTE_SOURCES = {
+    'History': "SELECT h_Time, Country, Model, Sales FROM History",
+    'Budget': "SELECT h_Time, Country, Model, Sales FROM Budget",
+}
+
+# {table} 为 History / Budget，{calc} 为 Q_CALC_FINANCIALS_SQL
+# 更新子句左侧带表名，避免与 SELECT 中同名列产生歧义
+Q_RECOMPUTE_FACTS_SQL = """
+    INSERT INTO {table} (h_Time, Country, Market, Model, Model_label, Series, 
+                         Sales, Revenues, Gross_profits, Margin_profits, Net_income)
+    SELECT h_Time, Country, Market, Model, Model_label, Series,
+           Sales, Revenues, Gross_profits, Margin_profits, Net_income
+    FROM ({calc}) calc
+    ON DUPLICATE KEY UPDATE
+        {table}.Market = VALUES(Market),
+        {table}.Model_label = VALUES(Model_label),
+        {table}.Series = VALUES(Series),
+        {table}.Sales = VALUES(Sales),
+        {table}.Revenues = VALUES(Revenues),
+        {table}.Gross_profits = VALUES(Gross_profits),
+        {table}.Margin_profits = VALUES(Margin_profits),
+        {table}.Net_income = VALUES(Net_income)
+"""
+
+# ==================== 全量重算（按国家 × 月份分区） ====================
+# 需要重算的分区：History ∪ Budget ∪ Sales_Price 中出现过的 (h_Time, Country)，
+# 以及 Display 中可能需要移除的分区
+# {where} 为筛选条件（无筛选时为 1 = 1），参数需按 History/Budget/Sales_Price/Display 各给一份
+Q_GET_RECOMPUTE_PARTITIONS = """
+    SELECT h_Time, Country FROM History WHERE {where}
+    UNION
+    SELECT h_Time, Country FROM Budget WHERE {where}
+    UNION
+    SELECT h_Time, Country FROM Sales_Price WHERE {where}
+    UNION
+    SELECT h_Time, Country FROM Display WHERE {where}
+    ORDER BY h_Time, Country
+"""
+
+# 单个分区的事实数据，{table} 为 History / Budget
+Q_GET_PARTITION_FACTS = """
+    SELECT h_Time, Country, Model, Sales
+    FROM {table}
+    WHERE h_Time = %s AND Country = %s
+"""
+
+# ==================== 情景模拟 ====================
+# 情景模拟的基础事实数据（与 Display 的数据来源一致）
+Q_GET_SCENARIO_BASE = """
+    SELECT h_Time, Country, Model, Sales FROM Sales_Price
+"""
+
 # ==================== 按时间范围查询 ====================
 Q_GET_HISTORY_BY_DATE_RANGE = """
     SELECT h_Time, Country, Market, Model, Model_label, Series, 
@@ -351,4 +548,13 @@ Q_CHECK_COSTS_EXISTS = """
     SELECT COUNT(*) as count 
     FROM Costs 
     WHERE Model = %s AND Country = %s AND Costs_time = %s
-"""
\ No newline at end of file
+"""
+
+# ==================== 批量导入（utils/bulk_load.py） ====================
+# 写入列与冲突时更新的列，与上面的 UPSERT 语句一致
+FACT_WRITE_COLUMNS = ['h_Time', 'Country', 'Market', 'Model', 'Model_label', 'Series',
+                      'Sales', 'Revenues', 'Gross_profits', 'Margin_profits', 'Net_income']
+FACT_UPDATE_COLUMNS = ['Market', 'Model_label', 'Series', 'Sales',
+                       'Revenues', 'Gross_profits', 'Margin_profits', 'Net_income']
+SALES_PRICE_WRITE_COLUMNS = ['id', 'Model', 'Country', 'h_Time', 'Currency', 'Sales', 'Price', 'Exchange_time']
+SALES_PRICE_UPDATE_COLUMNS = ['Currency', 'Sales', 'Price', 'Exchange_time']
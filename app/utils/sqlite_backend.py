@@ -0,0 +1,398 @@
+# app/utils/sqlite_backend.py
+"""
+嵌入式 SQLite 后端（无需 MySQL 服务器，用于本地分析与 CI）
+config.DB_BACKEND = 'sqlite' 时 DatabaseManager 的连接池改为创建这里的连接，
+连接 / 游标的用法与 pymysql 相同，页面与 DatabaseManager 中的 SQL 无需改动：
+- 表结构：首次打开库文件时按顺序执行 数据库建立/ 下的建表、视图、日志表、唯一索引、
+  物化 Display 与表版本跟踪脚本（只执行 CREATE / ALTER / DROP / INSERT IGNORE，跳过授权与示例数据）
+- 语句翻译：%s 占位符、ON DUPLICATE KEY UPDATE、INSERT IGNORE、IF()、DATE_SUB(..., INTERVAL n 单位)
+- NOW() / DATE_FORMAT() 以 Python 函数注册，按本地时间计算
+- 存储过程（如 refresh_display）不建到库中：CALL 时按建库脚本中的过程体逐条执行（只支持 IN 参数）
+- DECIMAL 列按 SQLite 的 NUMERIC 亲和性存储（读出为 int / float），金额的定点运算仍由 utils/money 完成；
+  服务端重算（recompute_financials_sql）在 SQLite 中以浮点运算，可能与 MySQL 的 DECIMAL 结果相差 0.01
+"""
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+# 建库脚本（按执行顺序）及引入它的表结构版本（PRAGMA user_version）；
+# 已建好的库只执行版本号更高的脚本
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '数据库建立')
+SCHEMA_SCRIPTS = [
+    (1, '1_创建表和索引.sql'),
+    (1, '4_创建视图.sql'),
+    (1, '8_创建日志表.sql'),
+    (1, '10_定义唯一索引.sql.sql'),
+    (1, '11_物化Display表.sql'),
+    (1, '12_表版本跟踪.sql'),
+    (2, '14_合并查看日志.sql'),
+    (3, '15_Display刷新过程.sql'),
+    (4, '16_Display批量刷新过程.sql'),
+]
+SCHEMA_VERSION = max(version for version, _ in SCHEMA_SCRIPTS)
+
+# 脚本中需要执行的语句；USE / SHOW / SELECT / GRANT 及示例数据、初始装载跳过
+_SCHEMA_STATEMENT_RE = re.compile(r"^\s*(?:CREATE|ALTER|DROP|INSERT\s+IGNORE|CALL)\b", re.IGNORECASE)
+
+# 内存库（':memory:'）改用共享缓存的命名内存库，连接池中的多条连接看到同一份数据
+_memory_keepers = {}
+_init_lock = threading.Lock()
+_initialized = set()
+
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_adapter(datetime, lambda v: v.strftime('%Y-%m-%d %H:%M:%S'))
+sqlite3.register_adapter(date, lambda v: v.isoformat())
+sqlite3.register_converter('TIMESTAMP', lambda b: datetime.fromisoformat(b.decode()))
+sqlite3.register_converter('DATETIME', lambda b: datetime.fromisoformat(b.decode()))
+
+
+# ================= 语句翻译 =================
+_PLACEHOLDER_RE = re.compile(r"%([s%])")
+_ON_DUPLICATE_RE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.IGNORECASE)
+_INSERT_SELECT_RE = re.compile(
+    r"^(\s*INSERT\s+(?:OR\s+IGNORE\s+)?INTO\s+`?\w+`?\s*\([^)]*\))\s*(SELECT\b.*)$",
+    re.IGNORECASE | re.DOTALL
+)
+_VALUES_FUNC_RE = re.compile(r"\bVALUES\s*\(\s*`?(\w+)`?\s*\)", re.IGNORECASE)
+_QUALIFIED_SET_RE = re.compile(r"(^|,)(\s*)`?\w+`?\.`?(\w+)`?(\s*=)")
+_INSERT_IGNORE_RE = re.compile(r"\bINSERT\s+IGNORE\b", re.IGNORECASE)
+_IF_FUNC_RE = re.compile(r"\bIF\s*\(", re.IGNORECASE)
+_DATE_SUB_RE = re.compile(
+    r"\bDATE_(SUB|ADD)\s*\(\s*(.+?)\s*,\s*INTERVAL\s+(%s|\?|\d+)\s+(SECOND|MINUTE|HOUR|DAY|MONTH|YEAR)\s*\)",
+    re.IGNORECASE
+)
+# JSON_TABLE(j, '$[*]' COLUMNS (c 类型 PATH '$[i]', ...)) -> json_each 上的子查询
+_JSON_TABLE_RE = re.compile(
+    r"\bJSON_TABLE\s*\(\s*(.+?)\s*,\s*'\$\[\*\]'\s+COLUMNS\s*\((.*?)\)\s*\)", re.IGNORECASE | re.DOTALL
+)
+_JSON_COLUMN_RE = re.compile(r"(\w+)\s+[^,]*?\bPATH\s+'([^']*)'", re.IGNORECASE)
+
+
+def _translate_json_table(match) -> str:
+    columns = ", ".join(f"json_extract(value, '{path}') AS {name}"
+                        for name, path in _JSON_COLUMN_RE.findall(match.group(2)))
+    return f"(SELECT {columns} FROM json_each({match.group(1)}))"
+
+
+def _translate_date_sub(match) -> str:
+    sign = '-' if match.group(1).upper() == 'SUB' else '+'
+    return f"datetime({match.group(2)}, '{sign}' || {match.group(3)} || ' {match.group(4).lower()}')"
+
+
+def _translate_upsert(query: str) -> str:
+    """INSERT ... ON DUPLICATE KEY UPDATE c = VALUES(c) -> INSERT ... ON CONFLICT DO UPDATE SET c = excluded.c"""
+    match = _ON_DUPLICATE_RE.search(query)
+    if not match:
+        return query
+    head, updates = query[:match.start()], query[match.end():]
+    # 更新子句左侧不能带表名（Display.Market = ...）
+    updates = _QUALIFIED_SET_RE.sub(lambda m: f"{m.group(1)}{m.group(2)}{m.group(3)}{m.group(4)}", updates.strip())
+    updates = _VALUES_FUNC_RE.sub(r"excluded.\1", updates)
+    # INSERT ... SELECT 与 ON CONFLICT 连用时 SELECT 需带 WHERE，否则 ON 会被解析为连接条件
+    select = _INSERT_SELECT_RE.match(head)
+    if select:
+        head = f"{select.group(1)} SELECT * FROM ({select.group(2).rstrip()}) WHERE true "
+    # 省略冲突目标：任一主键 / 唯一键冲突都执行更新，与 MySQL 相同
+    return f"{head}ON CONFLICT DO UPDATE SET {updates}"
+
+
+@lru_cache(maxsize=512)
+def translate_sql(query: str, has_params: bool = True) -> str:
+    """MySQL 语句 -> SQLite 语句（结果按语句缓存）"""
+    query = _DATE_SUB_RE.sub(_translate_date_sub, query)
+    query = _JSON_TABLE_RE.sub(_translate_json_table, query)
+    query = _INSERT_IGNORE_RE.sub('INSERT OR IGNORE', query)
+    query = _IF_FUNC_RE.sub('iif(', query)
+    query = _translate_upsert(query)
+    if has_params:
+        # 与 pymysql 一致：带参数时 %s 为占位符、%% 为字面量 %
+        query = _PLACEHOLDER_RE.sub(lambda m: '?' if m.group(1) == 's' else '%', query)
+    return query
+
+
+# ================= 注册的 MySQL 函数 =================
+_DATE_FORMAT_CODES = {'%i': '%M', '%s': '%S', '%M': '%B', '%b': '%b', '%e': '%d', '%k': '%H'}
+
+
+def _now() -> str:
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _date_format(value, fmt):
+    if value is None or fmt is None:
+        return None
+    value = datetime.fromisoformat(str(value))
+    return value.strftime(re.sub(r"%[a-zA-Z]", lambda m: _DATE_FORMAT_CODES.get(m.group(0), m.group(0)), fmt))
+
+
+# ================= 表结构 =================
+def split_statements(script: str) -> list:
+    """按分隔符拆分脚本，支持 DELIMITER 切换（触发器）；去掉 -- 注释"""
+    statements, current, delimiter = [], [], ';'
+    for line in script.splitlines():
+        stripped = line.strip()
+        if stripped.upper().startswith('DELIMITER '):
+            delimiter = stripped.split()[1]
+            continue
+        if stripped.startswith('--') or (not stripped and not current):
+            continue
+        current.append(line)
+        if stripped.endswith(delimiter):
+            statement = '\n'.join(current).rstrip()[:-len(delimiter)].strip()
+            if statement:
+                statements.append(statement)
+            current = []
+    if current and '\n'.join(current).strip():
+        statements.append('\n'.join(current).strip())
+    return statements
+
+
+_ENGINE_RE = re.compile(r"\)\s*ENGINE\s*=\s*\w+(?:\s+DEFAULT\s+CHARSET\s*=\s*\w+)?\s*$", re.IGNORECASE)
+_AUTO_INCREMENT_RE = re.compile(r"\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", re.IGNORECASE)
+_ON_UPDATE_NOW_RE = re.compile(r"`?(\w+)`?([^,\n]*?)\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP", re.IGNORECASE)
+_DEFAULT_NOW_RE = re.compile(r"\bDEFAULT\s+CURRENT_TIMESTAMP\b", re.IGNORECASE)
+_INLINE_INDEX_RE = re.compile(r",\s*(?:INDEX|KEY)\s+`?(\w+)`?\s*\(([^)]*)\)", re.IGNORECASE)
+_CREATE_TABLE_RE = re.compile(r"^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?", re.IGNORECASE)
+_ADD_UNIQUE_RE = re.compile(
+    r"^\s*ALTER\s+TABLE\s+`?(\w+)`?\s+ADD\s+UNIQUE\s+(?:KEY|INDEX)\s+`?(\w+)`?\s*\(([^)]*)\)\s*$", re.IGNORECASE
+)
+_DROP_VIEWS_RE = re.compile(r"^\s*DROP\s+VIEW\s+(IF\s+EXISTS\s+)?(.+)$", re.IGNORECASE | re.DOTALL)
+_PROCEDURE_DDL_RE = re.compile(r"^\s*(?:CREATE|DROP)\s+PROCEDURE\b", re.IGNORECASE)
+
+
+def translate_ddl(statement: str) -> list:
+    """建库脚本中的一条 MySQL 语句 -> 若干条 SQLite 语句"""
+    statement = statement.replace('CONNECTION_ID() % 16', '0')
+    if _PROCEDURE_DDL_RE.match(statement):
+        # 存储过程不建到库中，CALL 时由 procedures() 中的过程体执行
+        return []
+    add_unique = _ADD_UNIQUE_RE.match(statement)
+    if add_unique:
+        table, name, columns = add_unique.groups()
+        return [f"CREATE UNIQUE INDEX {name} ON {table}({columns})"]
+    drop_views = _DROP_VIEWS_RE.match(statement)
+    if drop_views:
+        # SQLite 的 DROP VIEW 一次只能删除一个视图
+        return [f"DROP VIEW {drop_views.group(1) or ''}{name.strip()}" for name in drop_views.group(2).split(',')]
+    create_table = _CREATE_TABLE_RE.match(statement)
+    if not create_table:
+        return [translate_sql(statement, has_params=False)]
+
+    table = create_table.group(1)
+    extra = []
+    statement = _ENGINE_RE.sub(')', statement.rstrip())
+    statement = _AUTO_INCREMENT_RE.sub('INTEGER PRIMARY KEY AUTOINCREMENT', statement)
+    # ON UPDATE CURRENT_TIMESTAMP 以触发器实现（recursive_triggers 默认关闭，不会重复触发）
+    for column, _ in _ON_UPDATE_NOW_RE.findall(statement):
+        extra.append(
+            f"CREATE TRIGGER {table.lower()}_{column.lower()}_touch AFTER UPDATE ON {table} FOR EACH ROW "
+            f"BEGIN UPDATE {table} SET {column} = datetime('now', 'localtime') WHERE rowid = NEW.rowid; END"
+        )
+    statement = _ON_UPDATE_NOW_RE.sub(r"\1\2", statement)
+    statement = _DEFAULT_NOW_RE.sub("DEFAULT (datetime('now', 'localtime'))", statement)
+    # 表内 INDEX / KEY 定义改为单独的 CREATE INDEX（SQLite 索引名全库唯一，加表名前缀）
+    for name, columns in _INLINE_INDEX_RE.findall(statement):
+        extra.append(f"CREATE INDEX {table.lower()}_{name} ON {table}({columns})")
+    statement = _INLINE_INDEX_RE.sub('', statement)
+    return [statement] + extra
+
+
+def init_schema(conn):
+    """按 SCHEMA_SCRIPTS 建库或升级；库已是当前版本时不做任何事"""
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    if current >= SCHEMA_VERSION:
+        return
+    for version, filename in SCHEMA_SCRIPTS:
+        if version <= current:
+            continue
+        with open(os.path.join(SCRIPT_DIR, filename), encoding='utf-8') as f:
+            script = f.read()
+        for statement in split_statements(script):
+            if not _SCHEMA_STATEMENT_RE.match(statement):
+                continue
+            call = _CALL_RE.match(statement)
+            if call:
+                # 初始装载（如 CALL refresh_display(NULL, NULL, NULL)）
+                call_procedure(conn.cursor(), call.group(1), _call_arguments(call.group(2), ()))
+                continue
+            for translated in translate_ddl(statement):
+                conn.execute(translated)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+
+
+# ================= 存储过程 =================
+_CREATE_PROCEDURE_RE = re.compile(
+    r"^\s*CREATE\s+PROCEDURE\s+`?(\w+)`?\s*\((.*?)\)\s*(?:SQL\s+SECURITY\s+\w+\s*)?BEGIN\b(.*)\bEND\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+_IN_PARAM_RE = re.compile(r"\bIN\s+(\w+)", re.IGNORECASE)
+_CALL_RE = re.compile(r"^\s*CALL\s+`?(\w+)`?\s*\((.*)\)\s*;?\s*$", re.IGNORECASE | re.DOTALL)
+
+_procedures = None
+_procedures_lock = threading.Lock()
+
+
+def procedures() -> dict:
+    """建库脚本中的存储过程：小写过程名 -> (参数名列表, 过程体中的语句，参数已改为 :参数名)"""
+    global _procedures
+    with _procedures_lock:
+        if _procedures is None:
+            found = {}
+            for _, filename in SCHEMA_SCRIPTS:
+                with open(os.path.join(SCRIPT_DIR, filename), encoding='utf-8') as f:
+                    script = f.read()
+                for statement in split_statements(script):
+                    match = _CREATE_PROCEDURE_RE.match(statement)
+                    if not match:
+                        continue
+                    name, params, body = match.groups()
+                    names = _IN_PARAM_RE.findall(params)
+                    param_re = re.compile(r"\b(" + "|".join(map(re.escape, names)) + r")\b") if names else None
+                    statements = []
+                    for part in body.split(';'):
+                        if part.strip():
+                            sql = translate_sql(part.strip(), has_params=False)
+                            statements.append(param_re.sub(r":\1", sql) if param_re else sql)
+                    found[name.lower()] = (names, statements)
+            _procedures = found
+        return _procedures
+
+
+def _call_arguments(args: str, params) -> list:
+    """CALL 的实参：%s 依次取 params，NULL 为空值"""
+    values, params = [], list(params or ())
+    for arg in (a.strip() for a in args.split(',')) if args.strip() else ():
+        if arg == '%s':
+            values.append(params.pop(0))
+        elif arg.upper() == 'NULL':
+            values.append(None)
+        else:
+            raise sqlite3.ProgrammingError(f"CALL 只支持 %s 与 NULL 实参: {arg}")
+    return values
+
+
+def call_procedure(cursor, name: str, values: list) -> int:
+    """执行存储过程体，返回最后一条语句影响的行数（与 MySQL 的 CALL 相同）"""
+    procedure = procedures().get(name.lower())
+    if procedure is None:
+        raise sqlite3.OperationalError(f"存储过程不存在: {name}")
+    names, statements = procedure
+    if len(values) != len(names):
+        raise sqlite3.ProgrammingError(f"存储过程 {name} 需要 {len(names)} 个参数")
+    bound = dict(zip(names, values))
+    for sql in statements:
+        cursor.execute(sql, {n: bound[n] for n in names if f":{n}" in sql})
+    return cursor.rowcount
+
+
+# ================= 连接 / 游标（pymysql 兼容） =================
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def execute(self, query: str, params=None) -> int:
+        call = _CALL_RE.match(query)
+        if call:
+            return call_procedure(self._cursor, call.group(1), _call_arguments(call.group(2), params))
+        if params is None:
+            self._cursor.execute(translate_sql(query, has_params=False))
+        else:
+            self._cursor.execute(translate_sql(query), tuple(params))
+        return self._cursor.rowcount
+
+    def executemany(self, query: str, rows) -> int:
+        call = _CALL_RE.match(query)
+        if call:
+            # 与 pymysql 相同：非 INSERT 语句逐组执行
+            return sum(call_procedure(self._cursor, call.group(1), _call_arguments(call.group(2), row)) for row in rows)
+        self._cursor.executemany(translate_sql(query), [tuple(row) for row in rows])
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size: int = None):
+        return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+class SQLiteConnection:
+    def __init__(self, conn):
+        self._conn = conn
+        self.open = True
+
+    def cursor(self, cursor_class=None) -> SQLiteCursor:
+        # SQLite 游标本身逐行读取，SSCursor 等游标类型无需区分
+        return SQLiteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect: bool = False):
+        if not self.open:
+            raise sqlite3.ProgrammingError("连接已关闭")
+        self._conn.execute("SELECT 1")
+
+    def close(self):
+        if self.open:
+            self.open = False
+            self._conn.close()
+
+
+def _open(path: str, uri: bool):
+    conn = sqlite3.connect(path, uri=uri, timeout=30, check_same_thread=False,
+                           detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.create_function('NOW', 0, _now)
+    conn.create_function('DATE_FORMAT', 2, _date_format, deterministic=True)
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def connect(database: str, **_) -> SQLiteConnection:
+    """
+    打开 SQLite 库（连接池的 connect 函数），首次打开时建库
+    :param database: 库文件路径；':memory:' 为进程内共享的内存库
+    """
+    if database == ':memory:':
+        path, uri = 'file:app_memory?mode=memory&cache=shared', True
+    else:
+        path, uri = database, False
+    conn = _open(path, uri)
+    with _init_lock:
+        if path not in _initialized:
+            if uri:
+                # 内存库在最后一条连接关闭时销毁，保留一条连接直到进程结束
+                _memory_keepers[path] = _open(path, uri)
+            else:
+                conn.execute("PRAGMA journal_mode = WAL")
+            init_schema(conn)
+            _initialized.add(path)
+    return SQLiteConnection(conn)
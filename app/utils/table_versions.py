@@ -0,0 +1,101 @@
+# app/utils/table_versions.py
+"""
+跨进程的表变更计数
+Table_Version 表由触发器维护（见 数据库建立/12_表版本跟踪.sql）：任何连接对业务表的
+INSERT/UPDATE/DELETE 都会使该表的版本号增加，包括其他 Streamlit 进程、命令行全量重算
+以及在 Navicat 中直接修改数据。
+本进程定期用一条查询读取全部版本号，与上次结果比对，得到被其他连接修改过的表，
+再交给各缓存层（查询缓存、参数快照、情景基础数据）按表失效。
+- 轮询间隔内的读取可能看到其他进程最多 poll_interval 秒前的数据
+- Table_Version 不存在或无权限读取时跟踪自动停用，每隔 retry_interval 秒重试
+"""
+import threading
+import time
+from config import TABLE_VERSION_CONFIG
+
+
+class TableVersionTracker:
+    def __init__(self, enabled: bool = True, poll_interval: float = 2.0, retry_interval: float = 60.0):
+        self.enabled = enabled
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self._versions = None        # 上次轮询结果 {表名: 版本号}；None 表示尚无基线
+        self._next_poll = 0.0
+        self._lock = threading.Lock()
+        self._polling = threading.Lock()
+        self.polls = 0
+        self.errors = 0
+
+    def poll(self, load_versions, force: bool = False):
+        """
+        轮询版本号（间隔未到时直接返回）
+        :param load_versions: 执行 Q_GET_TABLE_VERSIONS 并返回 DataFrame 的函数
+        :param force: True 时忽略轮询间隔
+        :return: 版本变化的表名集合；None 表示基线刚建立（此前的缓存无法判断，应全部失效）
+        """
+        if not self.enabled:
+            return set()
+        now = time.monotonic()
+        with self._lock:
+            if not force and now < self._next_poll:
+                return set()
+            self._next_poll = now + self.poll_interval
+        # 同一时刻只有一个线程查询，其余线程沿用上次结果
+        if not self._polling.acquire(blocking=force):
+            return set()
+        try:
+            try:
+                df = load_versions()
+                current = {str(name): int(version)
+                           for name, version in zip(df['Table_Name'], df['Version'])}
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                    self._versions = None
+                    self._next_poll = time.monotonic() + self.retry_interval
+                return set()
+            with self._lock:
+                self.polls += 1
+                previous, self._versions = self._versions, current
+            if previous is None:
+                return None
+            return {name for name in previous.keys() | current.keys()
+                    if previous.get(name) != current.get(name)}
+        finally:
+            self._polling.release()
+
+    def versions(self, tables=None) -> dict:
+        """最近一次轮询的版本号；尚无基线时为空字典"""
+        with self._lock:
+            current = self._versions or {}
+            if tables is None:
+                return dict(current)
+            return {t: current.get(t) for t in tables}
+
+    def token(self, tables) -> tuple:
+        """
+        一组表的版本标记，供缓存判断数据是否仍然新鲜：
+        生成缓存时保存 token，使用前再取一次，两者相等即说明这些表未被修改
+        尚无基线时返回 None（无法判断，视为不新鲜）
+        """
+        with self._lock:
+            if self._versions is None:
+                return None
+            return tuple(sorted((t, self._versions.get(t)) for t in tables))
+
+    def is_fresh(self, token, tables) -> bool:
+        """token 由 self.token(tables) 生成，且这些表此后未被修改"""
+        return token is not None and token == self.token(tables)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'enabled': self.enabled, 'tracking': self._versions is not None,
+                    'polls': self.polls, 'errors': self.errors}
+
+
+# ================= 进程级共享实例 =================
+_tracker = TableVersionTracker(**TABLE_VERSION_CONFIG)
+
+
+def get_table_version_tracker() -> TableVersionTracker:
+    return _tracker
@@ -0,0 +1,122 @@
+# app/utils/typed_fetch.py
+"""
+类型化读取
+按 cursor.description 中的 MySQL 字段类型直接构造列，不经过 pd.read_sql 的逐行类型推断：
+- 整数 -> int64（含 NULL 时 float64，与 pd.read_sql 一致）
+- DECIMAL / FLOAT / DOUBLE -> float64；decimals='cents' 时 DECIMAL 按小数位数转为定点整数（可空 Int64）
+- DATETIME / TIMESTAMP / DATE -> datetime64
+- 调用方在 categories 中指定的文本列（如 CATEGORY_COLUMNS）-> category，默认不转换
+- 其余文本列交给 pandas 推断
+fetchmany 每取一批就把数值 / 时间列转为数组，Python 对象只保留一批的量。
+"""
+import numpy as np
+import pandas as pd
+from pymysql.constants import FIELD_TYPE
+from utils.money import to_scaled
+
+# 取值可枚举的维度列；大结果集（如快照导出）可传给 categories 读取为 category
+CATEGORY_COLUMNS = {'Country', 'Model', 'Series', 'Market', 'Currency'}
+
+# 每批读取的行数
+FETCH_BATCH_SIZE = 5000
+
+_INT_TYPES = {FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG, FIELD_TYPE.LONGLONG,
+              FIELD_TYPE.INT24, FIELD_TYPE.YEAR}
+_FLOAT_TYPES = {FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE}
+_DECIMAL_TYPES = {FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL}
+_DATETIME_TYPES = {FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP, FIELD_TYPE.DATE, FIELD_TYPE.NEWDATE}
+
+
+def _column_kind(name: str, type_code: int, decimals: str, categories) -> str:
+    if type_code in _INT_TYPES:
+        return 'int'
+    if type_code in _FLOAT_TYPES:
+        return 'float'
+    if type_code in _DECIMAL_TYPES:
+        return 'cents' if decimals == 'cents' else 'float'
+    if type_code in _DATETIME_TYPES:
+        return 'datetime'
+    if name in categories:
+        return 'category'
+    return 'object'
+
+
+class _ColumnBuilder:
+    """按批累积一列；数值 / 时间列每批即转为数组"""
+
+    def __init__(self, name: str, kind: str, scale: int):
+        self.name, self.kind, self.scale = name, kind, scale
+        self.parts = []
+        self.has_null = False
+
+    def add(self, values: tuple):
+        if self.kind == 'int':
+            if None in values:
+                self.has_null = True
+                self.parts.append(np.array(values, dtype=float))
+            else:
+                self.parts.append(np.array(values, dtype=np.int64))
+        elif self.kind == 'float':
+            self.parts.append(np.array(values, dtype=float))
+        elif self.kind == 'cents':
+            self.parts.append(to_scaled(pd.Series(values, dtype=object), self.scale))
+        elif self.kind == 'datetime':
+            self.parts.append(pd.to_datetime(pd.Series(values, dtype=object)).to_numpy())
+        else:
+            self.parts.append(values)
+
+    def build(self):
+        if self.kind == 'cents':
+            values = np.concatenate([p[0] for p in self.parts]) if self.parts else np.array([], dtype=np.int64)
+            valid = np.concatenate([p[1] for p in self.parts]) if self.parts else np.array([], dtype=bool)
+            return pd.arrays.IntegerArray(values, ~valid)
+        if self.kind in ('int', 'float', 'datetime'):
+            if not self.parts:
+                return np.array([], dtype={'int': np.int64, 'float': float, 'datetime': 'datetime64[ns]'}[self.kind])
+            if self.kind == 'int' and self.has_null:
+                return np.concatenate([p.astype(float) for p in self.parts])
+            return np.concatenate(self.parts)
+        values = [v for part in self.parts for v in part]
+        if self.kind == 'category':
+            return pd.Categorical(values)
+        return values if values else np.array([], dtype=object)
+
+
+def _builders(description, decimals: str, categories=None) -> list:
+    categories = set(categories or ())
+    return [_ColumnBuilder(d[0], _column_kind(d[0], d[1], decimals, categories), d[5] or 0) for d in description]
+
+
+def _frame(builders) -> pd.DataFrame:
+    # 以序号构造再改列名，保留 SELECT 中的重名列（与 pd.read_sql 一致）
+    df = pd.DataFrame({i: b.build() for i, b in enumerate(builders)}, columns=range(len(builders)))
+    df.columns = [b.name for b in builders]
+    return df
+
+
+def rows_to_frame(description, rows, decimals: str = 'float', categories=None) -> pd.DataFrame:
+    """一批行（如流式读取的一块）-> 类型化 DataFrame"""
+    builders = _builders(description, decimals, categories)
+    if rows:
+        for builder, values in zip(builders, zip(*rows)):
+            builder.add(values)
+    return _frame(builders)
+
+
+def fetch_frame(cursor, decimals: str = 'float', batch_size: int = FETCH_BATCH_SIZE,
+                categories=None) -> pd.DataFrame:
+    """
+    读取已执行语句的全部结果为类型化 DataFrame
+    :param decimals: 'float' DECIMAL 读为 float64；'cents' 读为放大 10^小数位数 的可空整数
+    :param categories: 读取为 category 的列名，默认不转换
+    """
+    if cursor.description is None:
+        return pd.DataFrame()
+    builders = _builders(cursor.description, decimals, categories)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for builder, values in zip(builders, zip(*rows)):
+            builder.add(values)
+    return _frame(builders)
@@ -0,0 +1,149 @@
+-- 第11步：将 Display 由视图改为物化表
+-- 在 Navicat 中：右键数据库 → 运行 SQL 文件 → 选择本文件
+-- 前提：已执行 1~10 步；执行后须接着执行第15步（15_Display刷新过程.sql）装载数据
+-- 说明：原 Display 视图每次读取都要重新计算 true_Price → true_Revenues → true_Expenses
+--       → true_Margin_profits → true_Net_income 整条链；改为物化表后，
+--       由应用在写入 Sales_Price/参数表后调用存储过程 refresh_display 按范围刷新
+--       （DatabaseManager.refresh_display_rows / recompute_dependents），页面查询直接读取预计算结果。
+
+-- 1. 删除依赖 Display 的视图，再删除 Display 视图本身
+DROP VIEW IF EXISTS DisplayIndia, DisplayPakistan, DisplaySouthAfrica, DisplayKenya;
+DROP VIEW IF EXISTS s_Display_Model, s_Display_Country;
+DROP VIEW IF EXISTS s_Display;
+DROP VIEW IF EXISTS Display;
+
+-- 2. 创建 Display 物化表（列顺序与原视图一致，SELECT * 的结果不变）
+CREATE TABLE Display(
+id INTEGER,
+h_Time VARCHAR(50) NOT NULL,
+Model VARCHAR(50) NOT NULL,
+Model_Label VARCHAR(50),
+Series VARCHAR(50),
+Country VARCHAR(50) NOT NULL,
+Market VARCHAR(50),
+Sales INTEGER,
+Price DECIMAL(10,2),
+Revenues DECIMAL(20,2),
+pre_Costs DECIMAL(20,2),
+Costs DECIMAL(20,2),
+Gross_profits DECIMAL(20,2),
+Gross_profits_ratio DECIMAL(10,2),
+RandD_expenses DECIMAL(20,2),
+After_sales_provision DECIMAL(20,2),
+Marketing_provision DECIMAL(20,2),
+Marketing_expenses DECIMAL(10,2),
+Labor_costs DECIMAL(10,2),
+Other_variable_expenses DECIMAL(10,2),
+Margin_profits DECIMAL(20,2),
+Other_fixed_expenses DECIMAL(10,2),
+Functional_expenses DECIMAL(20,2),
+Headquarters_expenses DECIMAL(20,2),
+Net_income DECIMAL(20,2),
+Exchange_time VARCHAR(50),
+updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+PRIMARY KEY (h_Time, Country, Model),
+INDEX idx_display_country (Country, Model, h_Time),
+INDEX idx_display_model (Model, h_Time),
+INDEX idx_display_updated (updated_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 3. 初始装载与之后的刷新由第15步的存储过程 refresh_display 完成（公式与原 Display 视图相同）
+
+-- 4. 重建各国展示视图（业务员权限用）
+-- 视图内不再带 ORDER BY，排序由查询方决定，过滤条件可直接走 idx_display_country
+CREATE VIEW DisplayIndia(id, h_Time, Model, Model_Label, Series, Country, Market, Sales, Price, Revenues, pre_Costs, Costs, Gross_profits, Gross_profits_ratio, RandD_expenses, After_sales_provision, Marketing_provision, Marketing_expenses, Labor_costs, Other_variable_expenses, Margin_profits, Other_fixed_expenses, Functional_expenses, Headquarters_expenses, Net_income) AS
+SELECT id, h_Time, Model, Model_Label, Series, Country, Market, Sales, Price, Revenues, pre_Costs, Costs, Gross_profits, Gross_profits_ratio, RandD_expenses, After_sales_provision, Marketing_provision, Marketing_expenses, Labor_costs, Other_variable_expenses, Margin_profits, Other_fixed_expenses, Functional_expenses, Headquarters_expenses, Net_income
+FROM Display
+WHERE Country = 'India';
+
+CREATE VIEW DisplayPakistan(id, h_Time, Model, Model_Label, Series, Country, Market, Sales, Price, Revenues, pre_Costs, Costs, Gross_profits, Gross_profits_ratio, RandD_expenses, After_sales_provision, Marketing_provision, Marketing_expenses, Labor_costs, Other_variable_expenses, Margin_profits, Other_fixed_expenses, Functional_expenses, Headquarters_expenses, Net_income) AS
+SELECT id, h_Time, Model, Model_Label, Series, Country, Market, Sales, Price, Revenues, pre_Costs, Costs, Gross_profits, Gross_profits_ratio, RandD_expenses, After_sales_provision, Marketing_provision, Marketing_expenses, Labor_costs, Other_variable_expenses, Margin_profits, Other_fixed_expenses, Functional_expenses, Headquarters_expenses, Net_income
+FROM Display
+WHERE Country = 'Pakistan';
+
+CREATE VIEW DisplaySouthAfrica(id, h_Time, Model, Model_Label, Series, Country, Market, Sales, Price, Revenues, pre_Costs, Costs, Gross_profits, Gross_profits_ratio, RandD_expenses, After_sales_provision, Marketing_provision, Marketing_expenses, Labor_costs, Other_variable_expenses, Margin_profits, Other_fixed_expenses, Functional_expenses, Headquarters_expenses, Net_income) AS
+SELECT id, h_Time, Model, Model_Label, Series, Country, Market, Sales, Price, Revenues, pre_Costs, Costs, Gross_profits, Gross_profits_ratio, RandD_expenses, After_sales_provision, Marketing_provision, Marketing_expenses, Labor_costs, Other_variable_expenses, Margin_profits, Other_fixed_expenses, Functional_expenses, Headquarters_expenses, Net_income
+FROM Display
+WHERE Country = 'South Africa';
+
+CREATE VIEW DisplayKenya(id, h_Time, Model, Model_Label, Series, Country, Market, Sales, Price, Revenues, pre_Costs, Costs, Gross_profits, Gross_profits_ratio, RandD_expenses, After_sales_provision, Marketing_provision, Marketing_expenses, Labor_costs, Other_variable_expenses, Margin_profits, Other_fixed_expenses, Functional_expenses, Headquarters_expenses, Net_income) AS
+SELECT id, h_Time, Model, Model_Label, Series, Country, Market, Sales, Price, Revenues, pre_Costs, Costs, Gross_profits, Gross_profits_ratio, RandD_expenses, After_sales_provision, Marketing_provision, Marketing_expenses, Labor_costs, Other_variable_expenses, Margin_profits, Other_fixed_expenses, Functional_expenses, Headquarters_expenses, Net_income
+FROM Display
+WHERE Country = 'Kenya';
+
+-- 5. 重建经理聚合视图（历史、预测、预算对比）
+-- History/Budget 上的 uk_hist / uk_bud 与 Display 主键一致，三表按主键连接
+CREATE VIEW s_Display(
+    h_Time, Country, Market, Model, Model_label, Series, 
+    Sales_history, Sales_forecasting, Sales_budget, 
+    Revenues_history, Revenues_forecasting, Revenues_budget, 
+    Gross_profits_history, Gross_profits_forecasting, Gross_profits_budget, 
+    Margin_profits_history, Margin_profits_forecasting, Margin_profits_budget, 
+    Net_income_history, Net_income_forecasting, Net_income_budget
+) AS
+SELECT 
+    Display.h_Time, 
+    Display.Country, 
+    Display.Market,
+    Display.Model, 
+    Display.Model_label,
+    Display.Series,
+    COALESCE(History.Sales, 0) AS Sales_history,
+    COALESCE(Display.Sales, 0) AS Sales_forecasting,
+    COALESCE(Budget.Sales, 0) AS Sales_budget,
+    COALESCE(History.Revenues, 0) AS Revenues_history,
+    COALESCE(Display.Revenues, 0) AS Revenues_forecasting,
+    COALESCE(Budget.Revenues, 0) AS Revenues_budget,  
+    COALESCE(History.Gross_profits, 0) AS Gross_profits_history,
+    COALESCE(Display.Gross_profits, 0) AS Gross_profits_forecasting,
+    COALESCE(Budget.Gross_profits, 0) AS Gross_profits_budget,
+    COALESCE(History.Margin_profits, 0) AS Margin_profits_history,
+    COALESCE(Display.Margin_profits, 0) AS Margin_profits_forecasting,
+    COALESCE(Budget.Margin_profits, 0) AS Margin_profits_budget,
+    COALESCE(History.Net_income, 0) AS Net_income_history,
+    COALESCE(Display.Net_income, 0) AS Net_income_forecasting,
+    COALESCE(Budget.Net_income, 0) AS Net_income_budget
+FROM Display
+LEFT JOIN History ON 
+    Display.h_Time = History.h_Time 
+    AND Display.Country = History.Country 
+    AND Display.Model = History.Model
+LEFT JOIN Budget ON 
+    Display.h_Time = Budget.h_Time 
+    AND Display.Country = Budget.Country 
+    AND Display.Model = Budget.Model;
+
+CREATE VIEW s_Display_Model(
+    h_Time, Model, Model_label, Series, 
+    Sales_history, Sales_forecasting, Sales_budget, 
+    Revenues_history, Revenues_forecasting, Revenues_budget, 
+    Gross_profits_history, Gross_profits_forecasting, Gross_profits_budget, 
+    Margin_profits_history, Margin_profits_forecasting, Margin_profits_budget, 
+    Net_income_history, Net_income_forecasting, Net_income_budget
+) AS
+SELECT h_Time, Model, Model_label, Series, 
+SUM(Sales_history), SUM(Sales_forecasting), SUM(Sales_budget), SUM(Revenues_history), SUM(Revenues_forecasting), SUM(Revenues_budget), SUM(Gross_profits_history), SUM(Gross_profits_forecasting), SUM(Gross_profits_budget), SUM(Margin_profits_history), SUM(Margin_profits_forecasting), SUM(Margin_profits_budget), SUM(Net_income_history), SUM(Net_income_forecasting), SUM(Net_income_budget)
+FROM s_Display
+GROUP BY h_Time, Model, Model_label, Series;
+
+CREATE VIEW s_Display_Country(
+    h_Time, Country, Market, Sales_history, Sales_forecasting, Sales_budget, 
+    Revenues_history, Revenues_forecasting, Revenues_budget, 
+    Gross_profits_history, Gross_profits_forecasting, Gross_profits_budget, 
+    Margin_profits_history, Margin_profits_forecasting, Margin_profits_budget, 
+    Net_income_history, Net_income_forecasting, Net_income_budget
+) AS
+SELECT h_Time, Country, Market, 
+SUM(Sales_history), SUM(Sales_forecasting), SUM(Sales_budget), SUM(Revenues_history), SUM(Revenues_forecasting), SUM(Revenues_budget), SUM(Gross_profits_history), SUM(Gross_profits_forecasting), SUM(Gross_profits_budget), SUM(Margin_profits_history), SUM(Margin_profits_forecasting), SUM(Margin_profits_budget), SUM(Net_income_history), SUM(Net_income_forecasting), SUM(Net_income_budget)
+FROM s_Display
+GROUP BY h_Time, Country, Market;
+
+-- 6. 权限：视图/表重建后重新授权（Display 只由存储过程 refresh_display 写入，见第15步）
+GRANT SELECT                 ON `大作业-test4`.`Display`            TO 'FBPRole';
+GRANT SELECT                 ON `大作业-test4`.`DisplayIndia`       TO 'SalespersonIndiaRole';
+GRANT SELECT                 ON `大作业-test4`.`DisplayPakistan`    TO 'SalespersonPakistanRole';
+GRANT SELECT                 ON `大作业-test4`.`DisplaySouthAfrica` TO 'SalespersonSouthAfricaRole';
+GRANT SELECT                 ON `大作业-test4`.`DisplayKenya`       TO 'SalespersonKenyaRole';
+GRANT SELECT ON `大作业-test4`.`s_Display`         TO 'ManagerRole';
+GRANT SELECT ON `大作业-test4`.`s_Display_Model`   TO 'ManagerRole';
+GRANT SELECT ON `大作业-test4`.`s_Display_Country` TO 'ManagerRole';
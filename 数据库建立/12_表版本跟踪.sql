@@ -0,0 +1,361 @@
+-- 第12步：表版本跟踪（跨进程缓存一致性）
+-- ⚠️ 重要：此文件包含触发器，需要在 Navicat 查询窗口手动执行（不要用"运行SQL文件"功能）
+-- 前提：已执行 1~11 步
+-- 说明：应用在进程内缓存查询结果与参数表快照（utils/query_cache.py、utils/financials.py），
+--       本进程的写入会立即使缓存失效，但其他 Streamlit 进程、命令行全量重算或直接修改数据时无法感知。
+--       以下触发器在每次 INSERT/UPDATE/DELETE 时增加对应表的版本号，应用每隔几秒用一条查询
+--       读取全部版本号（utils/table_versions.py），版本变化的表对应的缓存随即失效。
+-- 分槽计数：每张表按 CONNECTION_ID() % 16 分成 16 个计数行，多个连接并发写同一张表时
+--       （如全量重算的多个工作进程）各自更新不同的行，不会在同一行上排队等锁；版本号取各槽之和。
+
+-- 1. 版本表
+CREATE TABLE IF NOT EXISTS Table_Version(
+Table_Name VARCHAR(64) NOT NULL,
+Slot TINYINT UNSIGNED NOT NULL,
+Version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+PRIMARY KEY (Table_Name, Slot)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 2. 初始行（保证每张表都有版本号，未写入过的表版本为 0）
+INSERT IGNORE INTO Table_Version (Table_Name, Slot, Version) VALUES
+('Country', 0, 0),
+('Model', 0, 0),
+('Exchange', 0, 0),
+('Sales_Price', 0, 0),
+('Costs', 0, 0),
+('Ratio_Expenses1', 0, 0),
+('Ratio_Expenses2', 0, 0),
+('Ratio_Expenses3', 0, 0),
+('Regional_Expenses', 0, 0),
+('History', 0, 0),
+('Budget', 0, 0),
+('Display', 0, 0),
+('System_Log', 0, 0);
+
+-- 3. 触发器：每张业务表的 INSERT / UPDATE / DELETE 各一个
+DELIMITER $$
+
+CREATE TRIGGER tv_country_insert
+AFTER INSERT ON Country
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Country', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_country_update
+AFTER UPDATE ON Country
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Country', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_country_delete
+AFTER DELETE ON Country
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Country', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_model_insert
+AFTER INSERT ON Model
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Model', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_model_update
+AFTER UPDATE ON Model
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Model', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_model_delete
+AFTER DELETE ON Model
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Model', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_exchange_insert
+AFTER INSERT ON Exchange
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Exchange', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_exchange_update
+AFTER UPDATE ON Exchange
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Exchange', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_exchange_delete
+AFTER DELETE ON Exchange
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Exchange', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_sales_price_insert
+AFTER INSERT ON Sales_Price
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Sales_Price', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_sales_price_update
+AFTER UPDATE ON Sales_Price
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Sales_Price', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_sales_price_delete
+AFTER DELETE ON Sales_Price
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Sales_Price', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_costs_insert
+AFTER INSERT ON Costs
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Costs', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_costs_update
+AFTER UPDATE ON Costs
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Costs', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_costs_delete
+AFTER DELETE ON Costs
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Costs', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_ratio_expenses1_insert
+AFTER INSERT ON Ratio_Expenses1
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Ratio_Expenses1', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_ratio_expenses1_update
+AFTER UPDATE ON Ratio_Expenses1
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Ratio_Expenses1', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_ratio_expenses1_delete
+AFTER DELETE ON Ratio_Expenses1
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Ratio_Expenses1', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_ratio_expenses2_insert
+AFTER INSERT ON Ratio_Expenses2
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Ratio_Expenses2', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_ratio_expenses2_update
+AFTER UPDATE ON Ratio_Expenses2
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Ratio_Expenses2', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_ratio_expenses2_delete
+AFTER DELETE ON Ratio_Expenses2
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Ratio_Expenses2', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_ratio_expenses3_insert
+AFTER INSERT ON Ratio_Expenses3
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Ratio_Expenses3', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_ratio_expenses3_update
+AFTER UPDATE ON Ratio_Expenses3
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Ratio_Expenses3', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_ratio_expenses3_delete
+AFTER DELETE ON Ratio_Expenses3
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Ratio_Expenses3', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_regional_expenses_insert
+AFTER INSERT ON Regional_Expenses
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Regional_Expenses', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_regional_expenses_update
+AFTER UPDATE ON Regional_Expenses
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Regional_Expenses', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_regional_expenses_delete
+AFTER DELETE ON Regional_Expenses
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Regional_Expenses', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_history_insert
+AFTER INSERT ON History
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('History', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_history_update
+AFTER UPDATE ON History
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('History', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_history_delete
+AFTER DELETE ON History
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('History', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_budget_insert
+AFTER INSERT ON Budget
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Budget', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_budget_update
+AFTER UPDATE ON Budget
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Budget', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_budget_delete
+AFTER DELETE ON Budget
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Budget', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_display_insert
+AFTER INSERT ON Display
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Display', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_display_update
+AFTER UPDATE ON Display
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Display', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_display_delete
+AFTER DELETE ON Display
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('Display', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_system_log_insert
+AFTER INSERT ON System_Log
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('System_Log', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_system_log_update
+AFTER UPDATE ON System_Log
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('System_Log', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+CREATE TRIGGER tv_system_log_delete
+AFTER DELETE ON System_Log
+FOR EACH ROW
+BEGIN
+    INSERT INTO Table_Version (Table_Name, Slot, Version) VALUES ('System_Log', CONNECTION_ID() % 16, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1;
+END$$
+
+DELIMITER ;
+
+-- 4. 权限：各角色只需读取版本表（触发器以定义者权限写入）
+GRANT SELECT ON `大作业-test4`.`Table_Version` TO 'FBPRole';
+GRANT SELECT ON `大作业-test4`.`Table_Version` TO 'SalespersonIndiaRole';
+GRANT SELECT ON `大作业-test4`.`Table_Version` TO 'SalespersonPakistanRole';
+GRANT SELECT ON `大作业-test4`.`Table_Version` TO 'SalespersonSouthAfricaRole';
+GRANT SELECT ON `大作业-test4`.`Table_Version` TO 'SalespersonKenyaRole';
+GRANT SELECT ON `大作业-test4`.`Table_Version` TO 'ManagerRole';
+
+-- 5. 检查：应用轮询使用的查询
+SELECT Table_Name, SUM(Version) AS Version FROM Table_Version GROUP BY Table_Name;
@@ -0,0 +1,15 @@
+-- 第13步：批量导入（LOAD DATA LOCAL INFILE）
+-- 前提：已执行 1~12 步
+-- 说明：一次保存达到 BULK_LOAD_MIN_ROWS 行的 History / Budget / Sales_Price 数据时，应用把计算好的结果
+--       写成临时 CSV，用 LOAD DATA LOCAL INFILE 装入临时暂存表，再用一条 INSERT ... SELECT 合并进目标表
+--       （utils/bulk_load.py）。以下设置未执行时应用自动改用多行 INSERT，结果相同，只是速度较慢。
+
+-- 1. 服务器允许客户端上传本地文件（重启后失效；长期生效请在 my.ini 的 [mysqld] 下加 local_infile=1）
+SET GLOBAL local_infile = 1;
+
+-- 2. 暂存表为临时表，需要 CREATE TEMPORARY TABLES 权限
+GRANT CREATE TEMPORARY TABLES ON `大作业-test4`.* TO 'FBPRole';
+GRANT CREATE TEMPORARY TABLES ON `大作业-test4`.* TO 'ManagerRole';
+
+-- 3. 检查
+SHOW GLOBAL VARIABLES LIKE 'local_infile';
@@ -0,0 +1,14 @@
+-- 第14步：查看日志合并计数
+-- 前提：已执行 8_创建日志表.sql
+-- 说明：页面每次重跑都会记录一条 VIEW 日志。应用把同一用户、同一页面、同一分析类型与筛选条件、
+--       在 AUDIT_LOG_CONFIG['coalesce_window'] 秒内重复的查看合并为一行（utils/audit_log.py），
+--       Log_Time 为窗口内第一次查看的时间，Repeat_Count 为合并的次数；其他日志 Repeat_Count 恒为 1。
+USE `大作业-test4`;
+
+-- 1. 合并计数列（已有日志为 1）
+ALTER TABLE `System_Log` ADD COLUMN `Repeat_Count` INT NOT NULL DEFAULT 1;
+
+-- 2. 检查：按操作类型统计行数与实际次数
+SELECT Action_Type, COUNT(*) AS log_rows, SUM(Repeat_Count) AS events
+FROM `System_Log`
+GROUP BY Action_Type;
@@ -0,0 +1,107 @@
+-- 第15步：Display 的统一计算与服务端刷新
+-- 前提：已执行 1~12 步（第11步已创建 Display 物化表）
+-- 说明：Display 的每一行由 Sales_Price 的一行驱动，计算与原 Display 视图（4_创建视图.sql）相同：
+--       各参数表以 INNER JOIN 连接（缺任一参数的 Sales_Price 行不出现在 Display 中），
+--       收入、成本、各项费用与利润逐项 ROUND 到分，Sales / Price 取自 Sales_Price。
+--       公式只在视图 Display_Calc 中定义一次；初始装载与应用的每次刷新都调用存储过程 refresh_display，
+--       先删除范围内的行、再从 Display_Calc 插入，价格被删除或参数缺失时对应的 Display 行同样消失。
+--       与原视图的差别：同一 (Model_label, Country) 有多条 Ratio_Expenses3 时只取 ID 最大的一条
+--       （原视图会为同一 Sales_Price 行产生重复行，物化表的主键不允许）；Sales 或 Revenues 为 0 时
+--       pre_Costs / Gross_profits_ratio 为 NULL（与原视图的结果相同，但不触发严格模式下的除零错误）。
+--       存储过程以定义者权限执行：业务员保存价格后调用它刷新 Display，
+--       无需 Display 的写权限，也无需读取 Costs / Exchange / 比率表等参数表。
+USE `大作业-test4`;
+
+-- 1. 计算视图（逐层计算：汇率换算 → 收入 / 成本 / 毛利 → 各项费用 → 边际利润 → 净利润）
+DROP VIEW IF EXISTS Display_Calc;
+CREATE VIEW Display_Calc(id, h_Time, Model, Model_Label, Series, Country, Market, Sales, Price, Revenues, pre_Costs, Costs, Gross_profits, Gross_profits_ratio, RandD_expenses, After_sales_provision, Marketing_provision, Marketing_expenses, Labor_costs, Other_variable_expenses, Margin_profits, Other_fixed_expenses, Functional_expenses, Headquarters_expenses, Net_income, Exchange_time) AS
+SELECT m.id, m.h_Time, m.Model, m.Model_label, m.Series, m.Country, m.Market, m.Sales, m.Price, m.Revenues,
+       ROUND(m.Costs / NULLIF(m.Sales, 0), 2),
+       m.Costs, m.Gross_profits,
+       ROUND(m.Gross_profits / NULLIF(m.Revenues, 0), 2),
+       m.RandD_expenses, m.After_sales_provision, m.Marketing_provision,
+       m.Marketing_expenses, m.Labor_cost, m.Other_variable_expenses, m.Margin_profits,
+       m.Other_fixed_expenses, m.Functional_expenses, m.Headquarters_expenses,
+       ROUND(m.Margin_profits - m.Other_fixed_expenses - m.Functional_expenses - m.Headquarters_expenses, 2),
+       m.Exchange_time
+FROM (
+    SELECT x.*,
+           ROUND(x.Gross_profits - x.RandD_expenses - x.After_sales_provision - x.Marketing_provision
+                 - x.Marketing_expenses - x.Labor_cost - x.Other_variable_expenses, 2) AS Margin_profits
+    FROM (
+        SELECT r.*,
+               ROUND(r.Costs * (r.soft_rate + r.rand_rate), 2) AS RandD_expenses,
+               ROUND(r.Costs * r.after_sales_rate, 2) AS After_sales_provision,
+               ROUND(r.Revenues * r.mkt_prov_rate, 2) AS Marketing_provision,
+               ROUND(r.Costs * r.func_rate, 2) AS Functional_expenses,
+               ROUND(r.Costs * r.hq_rate, 2) AS Headquarters_expenses
+        FROM (
+            SELECT p.*,
+                   ROUND(p.Sales * p.true_Price, 2) AS Revenues,
+                   ROUND(p.Sales * p.unit_cost, 2) AS Costs,
+                   ROUND(p.Sales * p.true_Price - p.Sales * p.unit_cost, 2) AS Gross_profits
+            FROM (
+                SELECT sp.id, sp.h_Time, sp.Model, md.Model_label, md.Series, sp.Country, co.Market,
+                       sp.Sales, sp.Price, sp.Exchange_time,
+                       CASE WHEN sp.Currency = 'USD' THEN sp.Price * ex.Exchange_rate ELSE sp.Price END AS true_Price,
+                       cs.Costs AS unit_cost,
+                       r1.Software_product_amortization_rate_acc_cost AS soft_rate,
+                       r1.RandD_rate_acc_cost AS rand_rate,
+                       r2.Functional_cost_allocation_rate_acc_cost AS func_rate,
+                       r2.Business_group_headquarters_allocation_rate_acc_cost AS hq_rate,
+                       r2.Marketing_activities_provision_rate_acc_revenue AS mkt_prov_rate,
+                       r3.After_sales_provision_rate_acc_cost AS after_sales_rate,
+                       g.Marketing_expenses, g.Labor_cost, g.Other_variable_expenses, g.Other_fixed_expenses
+                FROM Sales_Price sp
+                JOIN Model md ON md.Model = sp.Model
+                JOIN Country co ON co.Country = sp.Country
+                JOIN Exchange ex ON ex.Exchange_time = sp.Exchange_time
+                JOIN Costs cs ON cs.Model = sp.Model AND cs.Country = sp.Country AND cs.Costs_time = sp.h_Time
+                JOIN Ratio_Expenses1 r1 ON r1.Series = md.Series
+                JOIN Ratio_Expenses2 r2 ON r2.Country = sp.Country
+                JOIN Ratio_Expenses3 r3 ON r3.Ratio_expenses3_id = (
+                    SELECT MAX(q.Ratio_expenses3_id) FROM Ratio_Expenses3 q
+                    WHERE q.Model_label = md.Model_label AND q.Country = sp.Country
+                )
+                JOIN Regional_Expenses g ON g.Country = sp.Country AND g.Expenses_time = sp.h_Time
+            ) p
+        ) r
+    ) x
+) m;
+
+-- 2. 刷新过程：参数为 NULL 表示不限（三个都为 NULL 时刷新全部）
+DROP PROCEDURE IF EXISTS refresh_display;
+
+DELIMITER $$
+
+CREATE PROCEDURE refresh_display(IN p_time VARCHAR(50), IN p_country VARCHAR(50), IN p_model VARCHAR(50))
+SQL SECURITY DEFINER
+BEGIN
+    DELETE FROM Display
+    WHERE (p_time IS NULL OR h_Time = p_time)
+      AND (p_country IS NULL OR Country = p_country)
+      AND (p_model IS NULL OR Model = p_model);
+    INSERT INTO Display (id, h_Time, Model, Model_Label, Series, Country, Market, Sales, Price, Revenues, pre_Costs, Costs, Gross_profits, Gross_profits_ratio, RandD_expenses, After_sales_provision, Marketing_provision, Marketing_expenses, Labor_costs, Other_variable_expenses, Margin_profits, Other_fixed_expenses, Functional_expenses, Headquarters_expenses, Net_income, Exchange_time)
+    SELECT id, h_Time, Model, Model_Label, Series, Country, Market, Sales, Price, Revenues, pre_Costs, Costs, Gross_profits, Gross_profits_ratio, RandD_expenses, After_sales_provision, Marketing_provision, Marketing_expenses, Labor_costs, Other_variable_expenses, Margin_profits, Other_fixed_expenses, Functional_expenses, Headquarters_expenses, Net_income, Exchange_time
+    FROM Display_Calc
+    WHERE (p_time IS NULL OR h_Time = p_time)
+      AND (p_country IS NULL OR Country = p_country)
+      AND (p_model IS NULL OR Model = p_model);
+END$$
+
+DELIMITER ;
+
+-- 3. 按统一公式装载全部 Display 行
+CALL refresh_display(NULL, NULL, NULL);
+
+-- 4. 权限：写入价格 / 参数的角色都可刷新 Display；Display 只由存储过程写入
+GRANT EXECUTE ON PROCEDURE `大作业-test4`.`refresh_display` TO 'FBPRole';
+GRANT EXECUTE ON PROCEDURE `大作业-test4`.`refresh_display` TO 'SalespersonIndiaRole';
+GRANT EXECUTE ON PROCEDURE `大作业-test4`.`refresh_display` TO 'SalespersonPakistanRole';
+GRANT EXECUTE ON PROCEDURE `大作业-test4`.`refresh_display` TO 'SalespersonSouthAfricaRole';
+GRANT EXECUTE ON PROCEDURE `大作业-test4`.`refresh_display` TO 'SalespersonKenyaRole';
+-- 按旧版第11步授予过 FBP 写权限的库，可收回：
+-- REVOKE INSERT, UPDATE ON `大作业-test4`.`Display` FROM 'FBPRole';
+
+-- 5. 检查
+SELECT COUNT(*) AS display_rows FROM Display;
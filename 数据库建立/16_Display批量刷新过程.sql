@@ -0,0 +1,57 @@
+-- 第16步：按键列表一次刷新多组 Display 行
+-- 前提：已执行第15步（15_Display刷新过程.sql，视图 Display_Calc）；需要 MySQL 8.0（JSON_TABLE）
+-- 说明：保存一批价格或修改参数后，受影响的 (h_Time, Country, Model) 往往有几十组。
+--       逐组 CALL refresh_display 时每组一次往返（pymysql 的 executemany 对 CALL 逐条执行），
+--       这里把全部键作为一个 JSON 数组传入，一次调用内以两条集合语句完成删除与插入。
+--       p_keys 形如 [["2026-01", "India", "CA 128+8"], ["2026-02", "India", null]]，
+--       元素依次为 h_Time / Country / Model，null 表示该维度不限（与 refresh_display 的参数相同）。
+--       键列显式声明 utf8mb4，使其与各表的列使用同一默认排序规则。
+USE `大作业-test4`;
+
+-- 1. 刷新过程
+DROP PROCEDURE IF EXISTS refresh_display_keys;
+
+DELIMITER $$
+
+CREATE PROCEDURE refresh_display_keys(IN p_keys JSON)
+SQL SECURITY DEFINER
+BEGIN
+    DELETE FROM Display
+    WHERE EXISTS (
+        SELECT 1
+        FROM JSON_TABLE(p_keys, '$[*]' COLUMNS (
+            k_time VARCHAR(50) CHARACTER SET utf8mb4 PATH '$[0]',
+            k_country VARCHAR(50) CHARACTER SET utf8mb4 PATH '$[1]',
+            k_model VARCHAR(50) CHARACTER SET utf8mb4 PATH '$[2]'
+        )) k
+        WHERE (k.k_time IS NULL OR Display.h_Time = k.k_time)
+          AND (k.k_country IS NULL OR Display.Country = k.k_country)
+          AND (k.k_model IS NULL OR Display.Model = k.k_model)
+    );
+    INSERT INTO Display (id, h_Time, Model, Model_Label, Series, Country, Market, Sales, Price, Revenues, pre_Costs, Costs, Gross_profits, Gross_profits_ratio, RandD_expenses, After_sales_provision, Marketing_provision, Marketing_expenses, Labor_costs, Other_variable_expenses, Margin_profits, Other_fixed_expenses, Functional_expenses, Headquarters_expenses, Net_income, Exchange_time)
+    SELECT c.id, c.h_Time, c.Model, c.Model_Label, c.Series, c.Country, c.Market, c.Sales, c.Price, c.Revenues, c.pre_Costs, c.Costs, c.Gross_profits, c.Gross_profits_ratio, c.RandD_expenses, c.After_sales_provision, c.Marketing_provision, c.Marketing_expenses, c.Labor_costs, c.Other_variable_expenses, c.Margin_profits, c.Other_fixed_expenses, c.Functional_expenses, c.Headquarters_expenses, c.Net_income, c.Exchange_time
+    FROM Display_Calc c
+    WHERE EXISTS (
+        SELECT 1
+        FROM JSON_TABLE(p_keys, '$[*]' COLUMNS (
+            k_time VARCHAR(50) CHARACTER SET utf8mb4 PATH '$[0]',
+            k_country VARCHAR(50) CHARACTER SET utf8mb4 PATH '$[1]',
+            k_model VARCHAR(50) CHARACTER SET utf8mb4 PATH '$[2]'
+        )) k
+        WHERE (k.k_time IS NULL OR c.h_Time = k.k_time)
+          AND (k.k_country IS NULL OR c.Country = k.k_country)
+          AND (k.k_model IS NULL OR c.Model = k.k_model)
+    );
+END$$
+
+DELIMITER ;
+
+-- 2. 权限：与 refresh_display 相同
+GRANT EXECUTE ON PROCEDURE `大作业-test4`.`refresh_display_keys` TO 'FBPRole';
+GRANT EXECUTE ON PROCEDURE `大作业-test4`.`refresh_display_keys` TO 'SalespersonIndiaRole';
+GRANT EXECUTE ON PROCEDURE `大作业-test4`.`refresh_display_keys` TO 'SalespersonPakistanRole';
+GRANT EXECUTE ON PROCEDURE `大作业-test4`.`refresh_display_keys` TO 'SalespersonSouthAfricaRole';
+GRANT EXECUTE ON PROCEDURE `大作业-test4`.`refresh_display_keys` TO 'SalespersonKenyaRole';
+
+-- 3. 检查
+SHOW PROCEDURE STATUS WHERE Name = 'refresh_display_keys';